@@ -3,13 +3,13 @@ import logging
 import re
 import threading
 import time
-from typing import List
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, List, Optional
 
-import requests
 from openai import APITimeoutError
 from slack_bolt import App, Ack, BoltContext, BoltResponse
 from slack_bolt.request.payload_utils import is_event
-from slack_sdk.web import WebClient
+from slack_sdk.web import WebClient, SlackResponse
 from slack_sdk.errors import SlackApiError
 
 from app.env import (
@@ -17,8 +17,19 @@ from app.env import (
     SYSTEM_TEXT,
     TRANSLATE_MARKDOWN,
     OPENAI_IMAGE_GENERATION_MODEL,
+    SLACK_API_RATE_LIMITER_ENABLED,
+    THREAD_SUMMARY_TRANSCRIPT_STRATEGY,
+    THREAD_SUMMARY_MAP_REDUCE_ENABLED,
+    THREAD_SUMMARY_CHUNK_TOKENS,
+    THREAD_SUMMARY_MAX_CHUNKS,
+    HOT_THREAD_PRESUMMARY_ENABLED,
 )
+from app.deadline import get_request_deadline, start_request_deadline
+from app.hot_threads import HotThreadScheduler
+from app.http_transport import PooledWebClient, build_pooled_client, http_session
 from app.i18n import translate
+from app.metrics import observe
+from app.model_routing import route_openai_model
 from app.openai_image_ops import (
     append_image_content_if_exists,
     generate_image,
@@ -31,37 +42,56 @@ from app.openai_ops import (
     build_system_text,
     messages_within_context_window,
     generate_slack_thread_summary,
+    calculate_thread_summary_token_budget,
+    count_text_tokens,
     generate_proofreading_result,
     generate_chatgpt_response,
 )
-from app.slack_constants import DEFAULT_LOADING_TEXT, TIMEOUT_ERROR_MESSAGE
+from app.slack_constants import (
+    DEFAULT_LOADING_TEXT,
+    STREAMING_LOADING_TEXT,
+    TIMEOUT_ERROR_MESSAGE,
+)
 from app.slack_ops import (
+    find_bot_user_ids,
     find_parent_message,
+    is_continuation_of,
+    merge_continuation_text,
     is_this_app_mentioned,
     post_wip_message,
     update_wip_message,
+    StreamingMessagePublisher,
+    StreamingViewPublisher,
+    parse_conversation_metadata,
+    CONVERSATION_METADATA_EVENT_TYPE,
     extract_state_value,
-    build_thread_replies_as_combined_text,
+    build_thread_transcript,
     can_send_image_url_to_openai,
 )
 
 from app.sensitive_info_redaction import redact_string
+from app.slack_rate_limiter import background_priority, build_rate_limited_client
+from app.summary_cache import find_thread_summary, save_thread_summary
 from app.slack_ui import (
     build_proofreading_input_modal,
     build_proofreading_wip_modal,
     build_summarize_option_modal,
     build_summarize_wip_modal,
+    build_summarize_progress_modal,
     build_summarize_message_modal,
     build_summarize_result_modal,
+    build_summarize_partial_result_modal,
     build_summarize_timeout_error_modal,
     build_summarize_error_modal,
     build_proofreading_result_modal,
+    build_proofreading_partial_result_modal,
     build_proofreading_timeout_error_modal,
     build_proofreading_error_modal,
     build_proofreading_result_no_dm_button_modal,
     build_from_scratch_modal,
     build_from_scratch_wip_modal,
     build_from_scratch_result_modal,
+    build_from_scratch_partial_result_modal,
     build_from_scratch_timeout_modal,
     build_from_scratch_error_modal,
     build_image_generation_input_modal,
@@ -77,6 +107,8 @@ from app.slack_ui import (
     build_translation_result_modal,
     build_translation_modal,
     build_translation_wip_modal,
+    HERE_IS_SUMMARY_TEXT,
+    DEFAULT_SUMMARIZE_PROMPT,
 )
 
 
@@ -93,6 +125,59 @@ def just_ack(ack: Ack):
 # Chat with the bot
 #
 
+# The loading message is posted while the conversation context is being built
+# (fetching the replies, downloading images, etc.)
+WIP_MESSAGE_MAX_CONCURRENCY = 16
+_wip_message_executor = ThreadPoolExecutor(
+    max_workers=WIP_MESSAGE_MAX_CONCURRENCY, thread_name_prefix="wip-message"
+)
+
+
+def start_posting_wip_message(
+    *,
+    context: BoltContext,
+    client: WebClient,
+    channel: str,
+    thread_ts: str,
+    user: str,
+    system_text: str,
+    listener: str,
+    received_at: float,
+) -> Future:
+    def _post() -> SlackResponse:
+        loading_text = translate(
+            openai_api_key=context.get("OPENAI_API_KEY"),
+            context=context,
+            text=DEFAULT_LOADING_TEXT,
+        )
+        # The metadata is replaced with the whole conversation when the reply is completed
+        wip_reply = post_wip_message(
+            client=client,
+            channel=channel,
+            thread_ts=thread_ts,
+            loading_text=loading_text,
+            messages=[{"role": "system", "content": system_text}],
+            user=user,
+            shared_system_text=system_text,
+        )
+        observe("reply_time_to_ack_seconds", time.time() - received_at, listener=listener)
+        return wip_reply
+
+    return _wip_message_executor.submit(_post)
+
+
+def wait_for_wip_message(
+    wip_future: Optional[Future], logger: logging.Logger
+) -> Optional[SlackResponse]:
+    """Returns the posted loading message, or None if it has not been posted"""
+    if wip_future is None:
+        return None
+    try:
+        return wip_future.result()
+    except Exception as e:
+        logger.warning(f"Failed to post a loading message: {e}")
+        return None
+
 
 def respond_to_app_mention(
     context: BoltContext,
@@ -115,6 +200,7 @@ def respond_to_app_mention(
     logger.info(f"Processing app mention: ts={payload.get('ts')}, thread_ts={thread_ts}")
 
     wip_reply = None
+    wip_future = None
     # Replace placeholder for Slack user ID in the system prompt
     system_text = build_system_text(SYSTEM_TEXT, TRANSLATE_MARKDOWN, context)
     messages = [{"role": "system", "content": system_text}]
@@ -128,6 +214,17 @@ def respond_to_app_mention(
             )
             return
 
+        route_openai_model(context)
+        wip_future = start_posting_wip_message(
+            context=context,
+            client=client,
+            channel=context.channel_id,
+            thread_ts=payload["ts"],
+            user=context.user_id,
+            system_text=system_text,
+            listener="app_mention",
+            received_at=float(payload["ts"]),
+        )
         user_id = context.actor_user_id or context.user_id
         if thread_ts is not None:
             # Mentioning the bot user in a thread
@@ -137,11 +234,37 @@ def respond_to_app_mention(
                 include_all_metadata=True,
                 limit=1000,
             ).get("messages", [])
+            # The loading message may have been posted before fetching the replies
+            wip_reply = wip_future.result()
+            replies_in_thread = [
+                reply
+                for reply in replies_in_thread
+                if reply.get("ts") != wip_reply["message"]["ts"]
+            ]
+            bot_user_ids = find_bot_user_ids(
+                client=client, context=context, replies=replies_in_thread
+            )
+            previous_reply = None
             for reply in replies_in_thread:
                 reply_text = redact_string(reply.get("text"))
+                if is_continuation_of(reply, previous_reply):
+                    # A long reply continued in the following message
+                    messages[-1]["content"][0]["text"] = merge_continuation_text(
+                        messages[-1]["content"][0]["text"],
+                        format_openai_message_content(reply_text, TRANSLATE_MARKDOWN),
+                        reply,
+                    )
+                    previous_reply = reply
+                    continue
+                previous_reply = reply
+                reply_user_id = (
+                    reply.get("user")
+                    or bot_user_ids.get(reply.get("bot_id"))
+                    or reply["username"]
+                )
                 message_text_item = {
                     "type": "text",
-                    "text": f"<@{reply['user'] if 'user' in reply else reply['username']}>: "
+                    "text": f"<@{reply_user_id}>: "
                     + format_openai_message_content(reply_text, TRANSLATE_MARKDOWN),
                 }
                 content = [message_text_item]
@@ -154,6 +277,7 @@ def respond_to_app_mention(
                         files=reply.get("files"),
                         content=content,
                         logger=context.logger,
+                        deadline=get_request_deadline(context),
                     )
 
                 messages.append(
@@ -183,21 +307,12 @@ def respond_to_app_mention(
                     files=payload.get("files"),
                     content=content,
                     logger=context.logger,
+                    deadline=get_request_deadline(context),
                 )
 
             messages.append({"role": "user", "content": content})
 
-        loading_text = translate(
-            openai_api_key=openai_api_key, context=context, text=DEFAULT_LOADING_TEXT
-        )
-        wip_reply = post_wip_message(
-            client=client,
-            channel=context.channel_id,
-            thread_ts=payload["ts"],
-            loading_text=loading_text,
-            messages=messages,
-            user=context.user_id,
-        )
+        wip_reply = wip_future.result()
 
         (
             messages,
@@ -213,6 +328,7 @@ def respond_to_app_mention(
                 text=f":warning: The previous message is too long ({num_context_tokens}/{max_context_tokens} prompt tokens).",
                 messages=messages,
                 user=context.user_id,
+                shared_system_text=system_text,
             )
         else:
             stream = start_receiving_openai_response(
@@ -227,6 +343,7 @@ def respond_to_app_mention(
                 openai_deployment_id=context["OPENAI_DEPLOYMENT_ID"],
                 openai_organization_id=context["OPENAI_ORG_ID"],
                 function_call_module_name=context["OPENAI_FUNCTION_CALL_MODULE_NAME"],
+                timeout_seconds=get_request_deadline(context).timeout(),
             )
             consume_openai_stream_to_write_reply(
                 client=client,
@@ -235,11 +352,14 @@ def respond_to_app_mention(
                 user_id=user_id,
                 messages=messages,
                 stream=stream,
-                timeout_seconds=OPENAI_TIMEOUT_SECONDS,
+                timeout_seconds=get_request_deadline(context).timeout(),
                 translate_markdown=TRANSLATE_MARKDOWN,
+                received_at=float(payload["ts"]),
             )
 
     except (APITimeoutError, TimeoutError):
+        if wip_reply is None:
+            wip_reply = wait_for_wip_message(wip_future, logger)
         if wip_reply is not None:
             text = (
                 (
@@ -260,6 +380,8 @@ def respond_to_app_mention(
                 text=text,
             )
     except Exception as e:
+        if wip_reply is None:
+            wip_reply = wait_for_wip_message(wip_future, logger)
         text = (
             (
                 wip_reply.get("message", {}).get("text", "")
@@ -288,6 +410,10 @@ def respond_to_new_message(
     client: WebClient,
     logger: logging.Logger,
 ):
+    if hot_thread_scheduler is not None:
+        # Replies by other apps (e.g., alerts) count as well
+        hot_thread_scheduler.record_reply(context=context, payload=payload)
+
     if payload.get("bot_id") is not None and payload.get("bot_id") != context.bot_id:
         # Skip a new message by a different app
         return
@@ -297,6 +423,7 @@ def respond_to_new_message(
         return
 
     wip_reply = None
+    wip_future = None
     try:
         is_in_dm_with_bot = payload.get("channel_type") == "im"
         is_thread_for_this_app = False
@@ -350,39 +477,43 @@ def respond_to_new_message(
         if is_thread_for_this_app is False:
             return
 
+        route_openai_model(context)
         messages = []
         user_id = context.actor_user_id or context.user_id
+        # Replace placeholder for Slack user ID in the system prompt
+        system_text = build_system_text(SYSTEM_TEXT, TRANSLATE_MARKDOWN, context)
+        first_assistant_idx = -1
         last_assistant_idx = -1
         indices_to_remove = []
         for idx, reply in enumerate(messages_in_context):
             maybe_event_type = reply.get("metadata", {}).get("event_type")
-            if maybe_event_type == "chat-gpt-convo":
+            if maybe_event_type == CONVERSATION_METADATA_EVENT_TYPE:
                 if context.bot_id != reply.get("bot_id"):
                     # Remove messages by a different app
                     indices_to_remove.append(idx)
                     continue
-                maybe_new_messages = (
-                    reply.get("metadata", {}).get("event_payload", {}).get("messages")
-                )
-                if maybe_new_messages is not None:
-                    if len(messages) == 0 or user_id is None:
-                        new_user_id = (
-                            reply.get("metadata", {})
-                            .get("event_payload", {})
-                            .get("user")
-                        )
-                        if new_user_id is not None:
-                            user_id = new_user_id
-                    messages = maybe_new_messages
-                    last_assistant_idx = idx
+                if first_assistant_idx == -1:
+                    first_assistant_idx = idx
+                last_assistant_idx = idx
+
+        if last_assistant_idx != -1:
+            # Only the first reply's user and the last reply's system messages are used
+            _, first_user_id = parse_conversation_metadata(
+                messages_in_context[first_assistant_idx].get("metadata"), system_text
+            )
+            if first_user_id is not None:
+                user_id = first_user_id
+            maybe_new_messages, _ = parse_conversation_metadata(
+                messages_in_context[last_assistant_idx].get("metadata"), system_text
+            )
+            if maybe_new_messages is not None:
+                messages = maybe_new_messages
+            else:
+                last_assistant_idx = -1
 
         if is_in_dm_with_bot is True or last_assistant_idx == -1:
             # To know whether this app needs to start a new convo
             if not next(filter(lambda msg: msg["role"] == "system", messages), None):
-                # Replace placeholder for Slack user ID in the system prompt
-                system_text = build_system_text(
-                    SYSTEM_TEXT, TRANSLATE_MARKDOWN, context
-                )
                 messages.insert(0, {"role": "system", "content": system_text})
 
         filtered_messages_in_context = []
@@ -397,9 +528,33 @@ def respond_to_new_message(
         if len(filtered_messages_in_context) == 0:
             return
 
+        wip_future = start_posting_wip_message(
+            context=context,
+            client=client,
+            channel=context.channel_id,
+            thread_ts=payload.get("thread_ts") if is_in_dm_with_bot else payload["ts"],
+            user=user_id,
+            system_text=system_text,
+            listener="message",
+            received_at=float(payload["ts"]),
+        )
+        bot_user_ids = find_bot_user_ids(
+            client=client, context=context, replies=filtered_messages_in_context
+        )
+        previous_reply = None
         for reply in filtered_messages_in_context:
-            msg_user_id = reply.get("user")
+            msg_user_id = reply.get("user") or bot_user_ids.get(reply.get("bot_id"))
             reply_text = redact_string(reply.get("text"))
+            if is_continuation_of(reply, previous_reply):
+                # A long reply continued in the following message
+                messages[-1]["content"][0]["text"] = merge_continuation_text(
+                    messages[-1]["content"][0]["text"],
+                    format_openai_message_content(reply_text, TRANSLATE_MARKDOWN),
+                    reply,
+                )
+                previous_reply = reply
+                continue
+            previous_reply = reply
             content = [
                 {
                     "type": "text",
@@ -413,6 +568,7 @@ def respond_to_new_message(
                     files=reply.get("files"),
                     content=content,
                     logger=context.logger,
+                    deadline=get_request_deadline(context),
                 )
 
             messages.append(
@@ -426,17 +582,7 @@ def respond_to_new_message(
                 }
             )
 
-        loading_text = translate(
-            openai_api_key=openai_api_key, context=context, text=DEFAULT_LOADING_TEXT
-        )
-        wip_reply = post_wip_message(
-            client=client,
-            channel=context.channel_id,
-            thread_ts=payload.get("thread_ts") if is_in_dm_with_bot else payload["ts"],
-            loading_text=loading_text,
-            messages=messages,
-            user=user_id,
-        )
+        wip_reply = wip_future.result()
 
         (
             messages,
@@ -452,6 +598,7 @@ def respond_to_new_message(
                 text=f":warning: The previous message is too long ({num_context_tokens}/{max_context_tokens} prompt tokens).",
                 messages=messages,
                 user=context.user_id,
+                shared_system_text=system_text,
             )
         else:
             stream = start_receiving_openai_response(
@@ -466,6 +613,7 @@ def respond_to_new_message(
                 openai_deployment_id=context["OPENAI_DEPLOYMENT_ID"],
                 openai_organization_id=context["OPENAI_ORG_ID"],
                 function_call_module_name=context["OPENAI_FUNCTION_CALL_MODULE_NAME"],
+                timeout_seconds=get_request_deadline(context).timeout(),
             )
 
             latest_replies = client.conversations_replies(
@@ -492,11 +640,14 @@ def respond_to_new_message(
                 user_id=user_id,
                 messages=messages,
                 stream=stream,
-                timeout_seconds=OPENAI_TIMEOUT_SECONDS,
+                timeout_seconds=get_request_deadline(context).timeout(),
                 translate_markdown=TRANSLATE_MARKDOWN,
+                received_at=float(payload["ts"]),
             )
 
     except (APITimeoutError, TimeoutError):
+        if wip_reply is None:
+            wip_reply = wait_for_wip_message(wip_future, logger)
         if wip_reply is not None:
             text = (
                 (
@@ -517,6 +668,8 @@ def respond_to_new_message(
                 text=text,
             )
     except Exception as e:
+        if wip_reply is None:
+            wip_reply = wait_for_wip_message(wip_future, logger)
         text = (
             (
                 wip_reply.get("message", {}).get("text", "")
@@ -566,9 +719,23 @@ def display_translation_result(
     payload: dict,
     client: WebClient,
 ):
+    # The translation is the result itself, so it's never skipped to meet the request deadline
+    context["deadline"] = None
+    if isinstance(client, PooledWebClient):
+        # The calls delivering the result don't give up at the deadline either
+        client.deadline = None
+
+    def update_progress(view: dict):
+        with background_priority():
+            client.views_update(view_id=payload["id"], view=view)
+
     client.views_update(
         view_id=payload["id"],
-        view=build_translation_result_modal(context=context, payload=payload),
+        view=build_translation_result_modal(
+            context=context,
+            payload=payload,
+            on_progress=update_progress,
+        ),
     )
 
 
@@ -602,36 +769,152 @@ def ack_summarize_options_modal_submission(
         ack(response_action="update", view=build_summarize_message_modal())
 
 
+def summarize_thread(
+    *,
+    context: BoltContext,
+    client: WebClient,
+    logger: logging.Logger,
+    channel: str,
+    thread_ts: str,
+    prompt: str,
+    on_progress: Optional[Callable[[int, int], None]] = None,
+    on_partial_text: Optional[Callable[[str], None]] = None,
+) -> str:
+    route_openai_model(context)
+    # When the thread has been summarized with the same prompt, only the new replies are summarized
+    previous = find_thread_summary(
+        context=context, channel=channel, thread_ts=thread_ts, prompt=prompt
+    )
+    max_tokens = calculate_thread_summary_token_budget(context, prompt)
+    if THREAD_SUMMARY_MAP_REDUCE_ENABLED is True:
+        # Long threads are summarized in parts
+        max_tokens = max(
+            max_tokens, THREAD_SUMMARY_CHUNK_TOKENS * THREAD_SUMMARY_MAX_CHUNKS
+        )
+    last_seen = {}
+    thread_content = build_thread_transcript(
+        context=context,
+        client=client,
+        channel=channel,
+        thread_ts=thread_ts,
+        max_tokens=max_tokens,
+        count_tokens=lambda text: count_text_tokens(text, context["OPENAI_MODEL"]),
+        strategy=THREAD_SUMMARY_TRANSCRIPT_STRATEGY,
+        oldest=previous["latest_ts"] if previous is not None else None,
+        last_seen=last_seen,
+    )
+    if previous is not None and thread_content == "":
+        # No new replies except the ones by this app
+        summary = previous["summary"]
+    else:
+        summary = generate_slack_thread_summary(
+            context=context,
+            logger=logger,
+            openai_api_key=context.get("OPENAI_API_KEY"),
+            prompt=prompt,
+            thread_content=thread_content,
+            timeout_seconds=OPENAI_TIMEOUT_SECONDS,
+            on_progress=on_progress,
+            previous_summary=previous["summary"] if previous is not None else None,
+            on_partial_text=on_partial_text,
+        )
+    if "ts" in last_seen:
+        save_thread_summary(
+            context=context,
+            channel=channel,
+            thread_ts=thread_ts,
+            prompt=prompt,
+            summary=summary,
+            latest_ts=last_seen["ts"],
+        )
+    return summary
+
+
+def presummarize_thread(context: BoltContext, channel: str, thread_ts: str) -> None:
+    # The deadline of the message event that made this thread hot has expired long ago.
+    # The locale is the one of the user who posted that message, not of the users who will summarize the thread;
+    # with the untranslated default prompt, the summary is cached under the same key for every user
+    # whose summarize-thread modal shows the prompt as-is.
+    context = BoltContext(
+        {k: v for k, v in context.items() if k not in ("deadline", "locale")}
+    )
+    context["client"] = build_shared_slack_client(context.client, context.team_id)
+    with background_priority():
+        summarize_thread(
+            context=context,
+            client=context.client,
+            logger=context.logger,
+            channel=channel,
+            thread_ts=thread_ts,
+            prompt=DEFAULT_SUMMARIZE_PROMPT,
+        )
+
+
+hot_thread_scheduler: Optional[HotThreadScheduler] = (
+    HotThreadScheduler(presummarize_thread) if HOT_THREAD_PRESUMMARY_ENABLED else None
+)
+
+
 def prepare_and_share_thread_summary(
     payload: dict,
     client: WebClient,
     context: BoltContext,
     logger: logging.Logger,
 ):
+    message_publisher: Optional[StreamingMessagePublisher] = None
     try:
         openai_api_key = context.get("OPENAI_API_KEY")
         selected_option = extract_state_value(payload, "where-to-share-summary")["selected_option"]
         where_to_display = selected_option.get("value", "modal")
         prompt = extract_state_value(payload, "prompt").get("value")
         private_metadata = json.loads(payload.get("private_metadata"))
-        thread_content = build_thread_replies_as_combined_text(
-            context=context,
-            client=client,
-            channel=private_metadata.get("channel"),
-            thread_ts=private_metadata.get("thread_ts"),
-        )
+        channel = private_metadata.get("channel")
+        thread_ts = private_metadata.get("thread_ts")
         here_is_summary = translate(
             openai_api_key=openai_api_key,
             context=context,
-            text="Here is the summary:",
+            text=HERE_IS_SUMMARY_TEXT,
         )
-        summary = generate_slack_thread_summary(
+
+        def update_progress(done: int, total: int):
+            try:
+                with background_priority():
+                    client.views_update(
+                        view_id=payload["id"],
+                        view=build_summarize_progress_modal(done=done, total=total),
+                    )
+            except SlackApiError as e:
+                # e.g., the modal has been closed; the summary can still be posted in the thread
+                logger.debug(f"Failed to update the summary progress due to {e}")
+
+        if where_to_display == "modal":
+            publisher = StreamingViewPublisher(
+                client=client,
+                view_id=payload["id"],
+                build_view=lambda partial_summary: build_summarize_partial_result_modal(
+                    here_is_summary=here_is_summary,
+                    summary=partial_summary,
+                ),
+                logger=logger,
+            )
+        else:
+            publisher = message_publisher = StreamingMessagePublisher(
+                client=client,
+                channel=channel,
+                thread_ts=thread_ts,
+                format_text=lambda partial_summary: f"{here_is_summary}\n\n{partial_summary}"
+                + STREAMING_LOADING_TEXT,
+                logger=logger,
+            )
+        summary = summarize_thread(
             context=context,
+            client=client,
             logger=logger,
-            openai_api_key=openai_api_key,
+            channel=channel,
+            thread_ts=thread_ts,
             prompt=prompt,
-            thread_content=thread_content,
-            timeout_seconds=OPENAI_TIMEOUT_SECONDS,
+            on_progress=update_progress if where_to_display == "modal" else None,
+            on_partial_text=publisher,
         )
 
         if where_to_display == "modal":
@@ -643,18 +926,18 @@ def prepare_and_share_thread_summary(
                 ),
             )
         else:
-            client.chat_postMessage(
-                channel=private_metadata.get("channel"),
-                thread_ts=private_metadata.get("thread_ts"),
-                text=f"{here_is_summary}\n\n{summary}",
-            )
+            message_publisher.finish(f"{here_is_summary}\n\n{summary}")
     except (APITimeoutError, TimeoutError):
+        if message_publisher is not None:
+            message_publisher.discard()
         client.views_update(
             view_id=payload["id"],
             view=build_summarize_timeout_error_modal(),
         )
     except Exception as e:
         logger.exception(f"Failed to share a thread summary: {e}")
+        if message_publisher is not None:
+            message_publisher.discard()
         client.views_update(
             view_id=payload["id"],
             view=build_summarize_error_modal(e),
@@ -705,6 +988,7 @@ def display_proofreading_result(
             else None
         )
         text = "\n".join(map(lambda s: f">{s}", original_text.split("\n")))
+        route_openai_model(context)
         result = generate_proofreading_result(
             context=context,
             logger=logger,
@@ -712,6 +996,17 @@ def display_proofreading_result(
             original_text=original_text,
             tone_and_voice=tone_and_voice,
             timeout_seconds=OPENAI_TIMEOUT_SECONDS,
+            on_partial_text=StreamingViewPublisher(
+                client=client,
+                view_id=payload["id"],
+                build_view=lambda partial_result: build_proofreading_partial_result_modal(
+                    payload=payload,
+                    context=context,
+                    text=text,
+                    result=partial_result,
+                ),
+                logger=logger,
+            ),
         )
         view = build_proofreading_result_modal(
             context=context,
@@ -823,7 +1118,7 @@ def display_image_generation_result(
             f"Image generated (url: {image_url} , spent time: {spent_seconds})"
         )
 
-        image_content = requests.get(image_url).content
+        image_content = http_session().get(image_url).content
         users = [context.actor_user_id]
         dm_id = client.conversations_open(users=users)["channel"]["id"]
         text = "\n".join(map(lambda s: f">{s}", prompt.split("\n")))
@@ -924,7 +1219,7 @@ def display_image_variations_result(
 
                 def generate_variations():
                     uploaded_image_url = image_file["url_private"]
-                    image_data: bytes = requests.get(
+                    image_data: bytes = http_session().get(
                         uploaded_image_url,
                         headers={"Authorization": f"Bearer {context.bot_token}"},
                     ).content
@@ -935,7 +1230,7 @@ def display_image_variations_result(
                         size=size,
                         timeout_seconds=OPENAI_TIMEOUT_SECONDS,
                     )
-                    image_content = requests.get(image_url).content
+                    image_content = http_session().get(image_url).content
                     file_uploads.append(
                         {"file": image_content, "filename": image_file["name"]}
                     )
@@ -1064,12 +1359,21 @@ def display_chat_from_scratch_result(
     try:
         prompt = extract_state_value(payload, "prompt")["value"]
         text = "\n".join(map(lambda s: f">{s}", prompt.split("\n")))
+        route_openai_model(context)
         result = generate_chatgpt_response(
             context=context,
             logger=logger,
             openai_api_key=openai_api_key,
             prompt=prompt,
             timeout_seconds=OPENAI_TIMEOUT_SECONDS,
+            on_partial_text=StreamingViewPublisher(
+                client=client,
+                view_id=payload["id"],
+                build_view=lambda partial_result: build_from_scratch_partial_result_modal(
+                    text=text, result=partial_result
+                ),
+                logger=logger,
+            ),
         )
         view = build_from_scratch_result_modal(text=text, result=result)
         client.views_update(view_id=payload["id"], view=view)
@@ -1086,7 +1390,31 @@ def display_chat_from_scratch_result(
         )
 
 
+def build_shared_slack_client(client: WebClient, team_id: Optional[str]) -> PooledWebClient:
+    if SLACK_API_RATE_LIMITER_ENABLED is True:
+        return build_rate_limited_client(client, team_id)
+    return build_pooled_client(client, team_id)
+
+
+def use_shared_slack_client(context: BoltContext, next_):
+    # The Slack API calls while processing this request share the keep-alive connections
+    # and go through the process-wide rate limit scheduler
+    if context.client is not None:
+        context["client"] = build_shared_slack_client(context.client, context.team_id)
+    next_()
+
+
+def set_request_deadline(context: BoltContext, next_):
+    # Every stage while processing this request shares the same time limit
+    deadline = start_request_deadline(context)
+    if isinstance(context.client, PooledWebClient):
+        context.client.deadline = deadline
+    next_()
+
+
 def register_listeners(app: App):
+    app.middleware(use_shared_slack_client)
+    app.middleware(set_request_deadline)
 
     # Chat with the bot
     app.event("app_mention")(ack=just_ack, lazy=[respond_to_app_mention])
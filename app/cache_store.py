@@ -0,0 +1,239 @@
+import itertools
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+import psycopg2
+import psycopg2.pool
+
+from app.metrics import increment_counter
+
+# ----------------------------
+# Key-value cache stores
+# ----------------------------
+#
+# Stores share a minimal interface (get/set of string values) so that
+# the data can live in this process, in a local SQLite file, or in the Postgres database
+# that already holds the openai_configs table.
+
+
+class CacheStore:
+    name: str
+
+    def get(self, key: str) -> Optional[str]:
+        raise NotImplementedError()
+
+    def set(self, key: str, value: str) -> None:
+        raise NotImplementedError()
+
+    def _record(self, hit: bool) -> None:
+        increment_counter("cache_hits" if hit else "cache_misses", cache=self.name)
+
+
+class InMemoryCacheStore(CacheStore):
+    """LRU cache within this process"""
+
+    def __init__(self, *, name: str, max_size: int = 1000):
+        self.name = name
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        self._data: "OrderedDict[str, str]" = OrderedDict()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            value = self._data.get(key)
+            if value is not None:
+                self._data.move_to_end(key)
+        self._record(value is not None)
+        return value
+
+    def set(self, key: str, value: str) -> None:
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+                increment_counter("cache_evictions", cache=self.name)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._data)
+
+
+class SQLiteCacheStore(CacheStore):
+    """Cache shared by the processes running on the same machine / container"""
+
+    def __init__(self, *, name: str, path: str, max_size: int = 10000):
+        self.name = name
+        self.path = path
+        self.max_size = max_size
+        self._table = f"{name}_cache"
+        self._lock = threading.Lock()
+        self._num_writes = itertools.count(1)
+        with self._connect() as conn:
+            conn.execute(
+                f"CREATE TABLE IF NOT EXISTS {self._table} ("
+                "cache_key TEXT PRIMARY KEY, value TEXT NOT NULL, accessed_at REAL NOT NULL)"
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=5)
+
+    def get(self, key: str) -> Optional[str]:
+        value = None
+        try:
+            with self._lock, self._connect() as conn:
+                row = conn.execute(
+                    f"SELECT value FROM {self._table} WHERE cache_key = ?", (key,)
+                ).fetchone()
+                if row is not None:
+                    value = row[0]
+                    conn.execute(
+                        f"UPDATE {self._table} SET accessed_at = ? WHERE cache_key = ?",
+                        (time.time(), key),
+                    )
+        except sqlite3.Error as e:
+            logging.warning(f"Failed to read {self.name} cache: {e}")
+        self._record(value is not None)
+        return value
+
+    def set(self, key: str, value: str) -> None:
+        try:
+            with self._lock, self._connect() as conn:
+                conn.execute(
+                    f"INSERT OR REPLACE INTO {self._table} (cache_key, value, accessed_at) VALUES (?, ?, ?)",
+                    (key, value, time.time()),
+                )
+                if next(self._num_writes) % 100 == 0:
+                    # Remove the least recently used entries exceeding the size limit
+                    conn.execute(
+                        f"DELETE FROM {self._table} WHERE cache_key IN ("
+                        f"SELECT cache_key FROM {self._table} ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                        (self.max_size,),
+                    )
+        except sqlite3.Error as e:
+            logging.warning(f"Failed to save {self.name} cache: {e}")
+
+
+class PostgresCacheStore(CacheStore):
+    """Cache shared by all the app instances connecting to the same database"""
+
+    def __init__(
+        self,
+        *,
+        name: str,
+        connection_params: dict,
+        max_size: int = 100000,
+        max_connections: int = 4,
+    ):
+        self.name = name
+        self.connection_params = connection_params
+        self.max_size = max_size
+        self.max_connections = max_connections
+        self._table = f"{name}_cache"
+        # Shared by the threads using the connection pool; next() on itertools.count() is atomic
+        self._num_writes = itertools.count(1)
+        self._pool_lock = threading.Lock()
+        self._pool: Optional[psycopg2.pool.ThreadedConnectionPool] = None
+        try:
+            with self._connection() as conn, conn.cursor() as cursor:
+                # updated_at is the last time the entry was read or written
+                cursor.execute(
+                    f"""
+                    CREATE TABLE IF NOT EXISTS {self._table} (
+                        cache_key TEXT PRIMARY KEY,
+                        value TEXT NOT NULL,
+                        updated_at TIMESTAMPTZ NOT NULL DEFAULT now()
+                    )
+                """
+                )
+        except Exception as e:
+            logging.warning(f"Failed to set up {self.name} cache table: {e}")
+
+    @contextmanager
+    def _connection(self) -> Iterator["psycopg2.extensions.connection"]:
+        # The connections are kept open and reused; a connection per lookup would cost more than the lookup
+        with self._pool_lock:
+            if self._pool is None:
+                self._pool = psycopg2.pool.ThreadedConnectionPool(
+                    1, self.max_connections, **self.connection_params
+                )
+        conn = self._pool.getconn()
+        try:
+            with conn:  # commits, or rolls back on errors
+                yield conn
+        except psycopg2.Error:
+            # The connection may be broken; don't put it back for reuse
+            self._pool.putconn(conn, close=True)
+            raise
+        except BaseException:
+            self._pool.putconn(conn)
+            raise
+        self._pool.putconn(conn)
+
+    def get(self, key: str) -> Optional[str]:
+        value = None
+        try:
+            with self._connection() as conn, conn.cursor() as cursor:
+                # Reading an entry refreshes updated_at so that the eviction removes the least recently used ones
+                cursor.execute(
+                    f"UPDATE {self._table} SET updated_at = now() WHERE cache_key = %s RETURNING value",
+                    (key,),
+                )
+                row = cursor.fetchone()
+                if row is not None:
+                    value = row[0]
+        except Exception as e:
+            logging.warning(f"Failed to read {self.name} cache: {e}")
+        self._record(value is not None)
+        return value
+
+    def set(self, key: str, value: str) -> None:
+        try:
+            with self._connection() as conn, conn.cursor() as cursor:
+                cursor.execute(
+                    f"""
+                    INSERT INTO {self._table} (cache_key, value)
+                    VALUES (%s, %s)
+                    ON CONFLICT (cache_key)
+                    DO UPDATE SET value = %s, updated_at = now()
+                """,
+                    (key, value, value),
+                )
+                if next(self._num_writes) % 100 == 0:
+                    cursor.execute(
+                        f"""
+                        DELETE FROM {self._table} WHERE cache_key IN (
+                            SELECT cache_key FROM {self._table} ORDER BY updated_at DESC OFFSET %s
+                        )
+                    """,
+                        (self.max_size,),
+                    )
+        except Exception as e:
+            logging.warning(f"Failed to save {self.name} cache: {e}")
+
+
+class TieredCacheStore(CacheStore):
+    """In-memory LRU cache in front of a shared (slower) store"""
+
+    def __init__(self, *, memory: InMemoryCacheStore, shared: CacheStore):
+        self.name = shared.name
+        self.memory = memory
+        self.shared = shared
+
+    def get(self, key: str) -> Optional[str]:
+        value = self.memory.get(key)
+        if value is not None:
+            return value
+        value = self.shared.get(key)
+        if value is not None:
+            self.memory.set(key, value)
+        return value
+
+    def set(self, key: str, value: str) -> None:
+        self.memory.set(key, value)
+        self.shared.set(key, value)
@@ -0,0 +1,59 @@
+import time
+from typing import Optional
+
+from slack_bolt import BoltContext
+
+from app.env import REPLY_TIME_RESERVE_SECONDS, REQUEST_TIMEOUT_SECONDS
+from app.metrics import increment_counter
+
+# ----------------------------
+# Request deadlines
+# ----------------------------
+#
+# A deadline is created when this app receives a request, and it's stored in the context as "deadline".
+# Every I/O stage (Slack API calls, image downloads, translations, OpenAI API calls) uses
+# the remaining time for its timeout instead of its own fixed timeout.
+# The optional stages (e.g., downloading images, translating texts) are skipped
+# when less than REPLY_TIME_RESERVE_SECONDS is left, so that the reply itself can still be generated.
+
+
+class Deadline:
+    def __init__(self, timeout_seconds: float, started_at: Optional[float] = None):
+        self.started_at = started_at if started_at is not None else time.time()
+        self.expires_at = self.started_at + timeout_seconds
+
+    def remaining(self, reserve_seconds: float = 0) -> float:
+        """The seconds left, excluding the reserved seconds for the later stages"""
+        return max(0.0, self.expires_at - time.time() - reserve_seconds)
+
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+    def timeout(self, max_seconds: Optional[float] = None) -> float:
+        """The timeout for a required stage. Raises TimeoutError when no time is left."""
+        remaining = self.remaining()
+        if remaining <= 0:
+            raise TimeoutError()
+        return remaining if max_seconds is None else min(remaining, max_seconds)
+
+    def optional_stage_timeout(self, stage: str) -> Optional[float]:
+        """The timeout for an optional stage, or None if the stage should be skipped"""
+        remaining = self.remaining(REPLY_TIME_RESERVE_SECONDS)
+        if remaining <= 0:
+            increment_counter("deadline_stages_skipped", stage=stage)
+            return None
+        return remaining
+
+
+def start_request_deadline(context: BoltContext) -> Deadline:
+    deadline = Deadline(REQUEST_TIMEOUT_SECONDS)
+    context["deadline"] = deadline
+    return deadline
+
+
+def get_request_deadline(context: BoltContext) -> Deadline:
+    deadline = context.get("deadline")
+    if deadline is None:
+        # e.g., a listener called without the middleware
+        deadline = start_request_deadline(context)
+    return deadline
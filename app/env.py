@@ -13,6 +13,15 @@ DEFAULT_OPENAI_TIMEOUT_SECONDS = 30
 OPENAI_TIMEOUT_SECONDS = int(
     os.environ.get("OPENAI_TIMEOUT_SECONDS", DEFAULT_OPENAI_TIMEOUT_SECONDS)
 )
+# The time limit for processing a request end to end (Slack API calls, image downloads, translations, OpenAI API calls)
+REQUEST_TIMEOUT_SECONDS = int(
+    os.environ.get("REQUEST_TIMEOUT_SECONDS", OPENAI_TIMEOUT_SECONDS)
+)
+# Optional stages such as image downloads and translations are skipped when less than this is left
+DEFAULT_REPLY_TIME_RESERVE_SECONDS = 10
+REPLY_TIME_RESERVE_SECONDS = int(
+    os.environ.get("REPLY_TIME_RESERVE_SECONDS", DEFAULT_REPLY_TIME_RESERVE_SECONDS)
+)
 
 DEFAULT_OPENAI_MODEL = "gpt-3.5-turbo"
 OPENAI_MODEL = os.environ.get("OPENAI_MODEL", DEFAULT_OPENAI_MODEL)
@@ -62,17 +71,247 @@ IMAGE_FILE_ACCESS_ENABLED = (
 
 # Redaction patterns
 #
-REDACT_EMAIL_PATTERN = os.environ.get(
-    "REDACT_EMAIL_PATTERN", r"\b[A-Za-z0-9.*%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}\b"
+DEFAULT_REDACT_EMAIL_PATTERN = r"\b[A-Za-z0-9.*%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}\b"
+REDACT_EMAIL_PATTERN = os.environ.get("REDACT_EMAIL_PATTERN", DEFAULT_REDACT_EMAIL_PATTERN)
+DEFAULT_REDACT_PHONE_PATTERN = r"\(?\d{3}\)?[-.\s]?\d{3}[-.\s]?\d{4}\b"
+REDACT_PHONE_PATTERN = os.environ.get("REDACT_PHONE_PATTERN", DEFAULT_REDACT_PHONE_PATTERN)
+DEFAULT_REDACT_CREDIT_CARD_PATTERN = r"\b\d{4}[- ]?\d{4}[- ]?\d{4}[- ]?\d{4}\b"
+REDACT_CREDIT_CARD_PATTERN = os.environ.get(
+    "REDACT_CREDIT_CARD_PATTERN", DEFAULT_REDACT_CREDIT_CARD_PATTERN
 )
-REDACT_PHONE_PATTERN = os.environ.get(
-    "REDACT_PHONE_PATTERN", r"\(?\d{3}\)?[-.\s]?\d{3}[-.\s]?\d{4}\b"
+DEFAULT_REDACT_SSN_PATTERN = r"\b\d{3}[- ]?\d{2}[- ]?\d{4}\b"
+REDACT_SSN_PATTERN = os.environ.get("REDACT_SSN_PATTERN", DEFAULT_REDACT_SSN_PATTERN)
+# For REDACT_USER_DEFINED_PATTERN, the default will never match anything
+DEFAULT_REDACT_USER_DEFINED_PATTERN = r"(?!)"
+REDACT_USER_DEFINED_PATTERN = os.environ.get(
+    "REDACT_USER_DEFINED_PATTERN", DEFAULT_REDACT_USER_DEFINED_PATTERN
 )
-REDACT_CREDIT_CARD_PATTERN = os.environ.get(
-    "REDACT_CREDIT_CARD_PATTERN", r"\b\d{4}[- ]?\d{4}[- ]?\d{4}[- ]?\d{4}\b"
+
+# Translation cache
+#
+# "memory": LRU cache within this process
+# "sqlite": the LRU cache + a local SQLite file shared by the processes on the same machine
+# "postgres": the LRU cache + a table in the database that stores openai_configs (main_koyeb.py only)
+TRANSLATION_CACHE_BACKEND = os.environ.get("TRANSLATION_CACHE_BACKEND", "memory")
+DEFAULT_TRANSLATION_CACHE_MAX_SIZE = 5000
+TRANSLATION_CACHE_MAX_SIZE = int(
+    os.environ.get("TRANSLATION_CACHE_MAX_SIZE", DEFAULT_TRANSLATION_CACHE_MAX_SIZE)
 )
-REDACT_SSN_PATTERN = os.environ.get(
-    "REDACT_SSN_PATTERN", r"\b\d{3}[- ]?\d{2}[- ]?\d{4}\b"
+DEFAULT_TRANSLATION_CACHE_SQLITE_PATH = "/tmp/slack-app-translation-cache.sqlite3"
+TRANSLATION_CACHE_SQLITE_PATH = os.environ.get(
+    "TRANSLATION_CACHE_SQLITE_PATH", DEFAULT_TRANSLATION_CACHE_SQLITE_PATH
+)
+
+# Translation catalog
+#
+# A JSON file generated by `python -m app.i18n_catalog {path}` that is loaded into the translation cache at startup
+TRANSLATION_CATALOG_PATH = os.environ.get("TRANSLATION_CATALOG_PATH")
+# When "true", translations for all the UI strings are generated in the background at startup
+TRANSLATION_WARM_UP_ENABLED = (
+    os.environ.get("TRANSLATION_WARM_UP_ENABLED", "false") == "true"
+)
+DEFAULT_TRANSLATION_WARM_UP_CONCURRENCY = 4
+TRANSLATION_WARM_UP_CONCURRENCY = int(
+    os.environ.get(
+        "TRANSLATION_WARM_UP_CONCURRENCY", DEFAULT_TRANSLATION_WARM_UP_CONCURRENCY
+    )
+)
+
+# Long text translation (translate-message shortcut)
+#
+# Texts longer than TRANSLATION_CHUNK_SIZE characters are split on paragraph / code block boundaries
+# and the chunks are translated concurrently
+DEFAULT_TRANSLATION_CHUNK_SIZE = 1000
+TRANSLATION_CHUNK_SIZE = int(
+    os.environ.get("TRANSLATION_CHUNK_SIZE", DEFAULT_TRANSLATION_CHUNK_SIZE)
+)
+DEFAULT_TRANSLATION_MAX_CONCURRENCY = 4
+TRANSLATION_MAX_CONCURRENCY = int(
+    os.environ.get("TRANSLATION_MAX_CONCURRENCY", DEFAULT_TRANSLATION_MAX_CONCURRENCY)
+)
+
+# OpenAI stream timeouts
+#
+# A streamed response is abandoned when its first chunk doesn't arrive within this number of seconds
+DEFAULT_OPENAI_FIRST_TOKEN_TIMEOUT_SECONDS = 20
+OPENAI_FIRST_TOKEN_TIMEOUT_SECONDS = float(
+    os.environ.get(
+        "OPENAI_FIRST_TOKEN_TIMEOUT_SECONDS", DEFAULT_OPENAI_FIRST_TOKEN_TIMEOUT_SECONDS
+    )
+)
+# ... or when no chunk arrives for this number of seconds in the middle of the response
+DEFAULT_OPENAI_STREAM_STALL_TIMEOUT_SECONDS = 10
+OPENAI_STREAM_STALL_TIMEOUT_SECONDS = float(
+    os.environ.get(
+        "OPENAI_STREAM_STALL_TIMEOUT_SECONDS", DEFAULT_OPENAI_STREAM_STALL_TIMEOUT_SECONDS
+    )
+)
+
+# Resuming broken OpenAI streams
+#
+# When a reply stream breaks partway (a connection error, a 5xx error or a stall),
+# a new request asks the model to continue from the partial reply, up to this number of times
+DEFAULT_OPENAI_STREAM_RESUME_MAX_ATTEMPTS = 2
+OPENAI_STREAM_RESUME_MAX_ATTEMPTS = int(
+    os.environ.get(
+        "OPENAI_STREAM_RESUME_MAX_ATTEMPTS", DEFAULT_OPENAI_STREAM_RESUME_MAX_ATTEMPTS
+    )
+)
+# The base of the exponential backoff (with full jitter) before each attempt
+DEFAULT_OPENAI_STREAM_RESUME_BACKOFF_SECONDS = 0.5
+OPENAI_STREAM_RESUME_BACKOFF_SECONDS = float(
+    os.environ.get(
+        "OPENAI_STREAM_RESUME_BACKOFF_SECONDS", DEFAULT_OPENAI_STREAM_RESUME_BACKOFF_SECONDS
+    )
+)
+
+# Model fallback routing
+#
+# A comma-separated list of models (e.g., "gpt-4o,gpt-4o-mini"). When a model in the list is failing
+# or too slow, the requests go to the models after it.
+OPENAI_MODEL_FALLBACK_CHAIN = os.environ.get("OPENAI_MODEL_FALLBACK_CHAIN")
+# The circuit opens when this ratio of the recent requests to a model have failed
+DEFAULT_MODEL_CIRCUIT_ERROR_RATE = 0.5
+MODEL_CIRCUIT_ERROR_RATE = float(
+    os.environ.get("MODEL_CIRCUIT_ERROR_RATE", DEFAULT_MODEL_CIRCUIT_ERROR_RATE)
+)
+# ... once there are at least this number of requests in the window
+DEFAULT_MODEL_CIRCUIT_MIN_REQUESTS = 5
+MODEL_CIRCUIT_MIN_REQUESTS = int(
+    os.environ.get("MODEL_CIRCUIT_MIN_REQUESTS", DEFAULT_MODEL_CIRCUIT_MIN_REQUESTS)
+)
+DEFAULT_MODEL_CIRCUIT_WINDOW_SECONDS = 60
+MODEL_CIRCUIT_WINDOW_SECONDS = float(
+    os.environ.get("MODEL_CIRCUIT_WINDOW_SECONDS", DEFAULT_MODEL_CIRCUIT_WINDOW_SECONDS)
+)
+# How long an open circuit waits before probing the model again
+DEFAULT_MODEL_CIRCUIT_OPEN_SECONDS = 30
+MODEL_CIRCUIT_OPEN_SECONDS = float(
+    os.environ.get("MODEL_CIRCUIT_OPEN_SECONDS", DEFAULT_MODEL_CIRCUIT_OPEN_SECONDS)
+)
+# The circuit also opens when the 95th percentile of the time to the first token exceeds this (0 disables it)
+DEFAULT_MODEL_TTFT_SLO_SECONDS = 10
+MODEL_TTFT_SLO_SECONDS = float(
+    os.environ.get("MODEL_TTFT_SLO_SECONDS", DEFAULT_MODEL_TTFT_SLO_SECONDS)
+)
+
+# Long streamed replies
+#
+# When a reply being streamed grows beyond this number of characters,
+# the message is finalized at a safe boundary and the reply continues in a new message in the thread
+DEFAULT_STREAMING_REPLY_ROLLOVER_LENGTH = 3000
+STREAMING_REPLY_ROLLOVER_LENGTH = int(
+    os.environ.get(
+        "STREAMING_REPLY_ROLLOVER_LENGTH", DEFAULT_STREAMING_REPLY_ROLLOVER_LENGTH
+    )
+)
+# The min interval between the updates of a modal (or a summary message) displaying a result being streamed
+DEFAULT_STREAMING_RESULT_UPDATE_INTERVAL_SECONDS = 1.0
+STREAMING_RESULT_UPDATE_INTERVAL_SECONDS = float(
+    os.environ.get(
+        "STREAMING_RESULT_UPDATE_INTERVAL_SECONDS",
+        DEFAULT_STREAMING_RESULT_UPDATE_INTERVAL_SECONDS,
+    )
+)
+
+# Slack Web API rate limiting
+#
+# When "true", Slack API calls made while handling requests are scheduled with client-side token buckets
+# per (workspace, API method, channel) so that they rarely hit 429 errors
+SLACK_API_RATE_LIMITER_ENABLED = (
+    os.environ.get("SLACK_API_RATE_LIMITER_ENABLED", "true") == "true"
+)
+
+# HTTP connection pooling
+#
+# The Slack API calls and file downloads share keep-alive connections.
+# At most this number of connections are opened to each host; other requests wait for a free connection.
+DEFAULT_HTTP_MAX_CONNECTIONS_PER_HOST = 10
+HTTP_MAX_CONNECTIONS_PER_HOST = int(
+    os.environ.get("HTTP_MAX_CONNECTIONS_PER_HOST", DEFAULT_HTTP_MAX_CONNECTIONS_PER_HOST)
+)
+
+# Bot user ID cache
+#
+# The Slack user IDs of the bots (integrations) that posted in threads are cached per workspace
+DEFAULT_BOT_USER_ID_CACHE_TTL_SECONDS = 3600
+BOT_USER_ID_CACHE_TTL_SECONDS = int(
+    os.environ.get("BOT_USER_ID_CACHE_TTL_SECONDS", DEFAULT_BOT_USER_ID_CACHE_TTL_SECONDS)
+)
+
+# Thread summaries
+#
+# How to fit a long thread into the model's context window:
+# "oldest_first": the oldest replies (stops fetching replies once the budget is used up)
+# "newest_first": the newest replies
+# "head_tail": the oldest replies for the first half of the budget, and the newest ones for the rest
+THREAD_SUMMARY_TRANSCRIPT_STRATEGY = os.environ.get(
+    "THREAD_SUMMARY_TRANSCRIPT_STRATEGY", "head_tail"
+)
+# When "true", threads that don't fit in the context window are summarized in parts (map-reduce)
+THREAD_SUMMARY_MAP_REDUCE_ENABLED = (
+    os.environ.get("THREAD_SUMMARY_MAP_REDUCE_ENABLED", "true") == "true"
+)
+# The max number of tokens in each part of a thread summarized separately
+DEFAULT_THREAD_SUMMARY_CHUNK_TOKENS = 4000
+THREAD_SUMMARY_CHUNK_TOKENS = int(
+    os.environ.get("THREAD_SUMMARY_CHUNK_TOKENS", DEFAULT_THREAD_SUMMARY_CHUNK_TOKENS)
+)
+# Threads longer than this number of parts are shortened with THREAD_SUMMARY_TRANSCRIPT_STRATEGY
+DEFAULT_THREAD_SUMMARY_MAX_CHUNKS = 16
+THREAD_SUMMARY_MAX_CHUNKS = int(
+    os.environ.get("THREAD_SUMMARY_MAX_CHUNKS", DEFAULT_THREAD_SUMMARY_MAX_CHUNKS)
+)
+# The max number of parts summarized at the same time
+DEFAULT_THREAD_SUMMARY_MAX_CONCURRENCY = 4
+THREAD_SUMMARY_MAX_CONCURRENCY = int(
+    os.environ.get(
+        "THREAD_SUMMARY_MAX_CONCURRENCY", DEFAULT_THREAD_SUMMARY_MAX_CONCURRENCY
+    )
+)
+# Where the thread summaries are cached to summarize only the new replies next time
+# (the same backends as TRANSLATION_CACHE_BACKEND; sqlite uses TRANSLATION_CACHE_SQLITE_PATH)
+THREAD_SUMMARY_CACHE_BACKEND = os.environ.get("THREAD_SUMMARY_CACHE_BACKEND", "memory")
+DEFAULT_THREAD_SUMMARY_CACHE_MAX_SIZE = 1000
+THREAD_SUMMARY_CACHE_MAX_SIZE = int(
+    os.environ.get("THREAD_SUMMARY_CACHE_MAX_SIZE", DEFAULT_THREAD_SUMMARY_CACHE_MAX_SIZE)
+)
+
+# Background pre-summarization of hot threads
+#
+# When "true", the threads that get many replies are summarized in the background ahead of time
+# (long-running processes only; not available on AWS Lambda)
+HOT_THREAD_PRESUMMARY_ENABLED = (
+    os.environ.get("HOT_THREAD_PRESUMMARY_ENABLED", "false") == "true"
+)
+# A thread is "hot" when this app has seen this number of replies in it
+DEFAULT_HOT_THREAD_MIN_REPLIES = 30
+HOT_THREAD_MIN_REPLIES = int(
+    os.environ.get("HOT_THREAD_MIN_REPLIES", DEFAULT_HOT_THREAD_MIN_REPLIES)
+)
+# ... or when it gets HOT_THREAD_VELOCITY_REPLIES replies within HOT_THREAD_VELOCITY_WINDOW_SECONDS
+DEFAULT_HOT_THREAD_VELOCITY_REPLIES = 10
+HOT_THREAD_VELOCITY_REPLIES = int(
+    os.environ.get("HOT_THREAD_VELOCITY_REPLIES", DEFAULT_HOT_THREAD_VELOCITY_REPLIES)
+)
+DEFAULT_HOT_THREAD_VELOCITY_WINDOW_SECONDS = 300
+HOT_THREAD_VELOCITY_WINDOW_SECONDS = int(
+    os.environ.get(
+        "HOT_THREAD_VELOCITY_WINDOW_SECONDS", DEFAULT_HOT_THREAD_VELOCITY_WINDOW_SECONDS
+    )
+)
+# The min interval between the background summaries of the same thread
+DEFAULT_HOT_THREAD_REFRESH_INTERVAL_SECONDS = 300
+HOT_THREAD_REFRESH_INTERVAL_SECONDS = int(
+    os.environ.get(
+        "HOT_THREAD_REFRESH_INTERVAL_SECONDS", DEFAULT_HOT_THREAD_REFRESH_INTERVAL_SECONDS
+    )
+)
+# The max number of background summaries per workspace per hour
+DEFAULT_HOT_THREAD_SUMMARIES_PER_TEAM_PER_HOUR = 20
+HOT_THREAD_SUMMARIES_PER_TEAM_PER_HOUR = int(
+    os.environ.get(
+        "HOT_THREAD_SUMMARIES_PER_TEAM_PER_HOUR",
+        DEFAULT_HOT_THREAD_SUMMARIES_PER_TEAM_PER_HOUR,
+    )
 )
-# For REDACT_USER_DEFINED_PATTERN, the default will never match anything
-REDACT_USER_DEFINED_PATTERN = os.environ.get("REDACT_USER_DEFINED_PATTERN", r"(?!)")
@@ -0,0 +1,204 @@
+import logging
+import threading
+import time
+from collections import deque
+from typing import Callable, Deque, Dict, Optional, Tuple
+
+from slack_bolt import BoltContext
+
+from app.env import (
+    HOT_THREAD_MIN_REPLIES,
+    HOT_THREAD_VELOCITY_REPLIES,
+    HOT_THREAD_VELOCITY_WINDOW_SECONDS,
+    HOT_THREAD_REFRESH_INTERVAL_SECONDS,
+    HOT_THREAD_SUMMARIES_PER_TEAM_PER_HOUR,
+)
+from app.metrics import increment_counter
+from app.slack_rate_limiter import default_scheduler
+
+# ----------------------------
+# Background pre-summarization of hot threads
+# ----------------------------
+#
+# In busy channels (e.g., incident channels), many people summarize the same long thread.
+# The replies posted in threads are counted as the message events arrive, and the threads
+# that have many replies, or that are getting replies quickly, are summarized in the background
+# while this app has nothing else to do. The summaries are saved in the thread summary cache,
+# so the "summarize-thread" shortcut only has to summarize the replies posted after that.
+# This requires a long-running process; AWS Lambda functions don't run the background worker.
+
+# The threads that have not received any reply for this long are forgotten
+THREAD_EXPIRATION_SECONDS = 86400
+MAX_TRACKED_THREADS = 1000
+# How often the background worker looks for a thread to summarize
+POLL_INTERVAL_SECONDS = 5
+
+ThreadKey = Tuple[str, str, str]
+
+
+class _TrackedThread:
+    def __init__(self, context: BoltContext, channel: str, thread_ts: str):
+        self.context = context
+        self.channel = channel
+        self.thread_ts = thread_ts
+        self.replies = 0
+        self.replies_since_summary = 0
+        self.recent_replies: Deque[float] = deque()
+        self.last_reply_at = 0.0
+        self.last_summarized_at: Optional[float] = None
+        # Once a thread gets hot, it stays hot until it's forgotten
+        self.hot = False
+
+
+def _is_idle() -> bool:
+    return default_scheduler.queue_depth() == 0
+
+
+class HotThreadScheduler:
+    def __init__(
+        self,
+        summarize: Callable[[BoltContext, str, str], None],
+        *,
+        min_replies: int = HOT_THREAD_MIN_REPLIES,
+        velocity_replies: int = HOT_THREAD_VELOCITY_REPLIES,
+        velocity_window_seconds: float = HOT_THREAD_VELOCITY_WINDOW_SECONDS,
+        refresh_interval_seconds: float = HOT_THREAD_REFRESH_INTERVAL_SECONDS,
+        summaries_per_team_per_hour: int = HOT_THREAD_SUMMARIES_PER_TEAM_PER_HOUR,
+        is_idle: Callable[[], bool] = _is_idle,
+        run_in_background: bool = True,
+    ):
+        self.summarize = summarize
+        self.min_replies = min_replies
+        self.velocity_replies = velocity_replies
+        self.velocity_window_seconds = velocity_window_seconds
+        self.refresh_interval_seconds = refresh_interval_seconds
+        self.summaries_per_team_per_hour = summaries_per_team_per_hour
+        self.is_idle = is_idle
+        self.run_in_background = run_in_background
+        self._lock = threading.Lock()
+        self._threads: Dict[ThreadKey, _TrackedThread] = {}
+        # team -> the times when the summaries for the team started in the last hour
+        self._team_summaries: Dict[str, Deque[float]] = {}
+        self._worker: Optional[threading.Thread] = None
+
+    def record_reply(
+        self, *, context: BoltContext, payload: dict, now: Optional[float] = None
+    ) -> None:
+        thread_ts = payload.get("thread_ts")
+        channel = payload.get("channel") or context.channel_id
+        if thread_ts is None or payload.get("ts") == thread_ts or channel is None:
+            return
+        if payload.get("channel_type") == "im":
+            return
+        if payload.get("bot_id") is not None and payload.get("bot_id") == context.bot_id:
+            # The replies (and summaries) by this app
+            return
+        if context.get("OPENAI_API_KEY") is None:
+            return
+
+        now = now if now is not None else time.time()
+        key = (context.team_id or context.enterprise_id, channel, thread_ts)
+        with self._lock:
+            thread = self._threads.pop(key, None)
+            if thread is None:
+                thread = _TrackedThread(context, channel, thread_ts)
+            # Keep the latest context (e.g., a rotated token or a new OpenAI API key)
+            thread.context = context
+            thread.replies += 1
+            thread.replies_since_summary += 1
+            thread.last_reply_at = now
+            thread.recent_replies.append(now)
+            while thread.recent_replies[0] <= now - self.velocity_window_seconds:
+                thread.recent_replies.popleft()
+            if (
+                thread.replies >= self.min_replies
+                or len(thread.recent_replies) >= self.velocity_replies
+            ):
+                thread.hot = True
+            # The most recently active threads are at the end
+            self._threads[key] = thread
+            self._forget_inactive_threads(now)
+        self._start_worker()
+
+    def _forget_inactive_threads(self, now: float) -> None:
+        for key in list(self._threads.keys()):
+            thread = self._threads[key]
+            if (
+                len(self._threads) <= MAX_TRACKED_THREADS
+                and thread.last_reply_at > now - THREAD_EXPIRATION_SECONDS
+            ):
+                break
+            del self._threads[key]
+
+    def _has_budget(self, team: str, now: float) -> bool:
+        started = self._team_summaries.setdefault(team, deque())
+        while len(started) > 0 and started[0] <= now - 3600:
+            started.popleft()
+        return len(started) < self.summaries_per_team_per_hour
+
+    def _pick_thread(self, now: float) -> Optional[Tuple[ThreadKey, _TrackedThread, int]]:
+        candidates = []
+        for key, thread in self._threads.items():
+            if thread.hot is False or thread.replies_since_summary == 0:
+                continue
+            if (
+                thread.last_summarized_at is not None
+                and thread.last_summarized_at > now - self.refresh_interval_seconds
+            ):
+                continue
+            if not self._has_budget(key[0], now):
+                continue
+            candidates.append((key, thread))
+        if len(candidates) == 0:
+            return None
+        # The thread with the most replies that the cached summary doesn't cover goes first
+        key, thread = max(candidates, key=lambda c: c[1].replies_since_summary)
+        return key, thread, thread.replies_since_summary
+
+    def run_once(self, now: Optional[float] = None) -> bool:
+        """Summarizes one hot thread if this app is idle. Returns True if a thread has been summarized."""
+        now = now if now is not None else time.time()
+        if not self.is_idle():
+            return False
+        with self._lock:
+            picked = self._pick_thread(now)
+            if picked is None:
+                return False
+            key, thread, replies = picked
+            self._team_summaries[key[0]].append(now)
+            thread.last_summarized_at = now
+            # Replies posted while summarizing are counted for the next refresh
+            thread.replies_since_summary -= replies
+
+        try:
+            self.summarize(thread.context, thread.channel, thread.thread_ts)
+            increment_counter("hot_thread_presummaries", status="success")
+        except Exception as e:
+            increment_counter("hot_thread_presummaries", status="failure")
+            logging.getLogger(__name__).warning(
+                f"Failed to summarize a thread in the background (channel: {thread.channel}, "
+                f"thread_ts: {thread.thread_ts}, error: {e})"
+            )
+        return True
+
+    def _start_worker(self) -> None:
+        with self._lock:
+            if self._worker is not None or self.run_in_background is False:
+                return
+            self._worker = threading.Thread(
+                target=self._run, name="hot-thread-presummarizer", daemon=True
+            )
+        self._worker.start()
+
+    def _run(self) -> None:
+        while True:
+            time.sleep(POLL_INTERVAL_SECONDS)
+            try:
+                while self.run_once():
+                    pass
+            except Exception as e:
+                logging.getLogger(__name__).exception(f"Hot thread worker error: {e}")
+
+    def tracked_threads(self) -> int:
+        with self._lock:
+            return len(self._threads)
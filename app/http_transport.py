@@ -0,0 +1,155 @@
+import io
+import logging
+import threading
+from email.message import Message
+from typing import Any, Dict, Optional
+from urllib.error import HTTPError, URLError
+from urllib.request import Request
+
+import requests
+from requests.adapters import HTTPAdapter
+from slack_sdk.web import WebClient
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+from app.deadline import Deadline
+from app.env import HTTP_MAX_CONNECTIONS_PER_HOST
+from app.metrics import get_counter, increment_counter
+
+# ----------------------------
+# Keep-alive HTTP transport
+# ----------------------------
+#
+# slack_sdk's WebClient opens a new connection (and does a TLS handshake) for every API call.
+# As a single reply can make dozens of calls (history, post, updates, ...), the Slack API calls and
+# the file downloads share pooled keep-alive connections instead.
+# The reuse rate can be calculated from the http_requests and http_connections_opened counters.
+
+
+class _CountingHTTPConnectionPool(HTTPConnectionPool):
+    def _new_conn(self):
+        increment_counter("http_connections_opened", host=self.host)
+        return super()._new_conn()
+
+
+class _CountingHTTPSConnectionPool(HTTPSConnectionPool):
+    def _new_conn(self):
+        increment_counter("http_connections_opened", host=self.host)
+        return super()._new_conn()
+
+
+class _PooledHTTPAdapter(HTTPAdapter):
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": _CountingHTTPConnectionPool,
+            "https": _CountingHTTPSConnectionPool,
+        }
+
+    def send(self, request, *args, **kwargs):
+        increment_counter("http_requests", host=requests.utils.urlparse(request.url).hostname)
+        return super().send(request, *args, **kwargs)
+
+
+_session: Optional[requests.Session] = None
+_session_lock = threading.Lock()
+
+
+def http_session() -> requests.Session:
+    """Returns the requests session shared by all the threads in this process"""
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            adapter = _PooledHTTPAdapter(
+                pool_maxsize=HTTP_MAX_CONNECTIONS_PER_HOST,
+                pool_block=True,
+            )
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            _session = session
+        return _session
+
+
+def connection_reuse_rate(host: str) -> float:
+    """Returns the ratio of the requests to the host that reused an existing connection"""
+    total = get_counter("http_requests", host=host)
+    if total == 0:
+        return 0.0
+    return max(0.0, 1 - get_counter("http_connections_opened", host=host) / total)
+
+
+# Slack API calls made after the request deadline (e.g., posting an error message) can take this long
+MIN_SLACK_API_TIMEOUT_SECONDS = 3
+
+
+class PooledWebClient(WebClient):
+    """A WebClient that sends the API calls over the shared keep-alive connections"""
+
+    # When set, each API call's timeout is limited to the remaining time of the request
+    deadline: Optional[Deadline] = None
+
+    def _request_timeout(self) -> float:
+        if self.deadline is None:
+            return self.timeout
+        return max(
+            MIN_SLACK_API_TIMEOUT_SECONDS, min(self.timeout, self.deadline.remaining())
+        )
+
+    def _perform_urllib_http_request_internal(
+        self,
+        url: str,
+        req: Request,
+    ) -> Dict[str, Any]:
+        if self.ssl is not None or self.proxy is not None or not url.lower().startswith("http"):
+            # Custom SSL contexts and proxies are supported only by the urllib transport
+            return super()._perform_urllib_http_request_internal(url, req)
+        try:
+            resp = http_session().request(
+                req.get_method(),
+                url,
+                data=req.data,
+                headers=dict(req.header_items()),
+                timeout=self._request_timeout(),
+            )
+        except requests.exceptions.ConnectionError as e:
+            # ConnectionErrorRetryHandler retries URLErrors
+            raise URLError(e)
+        if resp.status_code >= 400:
+            # The same error as urlopen so that the retry handlers (e.g., for 429) work as usual
+            headers = Message()
+            for name, value in resp.headers.items():
+                headers[name] = value
+            raise HTTPError(url, resp.status_code, resp.reason, headers, io.BytesIO(resp.content))
+        if resp.headers.get("Content-Type", "").startswith("application/gzip"):
+            body: Any = resp.content
+        else:
+            body = resp.content.decode(resp.encoding or "utf-8")
+        if self._logger.level <= logging.DEBUG:
+            self._logger.debug(
+                "Received the following response - "
+                f"status: {resp.status_code}, "
+                f"headers: {dict(resp.headers)}, "
+                f"body: {body if isinstance(body, str) else '(binary)'}"
+            )
+        return {"status": resp.status_code, "headers": resp.headers, "body": body}
+
+
+def web_client_settings(client: WebClient) -> Dict[str, Any]:
+    """Returns the constructor arguments to create a WebClient with the same settings as the given one"""
+    return {
+        "token": client.token,
+        "base_url": client.base_url,
+        "timeout": client.timeout,
+        "ssl": client.ssl,
+        "proxy": client.proxy,
+        "headers": client.headers,
+        "team_id": client.default_params.get("team_id"),
+        "logger": client.logger,
+        "retry_handlers": list(client.retry_handlers),
+    }
+
+
+def build_pooled_client(client: WebClient, team_id: Optional[str] = None) -> PooledWebClient:
+    settings = web_client_settings(client)
+    settings["team_id"] = team_id or settings["team_id"]
+    return PooledWebClient(**settings)
@@ -1,10 +1,38 @@
-from typing import Optional
+import hashlib
+import json
+import logging
+import re
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional, Dict, List, Tuple, Union
 
-from openai import OpenAI
+from openai import APITimeoutError, BadRequestError, OpenAI
 from openai.lib.azure import AzureOpenAI
 from slack_bolt import BoltContext
 
+from .cache_store import (
+    CacheStore,
+    InMemoryCacheStore,
+    SQLiteCacheStore,
+    PostgresCacheStore,
+    TieredCacheStore,
+)
+from .env import (
+    REPLY_TIME_RESERVE_SECONDS,
+    TRANSLATION_CACHE_BACKEND,
+    TRANSLATION_CACHE_MAX_SIZE,
+    TRANSLATION_CACHE_SQLITE_PATH,
+    TRANSLATION_CHUNK_SIZE,
+    TRANSLATION_MAX_CONCURRENCY,
+)
+from .language_detection import (
+    detect_language,
+    has_language_content,
+    is_written_in,
+    split_paragraphs,
+)
+from .metrics import increment_counter
 from .openai_constants import GPT_4O_MINI_MODEL
+from .singleflight import SingleFlight
 
 # All the supported languages for Slack app as of March 2023
 _locale_to_lang = {
@@ -30,43 +58,206 @@ def from_locale_to_lang(locale: Optional[str]) -> Optional[str]:
     return _locale_to_lang.get(locale)
 
 
-_translation_result_cache = {}
+# Bump this version when changing the translation prompt below
+# so that the results generated by the previous prompt are no longer used
+TRANSLATION_PROMPT_VERSION = "2"
 
 
-def translate(*, openai_api_key: Optional[str], context: BoltContext, text: str) -> str:
-    if openai_api_key is None or len(openai_api_key.strip()) == 0:
-        return text
+def build_translation_store(
+    backend: str = TRANSLATION_CACHE_BACKEND,
+    postgres_connection_params: Optional[dict] = None,
+) -> CacheStore:
+    memory = InMemoryCacheStore(
+        name="translation_memory", max_size=TRANSLATION_CACHE_MAX_SIZE
+    )
+    if backend == "sqlite":
+        return TieredCacheStore(
+            memory=memory,
+            shared=SQLiteCacheStore(
+                name="translation",
+                path=TRANSLATION_CACHE_SQLITE_PATH,
+                max_size=TRANSLATION_CACHE_MAX_SIZE * 10,
+            ),
+        )
+    if backend == "postgres":
+        if postgres_connection_params is not None:
+            return TieredCacheStore(
+                memory=memory,
+                shared=PostgresCacheStore(
+                    name="translation",
+                    connection_params=postgres_connection_params,
+                    max_size=TRANSLATION_CACHE_MAX_SIZE * 10,
+                ),
+            )
+        logging.warning(
+            "No database connection information available for the translation cache. Using in-memory cache."
+        )
+    elif backend != "memory":
+        logging.warning(
+            f"Unknown translation cache backend: {backend}. Using in-memory cache."
+        )
+    return memory
 
-    lang = from_locale_to_lang(context.get("locale"))
-    if lang is None or lang == "English":
-        return text
 
-    cached_result = _translation_result_cache.get(f"{lang}:{text}")
-    if cached_result is not None:
-        return cached_result
+_translation_store: CacheStore = build_translation_store(
+    "sqlite" if TRANSLATION_CACHE_BACKEND == "sqlite" else "memory"
+)
+
+
+def set_translation_store(store: CacheStore) -> None:
+    global _translation_store
+    _translation_store = store
+
+
+def get_translation_store() -> CacheStore:
+    return _translation_store
+
+
+def _translation_cache_key(lang: str, text: str) -> str:
+    text_hash = hashlib.sha256(text.encode("utf-8")).hexdigest()
+    return f"{lang}:{text_hash}:{TRANSLATION_PROMPT_VERSION}"
+
+
+def save_translation(*, lang: str, text: str, translated_text: str) -> None:
+    _translation_store.set(_translation_cache_key(lang, text), translated_text)
+
+
+def supported_languages() -> Dict[str, str]:
+    """Returns the non-English languages that this app translates texts into (language -> a locale)"""
+    languages = {}
+    for locale, lang in _locale_to_lang.items():
+        if lang != "English" and lang not in languages:
+            languages[lang] = locale
+    return languages
+
+
+_TRANSLATION_SYSTEM_PROMPT = (
+    "You're the AI model that primarily focuses on the quality of language translation. "
+    "You always respond with the only the translated text in a format suitable for Slack user interface. "
+    "Slack's emoji (e.g., :hourglass_flowing_sand:) and mention parts must be kept as-is. "
+    "You don't change the meaning of sentences when translating them into a different language. "
+    "When the given text is a single verb/noun, its translated text must be a norm/verb form too. "
+    "When the given text is in markdown format, the format must be kept as much as possible. "
+    "Placeholders like ⟦0⟧ must be kept as-is. "
+)
+
+
+# The results are shared only when they succeed; one workspace's auth or quota error stays in that workspace
+_translation_flight = SingleFlight("translation", share_errors=False)
+_batch_translation_flight = SingleFlight("batch_translation", share_errors=False)
+
+
+def _translation_flight_key(openai_api_key: str, context: BoltContext, cache_key: str) -> str:
+    # Only the calls with the same credentials are coalesced, so every workspace pays for its own translations
+    credentials = f"{openai_api_key}:{context.get('OPENAI_API_BASE')}"
+    return f"{hashlib.sha256(credentials.encode('utf-8')).hexdigest()[:16]}:{cache_key}"
+
+
+def _create_translation_client(
+    openai_api_key: str, context: BoltContext
+) -> Union[OpenAI, AzureOpenAI]:
     if context.get("OPENAI_API_TYPE") == "azure":
-        client = AzureOpenAI(
+        return AzureOpenAI(
             api_key=openai_api_key,
             api_version=context.get("OPENAI_API_VERSION"),
             azure_endpoint=context.get("OPENAI_API_BASE"),
             azure_deployment=context.get("OPENAI_DEPLOYMENT_ID"),
         )
     else:
-        client = OpenAI(
+        return OpenAI(
             api_key=openai_api_key,
             base_url=context.get("OPENAI_API_BASE"),
         )
+
+
+def _no_time_for_translation(context: BoltContext) -> bool:
+    # When the request is running out of time, the original text is displayed instead
+    deadline = context.get("deadline")
+    return deadline is not None and deadline.optional_stage_timeout("translation") is None
+
+
+def _translation_timeout_kwargs(context: BoltContext) -> dict:
+    deadline = context.get("deadline")
+    if deadline is None:
+        return {}
+    return {"timeout": max(0.1, deadline.remaining(REPLY_TIME_RESERVE_SECONDS))}
+
+
+def _to_target_lang(openai_api_key: Optional[str], context: BoltContext) -> Optional[str]:
+    if openai_api_key is None or len(openai_api_key.strip()) == 0:
+        return None
+    lang = from_locale_to_lang(context.get("locale"))
+    if lang is None or lang == "English":
+        return None
+    return lang
+
+
+def translate(*, openai_api_key: Optional[str], context: BoltContext, text: str) -> str:
+    lang = _to_target_lang(openai_api_key, context)
+    if lang is None:
+        return text
+
+    # Detect the language of the text locally; paragraphs without any words (e.g., code blocks) are kept as-is
+    paragraphs = split_paragraphs(text)
+    languages = [
+        detect_language(p) if has_language_content(p) else lang for p in paragraphs
+    ]
+    if all(detected == lang for detected in languages):
+        increment_counter("translations_skipped", reason="same_language")
+        return text
+    if len(paragraphs) > 1 and lang in languages:
+        # Mixed-language text: translate only the paragraphs not written in the target language yet
+        increment_counter("translations_skipped", reason="mixed_language")
+        return _translate_other_language_paragraphs(
+            openai_api_key=openai_api_key,
+            context=context,
+            lang=lang,
+            paragraphs=paragraphs,
+            languages=languages,
+        )
+
+    cache_key = _translation_cache_key(lang, text)
+    cached_result = _translation_store.get(cache_key)
+    if cached_result is not None:
+        return cached_result
+    if _no_time_for_translation(context):
+        return text
+    try:
+        # Concurrent cache misses for the same text share one OpenAI API call
+        return _translation_flight.do(
+            _translation_flight_key(openai_api_key, context, cache_key),
+            lambda: _request_translation(
+                openai_api_key=openai_api_key,
+                context=context,
+                lang=lang,
+                text=text,
+                cache_key=cache_key,
+            ),
+        )
+    except APITimeoutError:
+        increment_counter("deadline_stages_skipped", stage="translation")
+        return text
+
+
+def _request_translation(
+    *,
+    openai_api_key: str,
+    context: BoltContext,
+    lang: str,
+    text: str,
+    cache_key: str,
+) -> str:
+    # Another call may have saved the result between the cache lookup and this call
+    cached_result = _translation_store.get(cache_key)
+    if cached_result is not None:
+        return cached_result
+    client = _create_translation_client(openai_api_key, context)
     response = client.chat.completions.create(
         model=GPT_4O_MINI_MODEL,
         messages=[
             {
                 "role": "system",
-                "content": "You're the AI model that primarily focuses on the quality of language translation. "
-                "You always respond with the only the translated text in a format suitable for Slack user interface. "
-                "Slack's emoji (e.g., :hourglass_flowing_sand:) and mention parts must be kept as-is. "
-                "You don't change the meaning of sentences when translating them into a different language. "
-                "When the given text is a single verb/noun, its translated text must be a norm/verb form too. "
-                "When the given text is in markdown format, the format must be kept as much as possible. ",
+                "content": _TRANSLATION_SYSTEM_PROMPT,
             },
             {
                 "role": "user",
@@ -85,7 +276,244 @@ def translate(*, openai_api_key: Optional[str], context: BoltContext, text: str)
         frequency_penalty=0,
         logit_bias={},
         user="system",
+        **_translation_timeout_kwargs(context),
     )
     translated_text = response.model_dump()["choices"][0]["message"].get("content")
-    _translation_result_cache[f"{lang}:{text}"] = translated_text
+    if not translated_text:
+        # No translation in the response; the original text is displayed instead
+        return text
+    _translation_store.set(cache_key, translated_text)
     return translated_text
+
+
+def _translate_other_language_paragraphs(
+    *,
+    openai_api_key: str,
+    context: BoltContext,
+    lang: str,
+    paragraphs: List[str],
+    languages: List[Optional[str]],
+) -> str:
+    indices = [
+        i
+        for i, (paragraph, detected) in enumerate(zip(paragraphs, languages))
+        if detected != lang
+    ]
+    translated_paragraphs = translate_many(
+        openai_api_key=openai_api_key,
+        context=context,
+        texts=[paragraphs[i] for i in indices],
+    )
+    results = list(paragraphs)
+    for i, translated_paragraph in zip(indices, translated_paragraphs):
+        results[i] = translated_paragraph
+    return "".join(results)
+
+
+def _translate_in_single_request(
+    *,
+    openai_api_key: str,
+    context: BoltContext,
+    lang: str,
+    texts: List[str],
+) -> Dict[str, str]:
+    """Translates the given texts in one chat completion.
+    Raises ValueError when the response does not contain the translations for all the texts."""
+    client = _create_translation_client(openai_api_key, context)
+    source = {str(i): text for i, text in enumerate(texts)}
+    response = client.chat.completions.create(
+        model=GPT_4O_MINI_MODEL,
+        messages=[
+            {
+                "role": "system",
+                "content": _TRANSLATION_SYSTEM_PROMPT,
+            },
+            {
+                "role": "user",
+                "content": f"Can you translate the following texts into {lang} in a professional tone? "
+                "The texts are given as a JSON object that maps IDs to the original texts. "
+                'Respond with a JSON object like {"translations": {"0": "...", "1": "..."}} '
+                "that maps the same IDs to the translation results. "
+                "Each result must omit any English version / pronunciation guide. "
+                f"Here are the original texts you need to translate:\n{json.dumps(source, ensure_ascii=False)}",
+            },
+        ],
+        top_p=1,
+        n=1,
+        max_tokens=4096,
+        temperature=1,
+        presence_penalty=0,
+        frequency_penalty=0,
+        logit_bias={},
+        user="system",
+        response_format={"type": "json_object"},
+        **_translation_timeout_kwargs(context),
+    )
+    content = response.model_dump()["choices"][0]["message"].get("content")
+    body = json.loads(content or "")
+    translations = body.get("translations") if isinstance(body, dict) else None
+    if not isinstance(translations, dict):
+        raise ValueError("The response does not have translations")
+    results = {}
+    for i, text in source.items():
+        translated_text = translations.get(i)
+        if not isinstance(translated_text, str) or len(translated_text.strip()) == 0:
+            raise ValueError(f"The translation for ID {i} is missing")
+        results[text] = translated_text
+    return results
+
+
+def translate_many(
+    *,
+    openai_api_key: Optional[str],
+    context: BoltContext,
+    texts: List[str],
+) -> List[str]:
+    """Translates multiple texts for a view, sending all the cache-miss texts in a single request"""
+    lang = _to_target_lang(openai_api_key, context)
+    if lang is None:
+        return list(texts)
+
+    results: Dict[str, str] = {}
+    missed_texts = []
+    for text in texts:
+        if text in results or text in missed_texts:
+            continue
+        if is_written_in(text, lang):
+            increment_counter("translations_skipped", reason="same_language")
+            results[text] = text
+            continue
+        cached_result = _translation_store.get(_translation_cache_key(lang, text))
+        if cached_result is not None:
+            results[text] = cached_result
+        else:
+            missed_texts.append(text)
+
+    if len(missed_texts) > 0 and _no_time_for_translation(context):
+        return [results.get(text, text) for text in texts]
+    if len(missed_texts) > 1:
+        try:
+            # The same view opened by many users at once results in the same set of texts
+            batch_key = _translation_cache_key(lang, json.dumps(missed_texts))
+            translations = _batch_translation_flight.do(
+                _translation_flight_key(openai_api_key, context, batch_key),
+                lambda: _translate_in_single_request(
+                    openai_api_key=openai_api_key,
+                    context=context,
+                    lang=lang,
+                    texts=missed_texts,
+                ),
+            )
+            for text, translated_text in translations.items():
+                save_translation(lang=lang, text=text, translated_text=translated_text)
+            results.update(translations)
+        except APITimeoutError:
+            increment_counter("deadline_stages_skipped", stage="translation")
+            return [results.get(text, text) for text in texts]
+        except (ValueError, BadRequestError) as e:
+            # Includes JSON parse errors and the models / deployments that don't support JSON mode;
+            # fall back to translating the texts one by one
+            logging.getLogger(__name__).debug(f"Failed to translate texts in a single request: {e}")
+
+    for text in missed_texts:
+        if text not in results:
+            results[text] = translate(
+                openai_api_key=openai_api_key, context=context, text=text
+            )
+    return [results[text] for text in texts]
+
+
+# ----------------------------
+# Long text translation
+# ----------------------------
+
+# Code, mentions, links and emoji are replaced with placeholders so that the model never changes them
+_PROTECTED_PATTERN = re.compile(
+    r"```.*?```|`[^`\n]+`|<[^>\n]+>|:[a-z0-9_+\-]+:", re.DOTALL
+)
+
+
+def _protect_markup(text: str) -> Tuple[str, List[str]]:
+    protected: List[str] = []
+
+    def _replace(match: re.Match) -> str:
+        protected.append(match.group(0))
+        return f"⟦{len(protected) - 1}⟧"
+
+    return _PROTECTED_PATTERN.sub(_replace, text), protected
+
+
+def _restore_markup(text: str, protected: List[str]) -> Optional[str]:
+    for i, original in enumerate(protected):
+        placeholder = f"⟦{i}⟧"
+        if placeholder not in text:
+            return None
+        text = text.replace(placeholder, original)
+    return text
+
+
+def split_into_chunks(text: str, chunk_size: int = TRANSLATION_CHUNK_SIZE) -> List[str]:
+    """Splits a text into chunks of about chunk_size characters on paragraph / code block boundaries.
+    A paragraph longer than chunk_size becomes a chunk by itself. Joining the chunks reproduces the text."""
+    chunks: List[str] = []
+    current = ""
+    for paragraph in split_paragraphs(text):
+        if len(current) > 0 and len(current) + len(paragraph) > chunk_size and paragraph.strip():
+            chunks.append(current)
+            current = ""
+        current += paragraph
+    if len(current) > 0:
+        chunks.append(current)
+    return chunks
+
+
+def _translate_chunk(*, openai_api_key: str, context: BoltContext, chunk: str) -> str:
+    # Keep the leading / trailing whitespace (paragraph separators) out of the translation
+    body = chunk.strip()
+    if len(body) == 0:
+        return chunk
+    prefix = chunk[: chunk.index(body)]
+    suffix = chunk[len(prefix) + len(body):]
+    protected_body, protected = _protect_markup(body)
+    translated = translate(
+        openai_api_key=openai_api_key, context=context, text=protected_body
+    )
+    restored = _restore_markup(translated, protected) if translated else None
+    if restored is None:
+        # The model dropped some of the placeholders; translate the original text instead
+        restored = translate(openai_api_key=openai_api_key, context=context, text=body) or body
+    return prefix + restored + suffix
+
+
+def translate_long_text(
+    *,
+    openai_api_key: Optional[str],
+    context: BoltContext,
+    text: str,
+    on_progress: Optional[Callable[[str], None]] = None,
+    chunk_size: int = TRANSLATION_CHUNK_SIZE,
+    max_workers: int = TRANSLATION_MAX_CONCURRENCY,
+) -> str:
+    """Translates a long text by splitting it into chunks that are translated concurrently.
+    on_progress receives the translated text of the leading chunks whenever it grows before completion."""
+    chunks = split_into_chunks(text, chunk_size)
+    if _to_target_lang(openai_api_key, context) is None or len(chunks) <= 1:
+        return translate(openai_api_key=openai_api_key, context=context, text=text)
+
+    results: List[str] = []
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [
+            executor.submit(
+                _translate_chunk,
+                openai_api_key=openai_api_key,
+                context=context,
+                chunk=chunk,
+            )
+            for chunk in chunks
+        ]
+        for future in futures:
+            # Wait in order; the remaining chunks are translated in the meantime
+            results.append(future.result())
+            if on_progress is not None and len(results) < len(chunks):
+                on_progress("".join(results))
+    return "".join(results)
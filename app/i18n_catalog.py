@@ -0,0 +1,178 @@
+import json
+import logging
+import os
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+from slack_bolt import BoltContext
+
+from app.env import (
+    OPENAI_API_TYPE,
+    OPENAI_API_BASE,
+    OPENAI_API_VERSION,
+    OPENAI_DEPLOYMENT_ID,
+    TRANSLATION_CATALOG_PATH,
+    TRANSLATION_WARM_UP_ENABLED,
+    TRANSLATION_WARM_UP_CONCURRENCY,
+)
+from app.i18n import (
+    TRANSLATION_PROMPT_VERSION,
+    save_translation,
+    supported_languages,
+    translate_many,
+)
+from app.slack_constants import DEFAULT_LOADING_TEXT, TIMEOUT_ERROR_MESSAGE
+from app.slack_ui import (
+    DEFAULT_SUMMARIZE_PROMPT,
+    HERE_IS_SUMMARY_TEXT,
+    DEFAULT_HOME_TAB_MESSAGE,
+    READY_HOME_TAB_MESSAGE,
+    CONFIGURE_MODAL_TEXTS,
+    CONFIGURE_MODEL_NOT_AVAILABLE_ERROR,
+    CONFIGURE_INVALID_API_KEY_ERROR,
+    build_home_tab_original_texts,
+)
+
+# ----------------------------
+# Pre-translation catalog
+# ----------------------------
+#
+# All the UI strings passed to translate() on latency-critical paths.
+# When adding a new translate() call with a constant text, add the text here too.
+
+
+def build_translatable_ui_strings() -> List[str]:
+    texts = [
+        DEFAULT_LOADING_TEXT,
+        TIMEOUT_ERROR_MESSAGE,
+        DEFAULT_SUMMARIZE_PROMPT,
+        HERE_IS_SUMMARY_TEXT,
+        *build_home_tab_original_texts(DEFAULT_HOME_TAB_MESSAGE),
+        *build_home_tab_original_texts(READY_HOME_TAB_MESSAGE),
+        *CONFIGURE_MODAL_TEXTS,
+        CONFIGURE_MODEL_NOT_AVAILABLE_ERROR,
+        CONFIGURE_INVALID_API_KEY_ERROR,
+    ]
+    return list(dict.fromkeys(texts))
+
+
+def _build_translation_context(locale: str) -> BoltContext:
+    return BoltContext(
+        {
+            "locale": locale,
+            "OPENAI_API_TYPE": OPENAI_API_TYPE,
+            "OPENAI_API_BASE": OPENAI_API_BASE,
+            "OPENAI_API_VERSION": OPENAI_API_VERSION,
+            "OPENAI_DEPLOYMENT_ID": OPENAI_DEPLOYMENT_ID,
+        }
+    )
+
+
+def generate_translation_catalog(
+    *,
+    openai_api_key: str,
+    max_workers: int = TRANSLATION_WARM_UP_CONCURRENCY,
+    logger: logging.Logger = logging.getLogger(__name__),
+) -> Dict[str, Dict[str, str]]:
+    """Translates all the UI strings into all the supported languages in parallel.
+    The results are saved in the translation cache as well."""
+    texts = build_translatable_ui_strings()
+    languages = supported_languages()
+    catalog: Dict[str, Dict[str, str]] = {lang: {} for lang in languages.keys()}
+
+    def _translate(lang: str) -> None:
+        try:
+            translated_texts = translate_many(
+                openai_api_key=openai_api_key,
+                context=_build_translation_context(languages[lang]),
+                texts=texts,
+            )
+            catalog[lang] = dict(zip(texts, translated_texts))
+        except Exception as e:
+            logger.warning(f"Failed to translate the UI strings into {lang}: {e}")
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for lang in languages.keys():
+            executor.submit(_translate, lang)
+    return catalog
+
+
+def warm_up_translations(
+    *,
+    openai_api_key: Optional[str],
+    max_workers: int = TRANSLATION_WARM_UP_CONCURRENCY,
+    logger: logging.Logger = logging.getLogger(__name__),
+) -> Optional[threading.Thread]:
+    """Starts generating the translations for all the UI strings in the background"""
+    if openai_api_key is None or len(openai_api_key.strip()) == 0:
+        return None
+
+    def _warm_up():
+        generate_translation_catalog(
+            openai_api_key=openai_api_key, max_workers=max_workers, logger=logger
+        )
+        logger.info("Translations for the UI strings are ready")
+
+    thread = threading.Thread(target=_warm_up, daemon=True)
+    thread.start()
+    return thread
+
+
+def load_translation_catalog(
+    path: str,
+    logger: logging.Logger = logging.getLogger(__name__),
+) -> int:
+    """Loads a catalog file into the translation cache and returns the number of loaded translations"""
+    try:
+        with open(path) as f:
+            data = json.load(f)
+    except (OSError, ValueError) as e:
+        logger.warning(f"Failed to load the translation catalog ({path}): {e}")
+        return 0
+    if data.get("prompt_version") != TRANSLATION_PROMPT_VERSION:
+        logger.warning(
+            f"Skipped loading the translation catalog ({path}) generated by a different prompt version"
+        )
+        return 0
+    count = 0
+    for lang, translations in data.get("translations", {}).items():
+        for text, translated_text in translations.items():
+            if translated_text:
+                save_translation(lang=lang, text=text, translated_text=translated_text)
+                count += 1
+    return count
+
+
+def write_translation_catalog(path: str, catalog: Dict[str, Dict[str, str]]) -> None:
+    with open(path, "w") as f:
+        json.dump(
+            {"prompt_version": TRANSLATION_PROMPT_VERSION, "translations": catalog},
+            f,
+            ensure_ascii=False,
+            indent=2,
+        )
+
+
+def prepare_translations_at_startup(
+    *,
+    openai_api_key: Optional[str],
+    logger: logging.Logger = logging.getLogger(__name__),
+) -> None:
+    if TRANSLATION_CATALOG_PATH is not None:
+        count = load_translation_catalog(TRANSLATION_CATALOG_PATH, logger=logger)
+        logger.info(f"Loaded {count} translations from {TRANSLATION_CATALOG_PATH}")
+    if TRANSLATION_WARM_UP_ENABLED is True:
+        warm_up_translations(openai_api_key=openai_api_key, logger=logger)
+
+
+# Generates a catalog file at build time:
+#   OPENAI_API_KEY=sk-... python -m app.i18n_catalog translation_catalog.json
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    output_path = sys.argv[1] if len(sys.argv) > 1 else "translation_catalog.json"
+    write_translation_catalog(
+        output_path,
+        generate_translation_catalog(openai_api_key=os.environ["OPENAI_API_KEY"]),
+    )
@@ -0,0 +1,203 @@
+import math
+import re
+import unicodedata
+from collections import Counter
+from typing import Dict, List, Optional
+
+# ----------------------------
+# Local language detection
+# ----------------------------
+#
+# A lightweight language identifier that runs without any network access.
+# The writing system (script) of the letters decides the language for Japanese, Korean, Chinese and Russian.
+# For Latin-script texts, the character trigram profile of the text is compared with
+# the profiles built from the sample texts below (cosine similarity).
+# The detection result is used only for skipping translations, so it returns None
+# whenever the result is not confident enough.
+
+# Latin-script texts shorter than this (in letters) are too short to identify reliably
+MIN_LATIN_LETTERS = 20
+# The minimum cosine similarity between a text and the best matching language profile
+MIN_SIMILARITY = 0.15
+# The best matching language must be this much more similar than the second one
+MIN_SIMILARITY_MARGIN = 0.04
+
+_LATIN_SAMPLES = {
+    "English": (
+        "Thank you for sharing the update with the team. I think we should review the proposal "
+        "before the meeting on Monday and make sure that everyone has the latest version of the document. "
+        "Could you let me know when you have time to talk about the release schedule? "
+        "The customer asked whether the new feature will be available this month, and we need to "
+        "give them a clear answer. If there are any problems with the deployment, please write them "
+        "in this thread so that we can fix them as soon as possible. It would be great to have your "
+        "feedback on the design, which is still a work in progress. We are going to discuss the "
+        "results of the test with the other people who joined the project last week."
+    ),
+    "German": (
+        "Vielen Dank für die Informationen, die du mit dem Team geteilt hast. Ich denke, wir sollten "
+        "den Vorschlag vor der Besprechung am Montag prüfen und sicherstellen, dass alle die neueste "
+        "Version des Dokuments haben. Kannst du mir sagen, wann du Zeit hast, über den Zeitplan der "
+        "Veröffentlichung zu sprechen? Der Kunde hat gefragt, ob die neue Funktion in diesem Monat "
+        "verfügbar sein wird, und wir müssen ihm eine klare Antwort geben. Wenn es Probleme mit der "
+        "Bereitstellung gibt, schreibe sie bitte in diesen Thread, damit wir sie so schnell wie möglich "
+        "beheben können. Es wäre schön, deine Rückmeldung zum Entwurf zu bekommen, der noch nicht "
+        "fertig ist. Wir werden die Ergebnisse des Tests mit den anderen Leuten besprechen, die "
+        "letzte Woche zum Projekt gekommen sind."
+    ),
+    "Spanish": (
+        "Gracias por compartir la actualización con el equipo. Creo que deberíamos revisar la "
+        "propuesta antes de la reunión del lunes y asegurarnos de que todos tengan la última versión "
+        "del documento. ¿Puedes decirme cuándo tienes tiempo para hablar sobre el calendario de "
+        "lanzamiento? El cliente preguntó si la nueva función estará disponible este mes, y tenemos que "
+        "darle una respuesta clara. Si hay algún problema con el despliegue, por favor escríbelo en este "
+        "hilo para que podamos solucionarlo lo antes posible. Sería genial tener tus comentarios sobre "
+        "el diseño, que todavía está en progreso. Vamos a hablar de los resultados de la prueba con las "
+        "otras personas que se unieron al proyecto la semana pasada."
+    ),
+    "French": (
+        "Merci d'avoir partagé la mise à jour avec l'équipe. Je pense que nous devrions examiner la "
+        "proposition avant la réunion de lundi et nous assurer que tout le monde a la dernière version "
+        "du document. Peux-tu me dire quand tu as le temps de parler du calendrier de publication ? "
+        "Le client a demandé si la nouvelle fonctionnalité sera disponible ce mois-ci, et nous devons "
+        "lui donner une réponse claire. S'il y a des problèmes avec le déploiement, merci de les écrire "
+        "dans ce fil afin que nous puissions les corriger le plus vite possible. Ce serait bien d'avoir "
+        "ton avis sur la conception, qui est encore en cours. Nous allons discuter des résultats du test "
+        "avec les autres personnes qui ont rejoint le projet la semaine dernière."
+    ),
+    "Italian": (
+        "Grazie per aver condiviso l'aggiornamento con il team. Penso che dovremmo rivedere la proposta "
+        "prima della riunione di lunedì e assicurarci che tutti abbiano l'ultima versione del documento. "
+        "Puoi dirmi quando hai tempo per parlare del calendario di rilascio? Il cliente ha chiesto se la "
+        "nuova funzionalità sarà disponibile questo mese, e dobbiamo dargli una risposta chiara. Se ci "
+        "sono problemi con il rilascio, per favore scrivili in questo thread in modo che possiamo "
+        "risolverli il prima possibile. Sarebbe bello avere il tuo parere sul progetto, che è ancora in "
+        "corso. Parleremo dei risultati del test con le altre persone che si sono unite al progetto la "
+        "settimana scorsa."
+    ),
+    "Portuguese": (
+        "Obrigado por compartilhar a atualização com a equipe. Acho que devemos revisar a proposta antes "
+        "da reunião de segunda-feira e garantir que todos tenham a versão mais recente do documento. "
+        "Você pode me dizer quando tem tempo para falar sobre o cronograma de lançamento? O cliente "
+        "perguntou se a nova funcionalidade estará disponível este mês, e precisamos dar uma resposta "
+        "clara. Se houver algum problema com a implantação, por favor escreva neste tópico para que "
+        "possamos corrigir o mais rápido possível. Seria ótimo ter a sua opinião sobre o design, que "
+        "ainda está em andamento. Vamos conversar sobre os resultados do teste com as outras pessoas "
+        "que entraram no projeto na semana passada."
+    ),
+}
+
+# Slack markup and code that do not tell anything about the language of a message
+_NON_LANGUAGE_PATTERN = re.compile(
+    r"```.*?```|`[^`\n]*`|<[^>\n]*>|:[a-z0-9_+\-]+:|https?://\S+", re.DOTALL
+)
+
+
+def _build_trigram_profile(text: str) -> Dict[str, float]:
+    counts: Counter = Counter()
+    for word in re.findall(r"[^\W\d_]+", text.lower()):
+        padded = f" {word} "
+        for i in range(len(padded) - 2):
+            counts[padded[i: i + 3]] += 1
+    norm = math.sqrt(sum(c * c for c in counts.values()))
+    if norm == 0:
+        return {}
+    return {trigram: c / norm for trigram, c in counts.items()}
+
+
+_latin_profiles: Dict[str, Dict[str, float]] = {
+    lang: _build_trigram_profile(sample) for lang, sample in _LATIN_SAMPLES.items()
+}
+
+
+def _script_of(char: str) -> Optional[str]:
+    code = ord(char)
+    if 0x3040 <= code <= 0x30FF or 0x31F0 <= code <= 0x31FF or 0xFF66 <= code <= 0xFF9D:
+        return "Kana"
+    if 0xAC00 <= code <= 0xD7AF or 0x1100 <= code <= 0x11FF or 0x3130 <= code <= 0x318F:
+        return "Hangul"
+    if 0x4E00 <= code <= 0x9FFF or 0x3400 <= code <= 0x4DBF or 0xF900 <= code <= 0xFAFF:
+        return "Han"
+    if 0x0400 <= code <= 0x04FF:
+        return "Cyrillic"
+    if char.isalpha() and unicodedata.name(char, "").startswith("LATIN"):
+        return "Latin"
+    if char.isalpha():
+        return "Other"
+    return None
+
+
+def count_scripts(text: str) -> Dict[str, int]:
+    counts: Dict[str, int] = {}
+    for char in text:
+        script = _script_of(char)
+        if script is not None:
+            counts[script] = counts.get(script, 0) + 1
+    return counts
+
+
+def _detect_latin_language(text: str) -> Optional[str]:
+    profile = _build_trigram_profile(text)
+    scores: List[tuple] = sorted(
+        (
+            (sum(v * lang_profile.get(k, 0.0) for k, v in profile.items()), lang)
+            for lang, lang_profile in _latin_profiles.items()
+        ),
+        reverse=True,
+    )
+    (best_score, best_lang), (second_score, _) = scores[0], scores[1]
+    if best_score < MIN_SIMILARITY or best_score - second_score < MIN_SIMILARITY_MARGIN:
+        return None
+    return best_lang
+
+
+def detect_language(text: Optional[str]) -> Optional[str]:
+    """Returns the language name (e.g., "Japanese") of the given text, or None if it's uncertain"""
+    if text is None:
+        return None
+    text = _NON_LANGUAGE_PATTERN.sub(" ", text)
+    scripts = count_scripts(text)
+    if len(scripts) == 0:
+        return None
+
+    # A CJK character carries roughly as much information as a short word
+    cjk = scripts.get("Kana", 0) + scripts.get("Han", 0) + scripts.get("Hangul", 0)
+    latin = scripts.get("Latin", 0)
+    cyrillic = scripts.get("Cyrillic", 0)
+    total = 3 * cjk + latin + cyrillic + scripts.get("Other", 0)
+    if 3 * cjk > total * 0.5:
+        if scripts.get("Hangul", 0) > scripts.get("Kana", 0) + scripts.get("Han", 0):
+            return "Korean"
+        if scripts.get("Kana", 0) > 0:
+            return "Japanese"
+        if scripts.get("Hangul", 0) == 0:
+            return "Chinese"
+        return None
+    if cyrillic > total * 0.5:
+        return "Russian"
+    if latin > total * 0.8 and latin >= MIN_LATIN_LETTERS:
+        return _detect_latin_language(text)
+    return None
+
+
+def is_written_in(text: Optional[str], lang: str) -> bool:
+    return detect_language(text) == lang
+
+
+def split_paragraphs(text: str) -> List[str]:
+    """Splits a text into paragraphs and the blank-line separators between them.
+    Code blocks are never split. Joining the returned list reproduces the original text."""
+    pieces = re.split(r"(\n[ \t]*\n\s*)", text)
+    results: List[str] = []
+    in_code_block = False
+    for piece in pieces:
+        if in_code_block:
+            results[-1] += piece
+        else:
+            results.append(piece)
+        if piece.count("```") % 2 == 1:
+            in_code_block = not in_code_block
+    return results
+
+
+def has_language_content(text: str) -> bool:
+    return len(count_scripts(_NON_LANGUAGE_PATTERN.sub(" ", text))) > 0
@@ -1,53 +1,129 @@
+import bisect
 import re
+import threading
+from typing import List, Pattern, Tuple
+
+# Code blocks and inline code, which are kept as-is by the conversions
+_CODE_SPLIT_PATTERN = re.compile(r"(?s)(```.+?```|`[^`\n]+?`)")
+
+# (pattern, replacement, the character that must appear in a text for the pattern to match)
+_SLACK_TO_MARKDOWN_RULES: List[Tuple[Pattern, str, str]] = [
+    (re.compile(r"\*(?!\s)([^\*\n]+?)(?<!\s)\*"), r"**\1**", "*"),  # *bold* to **bold**
+    (re.compile(r"_(?!\s)([^_\n]+?)(?<!\s)_"), r"*\1*", "_"),  # _italic_ to *italic*
+    (re.compile(r"~(?!\s)([^~\n]+?)(?<!\s)~"), r"~~\1~~", "~"),  # ~strike~ to ~~strike~~
+]
+
+_MARKDOWN_TO_SLACK_RULES: List[Tuple[Pattern, str, str]] = [
+    (
+        re.compile(r"\*\*\*(?!\s)([^\*\n]+?)(?<!\s)\*\*\*"),
+        r"_*\1*_",
+        "*",
+    ),  # ***bold italic*** to *_bold italic_*
+    (
+        re.compile(r"(?<![\*_])\*(?!\s)([^\*\n]+?)(?<!\s)\*(?![\*_])"),
+        r"_\1_",
+        "*",
+    ),  # *italic* to _italic_
+    (re.compile(r"\*\*(?!\s)([^\*\n]+?)(?<!\s)\*\*"), r"*\1*", "*"),  # **bold** to *bold*
+    (re.compile(r"__(?!\s)([^_\n]+?)(?<!\s)__"), r"*\1*", "_"),  # __bold__ to *bold*
+    (re.compile(r"~~(?!\s)([^~\n]+?)(?<!\s)~~"), r"~\1~", "~"),  # ~~strike~~ to ~strike~
+]
+
+
+def _convert_text_parts(content: str, rules: List[Tuple[Pattern, str, str]]) -> str:
+    # Apply the bold, italic, and strikethrough formatting to text not within code
+    def _convert(part: str) -> str:
+        for pattern, replacement, marker in rules:
+            if marker in part:
+                part = pattern.sub(replacement, part)
+        return part
+
+    if "`" not in content:
+        return _convert(content)
+
+    # Split the input string into parts based on code blocks and inline code
+    parts = _CODE_SPLIT_PATTERN.split(content)
+    return "".join(part if part.startswith("`") else _convert(part) for part in parts)
 
 
 # Conversion from Slack mrkdwn to OpenAI markdown
 # See also: https://api.slack.com/reference/surfaces/formatting#basics
 def slack_to_markdown(content: str) -> str:
-    # Split the input string into parts based on code blocks and inline code
-    parts = re.split(r"(?s)(```.+?```|`[^`\n]+?`)", content)
-
-    # Apply the bold, italic, and strikethrough formatting to text not within code
-    result = ""
-    for part in parts:
-        if part.startswith("```") or part.startswith("`"):
-            result += part
-        else:
-            for o, n in [
-                (r"\*(?!\s)([^\*\n]+?)(?<!\s)\*", r"**\1**"),  # *bold* to **bold**
-                (r"_(?!\s)([^_\n]+?)(?<!\s)_", r"*\1*"),  # _italic_ to *italic*
-                (r"~(?!\s)([^~\n]+?)(?<!\s)~", r"~~\1~~"),  # ~strike~ to ~~strike~~
-            ]:
-                part = re.sub(o, n, part)
-            result += part
-    return result
+    return _convert_text_parts(content, _SLACK_TO_MARKDOWN_RULES)
 
 
 # Conversion from OpenAI markdown to Slack mrkdwn
 # See also: https://api.slack.com/reference/surfaces/formatting#basics
 def markdown_to_slack(content: str) -> str:
-    # Split the input string into parts based on code blocks and inline code
-    parts = re.split(r"(?s)(```.+?```|`[^`\n]+?`)", content)
+    return _convert_text_parts(content, _MARKDOWN_TO_SLACK_RULES)
 
-    # Apply the bold, italic, and strikethrough formatting to text not within code
-    result = ""
-    for part in parts:
-        if part.startswith("```") or part.startswith("`"):
-            result += part
-        else:
-            for o, n in [
-                (
-                    r"\*\*\*(?!\s)([^\*\n]+?)(?<!\s)\*\*\*",
-                    r"_*\1*_",
-                ),  # ***bold italic*** to *_bold italic_*
-                (
-                    r"(?<![\*_])\*(?!\s)([^\*\n]+?)(?<!\s)\*(?![\*_])",
-                    r"_\1_",
-                ),  # *italic* to _italic_
-                (r"\*\*(?!\s)([^\*\n]+?)(?<!\s)\*\*", r"*\1*"),  # **bold** to *bold*
-                (r"__(?!\s)([^_\n]+?)(?<!\s)__", r"*\1*"),  # __bold__ to *bold*
-                (r"~~(?!\s)([^~\n]+?)(?<!\s)~~", r"~\1~"),  # ~~strike~~ to ~strike~
-            ]:
-                part = re.sub(o, n, part)
-            result += part
-    return result
+
+# The same as _CODE_SPLIT_PATTERN without the capturing group
+_CODE_PATTERN = re.compile(r"(?s)```.+?```|`[^`\n]+?`")
+
+
+def find_stable_boundary(content: str) -> int:
+    """Returns the end of the longest prefix whose conversion result never changes
+    no matter what text is appended to it. The prefix must:
+    - end with a line break (emphasis spans never contain line breaks) outside code
+    - end before any ``` that does not belong to a closed code block yet
+      (appending a closing ``` later would change how the text is split)
+    - not split a text part starting with ` (such a part is kept as-is by markdown_to_slack)
+    - be followed by a character other than `"""
+    code_spans = [m.span() for m in _CODE_PATTERN.finditer(content)]
+    code_starts = [start for start, _ in code_spans]
+
+    limit = len(content)
+    fence = content.find("```")
+    for start, end in code_spans:
+        if fence < 0 or fence < start:
+            break
+        if fence < end:
+            fence = content.find("```", end)
+    if fence >= 0:
+        limit = fence
+
+    boundary = content.rfind("\n", 0, limit) + 1
+    while boundary > 0:
+        if boundary >= len(content) or content[boundary] == "`":
+            boundary = content.rfind("\n", 0, boundary - 1) + 1
+            continue
+        i = bisect.bisect_left(code_starts, boundary) - 1
+        if i >= 0 and boundary < code_spans[i][1]:
+            # The line break is inside a code block
+            boundary = content.rfind("\n", 0, code_spans[i][0]) + 1
+            continue
+        text_start = code_spans[i][1] if i >= 0 else 0
+        if content[text_start] == "`":
+            boundary = content.rfind("\n", 0, text_start) + 1
+            continue
+        break
+    return boundary
+
+
+class IncrementalMarkdownToSlackConverter:
+    """Converts a streamed text, which only grows, from OpenAI markdown to Slack mrkdwn.
+    The converted result of the stable prefix is reused,
+    so that each update only processes the text after it (e.g., an unclosed code block or the last line)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stable_source = ""
+        self._stable_result = ""
+
+    def convert(self, content: str) -> str:
+        with self._lock:
+            if not content.startswith(self._stable_source):
+                if len(content) < len(self._stable_source):
+                    # An outdated text (e.g., passed by a slow thread); no need to discard the state
+                    return markdown_to_slack(content)
+                self._stable_source = ""
+                self._stable_result = ""
+
+            tail = content[len(self._stable_source):]
+            boundary = find_stable_boundary(tail)
+            if boundary > 0:
+                self._stable_result += markdown_to_slack(tail[:boundary])
+                self._stable_source += tail[:boundary]
+                tail = tail[boundary:]
+            return self._stable_result + markdown_to_slack(tail)
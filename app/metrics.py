@@ -0,0 +1,113 @@
+import threading
+from collections import deque
+from typing import Deque, Dict, List, Tuple
+
+# ----------------------------
+# In-process metrics
+# ----------------------------
+#
+# A tiny thread-safe registry for counters and latency observations.
+# Values are kept per process; the Koyeb health check server exposes them at /metrics
+# and the other deployment modes can read them via snapshot().
+
+_MetricKey = Tuple[str, Tuple[Tuple[str, str], ...]]
+
+# The number of the latest observations kept per metric for percentile calculation
+MAX_OBSERVATION_SAMPLES = 1000
+
+_lock = threading.Lock()
+_counters: Dict[_MetricKey, float] = {}
+_observations: Dict[_MetricKey, Deque[float]] = {}
+_observation_totals: Dict[_MetricKey, Tuple[int, float]] = {}
+
+
+def _to_key(name: str, labels: Dict[str, object]) -> _MetricKey:
+    return name, tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def increment_counter(name: str, value: float = 1, **labels) -> None:
+    key = _to_key(name, labels)
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+
+def get_counter(name: str, **labels) -> float:
+    with _lock:
+        return _counters.get(_to_key(name, labels), 0)
+
+
+def observe(name: str, value: float, **labels) -> None:
+    key = _to_key(name, labels)
+    with _lock:
+        samples = _observations.get(key)
+        if samples is None:
+            samples = deque(maxlen=MAX_OBSERVATION_SAMPLES)
+            _observations[key] = samples
+        samples.append(value)
+        count, total = _observation_totals.get(key, (0, 0.0))
+        _observation_totals[key] = (count + 1, total + value)
+
+
+def percentile(name: str, p: float, **labels) -> float:
+    with _lock:
+        samples = sorted(_observations.get(_to_key(name, labels), []))
+    if len(samples) == 0:
+        return 0.0
+    idx = min(len(samples) - 1, int(round(p / 100 * (len(samples) - 1))))
+    return samples[idx]
+
+
+def snapshot() -> Dict[str, List[dict]]:
+    with _lock:
+        counters = [
+            {"name": name, "labels": dict(labels), "value": value}
+            for (name, labels), value in _counters.items()
+        ]
+        observations = []
+        for key, samples in _observations.items():
+            name, labels = key
+            count, total = _observation_totals[key]
+            sorted_samples = sorted(samples)
+            observations.append(
+                {
+                    "name": name,
+                    "labels": dict(labels),
+                    "count": count,
+                    "sum": total,
+                    "p50": sorted_samples[int(0.5 * (len(sorted_samples) - 1))],
+                    "p95": sorted_samples[int(0.95 * (len(sorted_samples) - 1))],
+                    "max": sorted_samples[-1],
+                }
+            )
+    return {"counters": counters, "observations": observations}
+
+
+def render_metrics_text() -> str:
+    """Renders all the metrics in the Prometheus text exposition format"""
+
+    def _labels(labels: Dict[str, str], extra: Dict[str, str] = {}) -> str:
+        merged = {**labels, **extra}
+        if len(merged) == 0:
+            return ""
+        return "{" + ",".join(f'{k}="{v}"' for k, v in sorted(merged.items())) + "}"
+
+    lines = []
+    data = snapshot()
+    for c in sorted(data["counters"], key=lambda c: c["name"]):
+        lines.append(f"{c['name']}{_labels(c['labels'])} {c['value']}")
+    for o in sorted(data["observations"], key=lambda o: o["name"]):
+        lines.append(f"{o['name']}_count{_labels(o['labels'])} {o['count']}")
+        lines.append(f"{o['name']}_sum{_labels(o['labels'])} {o['sum']}")
+        for q in ["p50", "p95"]:
+            quantile = "0.5" if q == "p50" else "0.95"
+            lines.append(
+                f"{o['name']}{_labels(o['labels'], {'quantile': quantile})} {o[q]}"
+            )
+    return "\n".join(lines) + "\n"
+
+
+def reset_metrics() -> None:
+    with _lock:
+        _counters.clear()
+        _observations.clear()
+        _observation_totals.clear()
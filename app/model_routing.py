@@ -0,0 +1,247 @@
+import logging
+import threading
+import time
+from collections import deque
+from typing import Deque, Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+
+from openai import APIConnectionError, APIError, APIStatusError, RateLimitError
+from slack_bolt import BoltContext
+
+from app.env import (
+    OPENAI_MODEL_FALLBACK_CHAIN,
+    MODEL_CIRCUIT_ERROR_RATE,
+    MODEL_CIRCUIT_MIN_REQUESTS,
+    MODEL_CIRCUIT_WINDOW_SECONDS,
+    MODEL_CIRCUIT_OPEN_SECONDS,
+    MODEL_TTFT_SLO_SECONDS,
+)
+from app.metrics import increment_counter
+
+# ----------------------------
+# Model fallback routing
+# ----------------------------
+#
+# Every (endpoint, model) pair has a circuit breaker that watches the recent requests.
+# The circuit opens when too many of them fail (rate limits, 5xx errors, connection errors and stalls),
+# or when the 95th percentile of the time to the first token exceeds MODEL_TTFT_SLO_SECONDS.
+# While the circuit is open, the requests go to the next model in OPENAI_MODEL_FALLBACK_CHAIN.
+# After MODEL_CIRCUIT_OPEN_SECONDS, one request at a time is sent to the model as a probe;
+# a successful probe closes the circuit, and a failed one keeps it open.
+# Azure OpenAI requests are not routed since the deployment decides the model.
+
+# The transport errors raised while iterating a stream are not wrapped by the OpenAI client
+try:
+    import httpx
+    _CONNECTION_ERRORS: tuple = (APIConnectionError, httpx.TransportError)
+except ImportError:
+    _CONNECTION_ERRORS = (APIConnectionError,)
+
+
+def is_transient_openai_error(error: BaseException) -> bool:
+    """True for the errors that are likely to go away soon (or with another model)"""
+    if isinstance(error, (RateLimitError,) + _CONNECTION_ERRORS):
+        return True
+    if isinstance(error, APIStatusError):
+        return error.status_code >= 500
+    # An error event in the middle of a stream
+    return isinstance(error, APIError)
+
+
+def endpoint_label(context: BoltContext) -> str:
+    return endpoint_label_for(context.get("OPENAI_API_BASE"))
+
+
+def endpoint_label_for(api_base: Optional[str]) -> str:
+    if not api_base:
+        return "api.openai.com"
+    return urlparse(api_base).netloc or api_base
+
+
+def parse_fallback_chain(value: Optional[str]) -> List[str]:
+    """Parses a comma-separated list of models (e.g., "gpt-4o,gpt-4o-mini")"""
+    if not value:
+        return []
+    return [model.strip() for model in value.split(",") if model.strip()]
+
+
+class CircuitBreaker:
+    def __init__(
+        self,
+        *,
+        error_rate: float = MODEL_CIRCUIT_ERROR_RATE,
+        min_requests: int = MODEL_CIRCUIT_MIN_REQUESTS,
+        window_seconds: float = MODEL_CIRCUIT_WINDOW_SECONDS,
+        open_seconds: float = MODEL_CIRCUIT_OPEN_SECONDS,
+        ttft_slo_seconds: float = MODEL_TTFT_SLO_SECONDS,
+    ):
+        self.error_rate = error_rate
+        self.min_requests = min_requests
+        self.window_seconds = window_seconds
+        self.open_seconds = open_seconds
+        # 0 disables the latency check
+        self.ttft_slo_seconds = ttft_slo_seconds
+        self.state = "closed"
+        self.opened_reason: Optional[str] = None
+        self.opened_at = 0.0
+        # When the probe request in the half-open state started
+        self.probe_started_at: Optional[float] = None
+        # (time, succeeded)
+        self.outcomes: Deque[Tuple[float, bool]] = deque()
+        # (time, seconds)
+        self.ttfts: Deque[Tuple[float, float]] = deque()
+
+    def allow_request(self, now: float) -> Optional[str]:
+        """Returns "closed" or "probe" when a request can be sent, None otherwise"""
+        if self.state == "closed":
+            return "closed"
+        if self.state == "open" and now - self.opened_at < self.open_seconds:
+            return None
+        # A probe that has not reported back for a while (e.g., the request was abandoned) is replaced
+        if self.probe_started_at is not None and now - self.probe_started_at < self.open_seconds:
+            return None
+        self.state = "half_open"
+        self.probe_started_at = now
+        return "probe"
+
+    def record(self, now: float, succeeded: bool, ttft_seconds: Optional[float] = None) -> Optional[str]:
+        """Returns the new state if the state has changed"""
+        if ttft_seconds is not None and self.ttft_slo_seconds > 0:
+            self.ttfts.append((now, ttft_seconds))
+        self.outcomes.append((now, succeeded))
+        while self.outcomes and self.outcomes[0][0] <= now - self.window_seconds:
+            self.outcomes.popleft()
+        while self.ttfts and self.ttfts[0][0] <= now - self.window_seconds:
+            self.ttfts.popleft()
+
+        if self.state == "half_open":
+            slow = (
+                ttft_seconds is not None
+                and self.ttft_slo_seconds > 0
+                and ttft_seconds > self.ttft_slo_seconds
+            )
+            if succeeded and not slow:
+                self.state = "closed"
+                self.opened_reason = None
+                self.probe_started_at = None
+                self.outcomes.clear()
+                self.ttfts.clear()
+                return "closed"
+            return self._open(now, "latency" if succeeded else "errors")
+        if self.state == "open":
+            return None
+
+        if len(self.outcomes) >= self.min_requests:
+            failures = len([o for o in self.outcomes if o[1] is False])
+            if failures / len(self.outcomes) >= self.error_rate:
+                return self._open(now, "errors")
+        if self.ttft_slo_seconds > 0 and len(self.ttfts) >= self.min_requests:
+            samples = sorted(t for _, t in self.ttfts)
+            p95 = samples[min(len(samples) - 1, int(round(0.95 * (len(samples) - 1))))]
+            if p95 > self.ttft_slo_seconds:
+                return self._open(now, "latency")
+        return None
+
+    def _open(self, now: float, reason: str) -> str:
+        self.state = "open"
+        self.opened_reason = reason
+        self.opened_at = now
+        self.probe_started_at = None
+        return "open"
+
+
+class ModelRouter:
+    def __init__(self, fallback_chain: List[str], **breaker_options):
+        self.fallback_chain = fallback_chain
+        self.breaker_options = breaker_options
+        self._lock = threading.Lock()
+        self._breakers: Dict[Tuple[str, str], CircuitBreaker] = {}
+
+    def _breaker(self, endpoint: str, model: str) -> CircuitBreaker:
+        key = (endpoint, model)
+        breaker = self._breakers.get(key)
+        if breaker is None:
+            breaker = CircuitBreaker(**self.breaker_options)
+            self._breakers[key] = breaker
+        return breaker
+
+    def candidates(self, model: str) -> List[str]:
+        """The model itself and the models after it in the fallback chain"""
+        if model not in self.fallback_chain:
+            return [model]
+        return self.fallback_chain[self.fallback_chain.index(model):]
+
+    def select_model(self, endpoint: str, model: str, now: Optional[float] = None) -> str:
+        now = now if now is not None else time.time()
+        candidates = self.candidates(model)
+        if len(candidates) == 1:
+            return model
+        selected, reason = model, "all_open"
+        with self._lock:
+            for candidate in candidates:
+                allowed = self._breaker(endpoint, candidate).allow_request(now)
+                if allowed is not None:
+                    selected = candidate
+                    if allowed == "probe":
+                        reason = "probe"
+                    else:
+                        reason = "primary" if candidate == model else "fallback"
+                    break
+        increment_counter(
+            "model_routing_decisions",
+            endpoint=endpoint,
+            requested=model,
+            selected=selected,
+            reason=reason,
+        )
+        return selected
+
+    def record(
+        self,
+        endpoint: str,
+        model: str,
+        succeeded: bool,
+        ttft_seconds: Optional[float] = None,
+        now: Optional[float] = None,
+    ) -> None:
+        if not model:
+            return
+        now = now if now is not None else time.time()
+        with self._lock:
+            breaker = self._breaker(endpoint, model)
+            new_state = breaker.record(now, succeeded, ttft_seconds)
+            reason = breaker.opened_reason
+        if new_state is not None:
+            increment_counter(
+                "model_circuit_transitions", endpoint=endpoint, model=model, state=new_state
+            )
+            logging.getLogger(__name__).warning(
+                f"The circuit for {model} ({endpoint}) is now {new_state}"
+                + (f" ({reason})" if new_state == "open" else "")
+            )
+
+    def record_error(self, endpoint: str, model: str, error: BaseException) -> None:
+        # Client errors (e.g., an invalid API key) don't say anything about the model's health
+        if is_transient_openai_error(error):
+            self.record(endpoint, model, succeeded=False)
+
+    def state(self, endpoint: str, model: str) -> str:
+        with self._lock:
+            return self._breaker(endpoint, model).state
+
+
+model_router = ModelRouter(parse_fallback_chain(OPENAI_MODEL_FALLBACK_CHAIN))
+
+
+def route_openai_model(context: BoltContext) -> str:
+    """Switches context["OPENAI_MODEL"] to the model that should serve this request.
+    The decision is made once per request; the configured model is kept in context["OPENAI_REQUESTED_MODEL"]."""
+    if context.get("OPENAI_REQUESTED_MODEL") is not None:
+        return context["OPENAI_MODEL"]
+    model = context.get("OPENAI_MODEL")
+    if model is None or context.get("OPENAI_API_TYPE") == "azure":
+        # Azure OpenAI requests always go to OPENAI_DEPLOYMENT_ID whatever the model name is
+        return model
+    context["OPENAI_REQUESTED_MODEL"] = model
+    context["OPENAI_MODEL"] = model_router.select_model(endpoint_label(context), model)
+    return context["OPENAI_MODEL"]
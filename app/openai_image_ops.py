@@ -1,10 +1,13 @@
 import logging
-from typing import List, Tuple, Literal
+from typing import List, Optional, Tuple, Literal
 
 import base64
 from io import BytesIO
+import requests
 from PIL import Image
 
+from app.deadline import Deadline
+from app.metrics import increment_counter
 from app.openai_ops import create_openai_client
 from app.slack_ops import download_slack_image_content
 from slack_bolt import BoltContext
@@ -19,6 +22,7 @@ def append_image_content_if_exists(
     files: List[dict],
     content: List[dict],
     logger: logging.Logger,
+    deadline: Optional[Deadline] = None,
 ) -> None:
     if files is None or len(files) == 0:
         return
@@ -27,7 +31,20 @@ def append_image_content_if_exists(
         mime_type = file.get("mimetype")
         if mime_type is not None and mime_type.startswith("image"):
             file_url = file.get("url_private")
-            image_bytes = download_slack_image_content(file_url, bot_token)
+            timeout_seconds = None
+            if deadline is not None:
+                timeout_seconds = deadline.optional_stage_timeout("image_download")
+                if timeout_seconds is None:
+                    logger.info(f"Skipped an image file as the request is running out of time (url: {file_url})")
+                    continue
+            try:
+                image_bytes = download_slack_image_content(
+                    file_url, bot_token, timeout_seconds
+                )
+            except requests.exceptions.Timeout:
+                increment_counter("deadline_stages_skipped", stage="image_download")
+                logger.info(f"Skipped an image file that could not be downloaded in time (url: {file_url})")
+                continue
             encoded_image, image_format = encode_image_and_guess_format(image_bytes)
             if image_format.lower() not in SUPPORTED_IMAGE_FORMATS:
                 skipped_file_message = (
@@ -3,18 +3,25 @@ import threading
 import time
 import re
 import json
-from typing import List, Dict, Tuple, Optional, Union, Any
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, List, Dict, Tuple, Optional, Union, Any
 from importlib import import_module
 import inspect
 
-from openai import OpenAI, Stream
+from openai import APITimeoutError, OpenAI, Stream
 from openai.lib.azure import AzureOpenAI
 from openai.types import Completion
 
 from slack_bolt import BoltContext
 from slack_sdk.web import WebClient, SlackResponse
 
-from app.markdown_conversion import slack_to_markdown, markdown_to_slack
+from app.markdown_conversion import (
+    slack_to_markdown,
+    markdown_to_slack,
+    IncrementalMarkdownToSlackConverter,
+    find_stable_boundary,
+)
+from app.metrics import increment_counter, observe
 from app.openai_constants import (
     MAX_TOKENS,
     GPT_3_5_TURBO_MODEL,
@@ -42,7 +49,18 @@ from app.openai_constants import (
     MODEL_TOKENS,
     MODEL_FALLBACKS,
 )
-from app.slack_ops import update_wip_message
+from app.env import (
+    SYSTEM_TEXT,
+    STREAMING_REPLY_ROLLOVER_LENGTH,
+    THREAD_SUMMARY_CHUNK_TOKENS,
+    THREAD_SUMMARY_MAP_REDUCE_ENABLED,
+    THREAD_SUMMARY_MAX_CONCURRENCY,
+)
+from app.slack_constants import STREAMING_LOADING_TEXT
+from app.stream_resumption import build_continuation_messages, next_resume_backoff_seconds
+from app.model_routing import endpoint_label, endpoint_label_for, model_router
+from app.stream_watchdog import watch_stream
+from app.slack_ops import post_wip_message, update_wip_message
 
 # Try to import tiktoken, set flag based on availability
 try:
@@ -130,20 +148,26 @@ def make_synchronous_openai_call(
             base_url=openai_api_base,
             organization=openai_organization_id,
         )
-    return client.chat.completions.create(
-        model=model,
-        messages=messages,
-        top_p=1,
-        n=1,
-        max_tokens=MAX_TOKENS,
-        temperature=temperature,
-        presence_penalty=0,
-        frequency_penalty=0,
-        logit_bias={},
-        user=user,
-        stream=False,
-        timeout=timeout_seconds,
-    )
+    try:
+        response = client.chat.completions.create(
+            model=model,
+            messages=messages,
+            top_p=1,
+            n=1,
+            max_tokens=MAX_TOKENS,
+            temperature=temperature,
+            presence_penalty=0,
+            frequency_penalty=0,
+            logit_bias={},
+            user=user,
+            stream=False,
+            timeout=timeout_seconds,
+        )
+    except Exception as e:
+        model_router.record_error(endpoint_label_for(openai_api_base), model, e)
+        raise
+    model_router.record(endpoint_label_for(openai_api_base), model, succeeded=True)
+    return response
 
 
 def start_receiving_openai_response(
@@ -159,10 +183,13 @@ def start_receiving_openai_response(
     openai_deployment_id: str,
     openai_organization_id: Optional[str],
     function_call_module_name: Optional[str],
+    timeout_seconds: Optional[float] = None,
 ) -> Stream[Completion]:
     kwargs = {}
     if function_call_module_name is not None:
         kwargs["functions"] = import_module(function_call_module_name).functions
+    if timeout_seconds is not None:
+        kwargs["timeout"] = timeout_seconds
     if openai_api_type == "azure":
         client = AzureOpenAI(
             api_key=openai_api_key,
@@ -176,20 +203,25 @@ def start_receiving_openai_response(
             base_url=openai_api_base,
             organization=openai_organization_id,
         )
-    return client.chat.completions.create(
-        model=model,
-        messages=messages,
-        top_p=1,
-        n=1,
-        max_tokens=MAX_TOKENS,
-        temperature=temperature,
-        presence_penalty=0,
-        frequency_penalty=0,
-        logit_bias={},
-        user=user,
-        stream=True,
-        **kwargs,
-    )
+    try:
+        return client.chat.completions.create(
+            model=model,
+            messages=messages,
+            top_p=1,
+            n=1,
+            max_tokens=MAX_TOKENS,
+            temperature=temperature,
+            presence_penalty=0,
+            frequency_penalty=0,
+            logit_bias={},
+            user=user,
+            stream=True,
+            **kwargs,
+        )
+    except Exception as e:
+        # The successful requests are reported when their first chunks arrive
+        model_router.record_error(endpoint_label_for(openai_api_base), model, e)
+        raise
 
 
 def consume_openai_stream_to_write_reply(
@@ -202,7 +234,10 @@ def consume_openai_stream_to_write_reply(
     stream: Stream[Completion],
     timeout_seconds: int,
     translate_markdown: bool,
+    received_at: Optional[float] = None,
 ):
+    """Streams the reply into wip_reply.
+    received_at is when the user's message was posted (for the time-to-first-token metric)."""
     start_time = time.time()
     assistant_reply: Dict[str, Union[str, Dict[str, str]]] = {
         "role": "assistant",
@@ -212,9 +247,129 @@ def consume_openai_stream_to_write_reply(
     word_count = 0
     threads = []
     function_call: Dict[str, str] = {"name": "", "arguments": ""}
+    shared_system_text = build_system_text(SYSTEM_TEXT, translate_markdown, context)
+    # The part of the reply displayed in the active (last) message
+    active_message = {
+        # The position in assistant_reply["content"] where the active message starts
+        "offset": 0,
+        # True when the active message starts in the middle of a code block
+        "reopen_code_block": False,
+        # The ts of the previous message when the active message is a continuation
+        "continues": None,
+        "markdown_converter": IncrementalMarkdownToSlackConverter(),
+    }
+
+    def active_source() -> str:
+        prefix = "```\n" if active_message["reopen_code_block"] else ""
+        return prefix + assistant_reply["content"][active_message["offset"]:]
+
+    def format_active_message() -> str:
+        return format_assistant_reply(
+            active_source(), translate_markdown, active_message["markdown_converter"]
+        )
+
+    def roll_over_to_new_message():
+        # Finalize the active message at a safe boundary and continue in a new message
+        for t in threads:
+            t.join()
+        source = active_source()
+        boundary, within_code_block = split_streamed_reply_for_rollover(
+            source, STREAMING_REPLY_ROLLOVER_LENGTH
+        )
+        prefix_length = 4 if active_message["reopen_code_block"] else 0
+        if boundary <= prefix_length:
+            return
+        piece = source[:boundary]
+        if within_code_block:
+            piece += "```"
+        update_wip_message(
+            client=client,
+            channel=context.channel_id,
+            ts=wip_reply["message"]["ts"],
+            text=format_assistant_reply(piece, translate_markdown),
+            messages=messages,
+            user=user_id,
+            attach_metadata=False,
+        )
+        previous_ts = wip_reply["message"]["ts"]
+        new_reply = post_wip_message(
+            client=client,
+            channel=context.channel_id,
+            thread_ts=wip_reply["message"].get("thread_ts"),
+            loading_text=loading_character.strip(),
+            messages=messages,
+            user=user_id,
+            shared_system_text=shared_system_text,
+            continues=previous_ts,
+            reopens_code_block=within_code_block,
+        )
+        wip_reply["message"]["ts"] = new_reply["message"]["ts"]
+        wip_reply["message"]["text"] = ""
+        active_message["offset"] += boundary - prefix_length
+        active_message["reopen_code_block"] = within_code_block
+        active_message["continues"] = previous_ts
+        active_message["markdown_converter"] = IncrementalMarkdownToSlackConverter()
+
+    def resumable_chunks():
+        # When the stream breaks partway, the model is asked to continue the partial reply
+        nonlocal stream
+        chunks = watch_stream(
+            stream,
+            model=context.get("OPENAI_MODEL"),
+            endpoint=endpoint_label(context),
+            deadline=start_time + timeout_seconds,
+        )
+        resume_attempts = 0
+        while True:
+            try:
+                yield from chunks
+                return
+            except Exception as e:
+                resume_attempts += 1
+                backoff_seconds = None
+                if function_call["name"] == "":
+                    backoff_seconds = next_resume_backoff_seconds(
+                        error=e,
+                        attempt=resume_attempts,
+                        partial_content=assistant_reply["content"],
+                        remaining_seconds=timeout_seconds - (time.time() - start_time),
+                    )
+                if backoff_seconds is None:
+                    raise
+                logging.getLogger(__name__).info(
+                    f"Resuming a broken OpenAI stream (attempt: {resume_attempts}, error: {e})"
+                )
+                increment_counter("openai_stream_resumptions", model=context.get("OPENAI_MODEL"))
+                try:
+                    stream.close()
+                except Exception:
+                    pass
+                time.sleep(backoff_seconds)
+                stream = start_receiving_openai_response(
+                    openai_api_key=context.get("OPENAI_API_KEY"),
+                    model=context.get("OPENAI_MODEL"),
+                    temperature=context.get("OPENAI_TEMPERATURE"),
+                    messages=build_continuation_messages(messages, assistant_reply["content"]),
+                    user=user_id,
+                    openai_api_type=context.get("OPENAI_API_TYPE"),
+                    openai_api_base=context.get("OPENAI_API_BASE"),
+                    openai_api_version=context.get("OPENAI_API_VERSION"),
+                    openai_deployment_id=context.get("OPENAI_DEPLOYMENT_ID"),
+                    openai_organization_id=context.get("OPENAI_ORG_ID"),
+                    # The continuation is plain text
+                    function_call_module_name=None,
+                    timeout_seconds=max(0.1, timeout_seconds - (time.time() - start_time)),
+                )
+                chunks = watch_stream(
+                    stream,
+                    model=context.get("OPENAI_MODEL"),
+                    endpoint=endpoint_label(context),
+                    deadline=start_time + timeout_seconds,
+                )
+
+    loading_character = STREAMING_LOADING_TEXT
     try:
-        loading_character = " ... :writing_hand:"
-        for chunk in stream:
+        for chunk in resumable_chunks():
             spent_seconds = time.time() - start_time
             if timeout_seconds < spent_seconds:
                 raise TimeoutError()
@@ -225,24 +380,34 @@ def consume_openai_stream_to_write_reply(
             if item.get("finish_reason") is not None:
                 break
             delta = item.get("delta")
+            if received_at is not None and (
+                delta.get("content") is not None or delta.get("function_call") is not None
+            ):
+                observe("reply_time_to_first_token_seconds", time.time() - received_at)
+                received_at = None
             if delta.get("content") is not None:
                 word_count += 1
                 assistant_reply["content"] += delta.get("content")
                 if word_count >= 20:
+                    if len(active_source()) > STREAMING_REPLY_ROLLOVER_LENGTH:
+                        roll_over_to_new_message()
 
                     def update_message():
-                        assistant_reply_text = format_assistant_reply(
-                            assistant_reply["content"], translate_markdown
-                        )
+                        assistant_reply_text = format_active_message()
                         wip_reply["message"]["text"] = assistant_reply_text
-                        update_wip_message(
-                            client=client,
-                            channel=context.channel_id,
-                            ts=wip_reply["message"]["ts"],
-                            text=assistant_reply_text + loading_character,
-                            messages=messages,
-                            user=user_id,
-                        )
+                        try:
+                            update_wip_message(
+                                client=client,
+                                channel=context.channel_id,
+                                ts=wip_reply["message"]["ts"],
+                                text=assistant_reply_text + loading_character,
+                                messages=messages,
+                                user=user_id,
+                                attach_metadata=False,
+                            )
+                        except TimeoutError:
+                            # An intermediate update is optional; the final one displays the whole reply
+                            increment_counter("deadline_stages_skipped", stage="intermediate_update")
 
                     thread = threading.Thread(target=update_message)
                     thread.daemon = True
@@ -288,6 +453,7 @@ def consume_openai_stream_to_write_reply(
                 openai_deployment_id=context.get("OPENAI_DEPLOYMENT_ID"),
                 openai_organization_id=context["OPENAI_ORG_ID"],
                 function_call_module_name=function_call_module_name,
+                timeout_seconds=max(0.1, timeout_seconds - (time.time() - start_time)),
             )
             consume_openai_stream_to_write_reply(
                 client=client,
@@ -301,9 +467,7 @@ def consume_openai_stream_to_write_reply(
             )
             return
 
-        assistant_reply_text = format_assistant_reply(
-            assistant_reply["content"], translate_markdown
-        )
+        assistant_reply_text = format_active_message()
         wip_reply["message"]["text"] = assistant_reply_text
         update_wip_message(
             client=client,
@@ -312,7 +476,17 @@ def consume_openai_stream_to_write_reply(
             text=assistant_reply_text,
             messages=messages,
             user=user_id,
+            shared_system_text=shared_system_text,
+            continues=active_message["continues"],
+            reopens_code_block=active_message["reopen_code_block"],
         )
+    except TimeoutError:
+        # Keep the partial reply; the caller appends the timeout message to it
+        for t in threads:
+            t.join()
+        if assistant_reply["content"] != "":
+            wip_reply["message"]["text"] = format_active_message()
+        raise
     finally:
         for t in threads:
             try:
@@ -469,45 +643,74 @@ def calculate_num_tokens(
 
 
 # Format message from OpenAI to display in Slack
-def format_assistant_reply(content: str, translate_markdown: bool) -> str:
-    for o, n in [
-        # Remove leading newlines
-        ("^\n+", ""),
-        # Remove prepended Slack user ID
-        ("^<@U.*?>\\s?:\\s?", ""),
-        # Remove OpenAI syntax tags since Slack doesn't render them in a message
-        ("```\\s*[Rr]ust\n", "```\n"),
-        ("```\\s*[Rr]uby\n", "```\n"),
-        ("```\\s*[Ss]cala\n", "```\n"),
-        ("```\\s*[Kk]otlin\n", "```\n"),
-        ("```\\s*[Jj]ava\n", "```\n"),
-        ("```\\s*[Gg]o\n", "```\n"),
-        ("```\\s*[Ss]wift\n", "```\n"),
-        ("```\\s*[Oo]objective[Cc]\n", "```\n"),
-        ("```\\s*[Cc]\n", "```\n"),
-        ("```\\s*[Cc][+][+]\n", "```\n"),
-        ("```\\s*[Cc][Pp][Pp]\n", "```\n"),
-        ("```\\s*[Cc]sharp\n", "```\n"),
-        ("```\\s*[Mm][Aa][Tt][Ll][Aa][Bb]\n", "```\n"),
-        ("```\\s*[Jj][Ss][Oo][Nn]\n", "```\n"),
-        ("```\\s*[Ll]a[Tt]e[Xx]\n", "```\n"),
-        ("```\\s*[Ll][Uu][Aa]\n", "```\n"),
-        ("```\\s*[Cc][Mm][Aa][Kk][Ee]\n", "```\n"),
-        ("```\\s*bash\n", "```\n"),
-        ("```\\s*zsh\n", "```\n"),
-        ("```\\s*sh\n", "```\n"),
-        ("```\\s*[Ss][Qq][Ll]\n", "```\n"),
-        ("```\\s*[Pp][Hh][Pp]\n", "```\n"),
-        ("```\\s*[Pp][Ee][Rr][Ll]\n", "```\n"),
-        ("```\\s*[Jj]ava[Ss]cript\n", "```\n"),
-        ("```\\s*[Ty]ype[Ss]cript\n", "```\n"),
-        ("```\\s*[Pp]ython\n", "```\n"),
-    ]:
-        content = re.sub(o, n, content)
+# OpenAI syntax tags that are removed from code blocks since Slack doesn't render them in a message
+_CODE_BLOCK_LANGUAGE_TAGS = [
+    "[Rr]ust",
+    "[Rr]uby",
+    "[Ss]cala",
+    "[Kk]otlin",
+    "[Jj]ava",
+    "[Gg]o",
+    "[Ss]wift",
+    "[Oo]objective[Cc]",
+    "[Cc]",
+    "[Cc][+][+]",
+    "[Cc][Pp][Pp]",
+    "[Cc]sharp",
+    "[Mm][Aa][Tt][Ll][Aa][Bb]",
+    "[Jj][Ss][Oo][Nn]",
+    "[Ll]a[Tt]e[Xx]",
+    "[Ll][Uu][Aa]",
+    "[Cc][Mm][Aa][Kk][Ee]",
+    "bash",
+    "zsh",
+    "sh",
+    "[Ss][Qq][Ll]",
+    "[Pp][Hh][Pp]",
+    "[Pp][Ee][Rr][Ll]",
+    "[Jj]ava[Ss]cript",
+    "[Ty]ype[Ss]cript",
+    "[Pp]ython",
+]
+
+# Leading newlines and a prepended Slack user ID
+_ASSISTANT_REPLY_PREFIX_PATTERN = re.compile(r"\n*<@U.*?>\s?:\s?|\n+")
+# All the syntax tags in a single pass; starting with the literal ``` lets the regex engine skip most of the text
+_CODE_BLOCK_LANGUAGE_TAG_PATTERN = re.compile(
+    r"```\s*(?:" + "|".join(_CODE_BLOCK_LANGUAGE_TAGS) + r")\n"
+)
+
+
+def split_streamed_reply_for_rollover(source: str, max_length: int) -> Tuple[int, bool]:
+    """Returns the position (<= max_length) to finalize a streamed message at,
+    and whether the position is within a code block"""
+    window = source[:max_length]
+    boundary = find_stable_boundary(window)
+    if boundary > 0:
+        return boundary, False
+    # No safe boundary (e.g., a very long code block); split at the last line break
+    boundary = window.rfind("\n") + 1 or len(window)
+    return boundary, window[:boundary].count("```") % 2 == 1
+
+
+def format_assistant_reply(
+    content: str,
+    translate_markdown: bool,
+    markdown_converter: Optional[IncrementalMarkdownToSlackConverter] = None,
+) -> str:
+    prefix = _ASSISTANT_REPLY_PREFIX_PATTERN.match(content)
+    if prefix is not None:
+        content = content[prefix.end():]
+    if "```" in content:
+        content = _CODE_BLOCK_LANGUAGE_TAG_PATTERN.sub("```\n", content)
 
     # Convert from OpenAI markdown to Slack mrkdwn format
     if translate_markdown:
-        content = markdown_to_slack(content)
+        if markdown_converter is not None:
+            # Streaming: only the text after the already-converted stable part is converted
+            content = markdown_converter.convert(content)
+        else:
+            content = markdown_to_slack(content)
 
     return content
 
@@ -532,34 +735,51 @@ def calculate_tokens_necessary_for_function_call(context: BoltContext) -> int:
     if _prompt_tokens_used_by_function_call_cache is not None:
         return _prompt_tokens_used_by_function_call_cache
 
+    deadline = context.get("deadline")
+
     def _calculate_prompt_tokens(functions) -> int:
         client = create_openai_client(context)
+        kwargs = {"functions": functions} if functions is not None else {}
+        if deadline is not None:
+            kwargs["timeout"] = deadline.timeout()
         return client.chat.completions.create(
             model=context.get("OPENAI_MODEL"),
             messages=[{"role": "user", "content": "hello"}],
             max_tokens=1024,
             user="system",
-            **({"functions": functions} if functions is not None else {}),
+            **kwargs,
         ).model_dump()["usage"]["prompt_tokens"]
 
     # TODO: If there is a better way to calculate this, replace the logic with it
     module = import_module(function_call_module_name)
-    _prompt_tokens_used_by_function_call_cache = _calculate_prompt_tokens(
-        module.functions
-    ) - _calculate_prompt_tokens(None)
+    # When the request is running out of time, estimate it locally this time; the next request will measure it
+    estimate = count_text_tokens(json.dumps(module.functions), context.get("OPENAI_MODEL"))
+    if deadline is not None and deadline.optional_stage_timeout("function_call_probe") is None:
+        return estimate
+    try:
+        _prompt_tokens_used_by_function_call_cache = _calculate_prompt_tokens(
+            module.functions
+        ) - _calculate_prompt_tokens(None)
+    except (APITimeoutError, TimeoutError):
+        increment_counter("deadline_stages_skipped", stage="function_call_probe")
+        return estimate
     return _prompt_tokens_used_by_function_call_cache
 
 
-def generate_slack_thread_summary(
-    *,
-    context: BoltContext,
-    logger: logging.Logger,
-    openai_api_key: str,
-    prompt: str,
-    thread_content: str,
-    timeout_seconds: int,
-) -> str:
-    messages = [
+def count_text_tokens(text: str, model: str) -> int:
+    if not TIKTOKEN_AVAILABLE:
+        return int(encode_and_count_tokens(text))
+    try:
+        encoding = tiktoken.encoding_for_model(model)
+    except KeyError:
+        encoding = tiktoken.get_encoding("cl100k_base")
+    return len(encoding.encode(text))
+
+
+def _build_thread_summary_messages(
+    prompt: str, thread_content: str
+) -> List[Dict[str, str]]:
+    return [
         {
             "role": "system",
             "content": (
@@ -576,8 +796,135 @@ def generate_slack_thread_summary(
             "content": f"{prompt}\n\n{thread_content}",
         },
     ]
-    start_time = time.time()
-    openai_response = make_synchronous_openai_call(
+
+
+# Used when the context window of the model is unknown
+FALLBACK_CONTEXT_LENGTH = 16384
+# The thread is not summarized in parts when a custom prompt leaves fewer tokens than this for each part
+MIN_THREAD_SUMMARY_CHUNK_TOKENS = 256
+
+
+def calculate_thread_summary_token_budget(context: BoltContext, prompt: str) -> int:
+    """Returns the number of tokens available for the thread content in a summary request"""
+    model = context["OPENAI_MODEL"]
+    try:
+        max_context_tokens = context_length(model)
+    except NotImplementedError:
+        max_context_tokens = FALLBACK_CONTEXT_LENGTH
+    prompt_tokens = sum(
+        # 4: the tokens that every message has in addition to its content
+        count_text_tokens(message["content"], model) + 4
+        for message in _build_thread_summary_messages(prompt, "")
+    )
+    return max(0, max_context_tokens - MAX_TOKENS - prompt_tokens - 3)
+
+
+def split_by_tokens(
+    text: str, max_tokens: int, count_tokens: Callable[[str], int]
+) -> List[str]:
+    """Splits the text into pieces of up to max_tokens tokens"""
+    pieces: List[str] = []
+    while text != "":
+        if count_tokens(text) <= max_tokens:
+            pieces.append(text)
+            break
+        # The longest prefix within max_tokens; a token is rarely longer than 16 characters
+        low, high = 1, min(len(text), max(1, max_tokens) * 16)
+        while low < high:
+            middle = (low + high + 1) // 2
+            if count_tokens(text[:middle]) <= max_tokens:
+                low = middle
+            else:
+                high = middle - 1
+        pieces.append(text[:low])
+        text = text[low:]
+    return pieces
+
+
+def group_by_tokens(
+    pieces: List[str],
+    max_tokens: int,
+    count_tokens: Callable[[str], int],
+    separator: str = "",
+) -> List[str]:
+    """Joins consecutive pieces into groups of up to max_tokens tokens.
+    A piece longer than max_tokens (e.g., a long log pasted in a reply) is split first."""
+    groups: List[str] = []
+    current: List[str] = []
+    current_tokens = 0
+    split_pieces = [
+        p for original in pieces for p in split_by_tokens(original, max_tokens, count_tokens)
+    ]
+    for piece in split_pieces:
+        tokens = count_tokens(piece)
+        if len(current) > 0 and current_tokens + tokens > max_tokens:
+            groups.append(separator.join(current))
+            current, current_tokens = [], 0
+        current.append(piece)
+        current_tokens += tokens
+    if len(current) > 0:
+        groups.append(separator.join(current))
+    return groups
+
+
+def _build_partial_summary_messages(
+    part: str, index: int, total: int, merging: bool
+) -> List[Dict[str, str]]:
+    if merging:
+        task = (
+            "You'll receive summaries of consecutive parts of a long Slack thread. "
+            "Merge them into one summary in the same order. "
+        )
+    else:
+        task = (
+            "You'll receive a part of a long Slack thread in this format: <@user_id>: reply text\n"
+            "Summarize the part. "
+        )
+    return [
+        {
+            "role": "system",
+            "content": (
+                "You're an assistant tasked with helping Slack users by summarizing threads. "
+                + task
+                + "Keep the key facts, decisions and open questions, and who brought them up "
+                "with the <@user_id> mentions as is. "
+                "Write in the same language as the thread, and prioritize speed of generation over perfection."
+            ),
+        },
+        {"role": "user", "content": f"Part {index + 1} of {total}:\n\n{part}"},
+    ]
+
+
+def _request_completion(
+    *,
+    context: BoltContext,
+    openai_api_key: str,
+    messages: List[Dict[str, str]],
+    deadline: float,
+    on_partial_text: Optional[Callable[[str], None]] = None,
+) -> str:
+    """Returns the text generated for the messages.
+    When on_partial_text is given, the response is streamed and the function receives the text generated so far."""
+    remaining_seconds = deadline - time.time()
+    if remaining_seconds <= 0:
+        raise TimeoutError()
+    if on_partial_text is None:
+        openai_response = make_synchronous_openai_call(
+            openai_api_key=openai_api_key,
+            model=context["OPENAI_MODEL"],
+            temperature=context["OPENAI_TEMPERATURE"],
+            messages=messages,
+            user=context.actor_user_id,
+            openai_api_type=context["OPENAI_API_TYPE"],
+            openai_api_base=context["OPENAI_API_BASE"],
+            openai_api_version=context["OPENAI_API_VERSION"],
+            openai_deployment_id=context["OPENAI_DEPLOYMENT_ID"],
+            openai_organization_id=context["OPENAI_ORG_ID"],
+            timeout_seconds=remaining_seconds,
+        )
+        return openai_response.model_dump()["choices"][0]["message"]["content"]
+
+    stream = start_receiving_openai_response(
         openai_api_key=openai_api_key,
         model=context["OPENAI_MODEL"],
         temperature=context["OPENAI_TEMPERATURE"],
@@ -588,11 +935,187 @@ def generate_slack_thread_summary(
         openai_api_version=context["OPENAI_API_VERSION"],
         openai_deployment_id=context["OPENAI_DEPLOYMENT_ID"],
         openai_organization_id=context["OPENAI_ORG_ID"],
-        timeout_seconds=timeout_seconds,
+        function_call_module_name=None,
+        timeout_seconds=remaining_seconds,
     )
-    spent_time = time.time() - start_time
-    logger.debug(f"Making a summary took {spent_time} seconds")
-    return openai_response.model_dump()["choices"][0]["message"]["content"]
+    text = ""
+    try:
+        chunks = watch_stream(
+            stream,
+            model=context["OPENAI_MODEL"],
+            endpoint=endpoint_label(context),
+            deadline=deadline,
+        )
+        for chunk in chunks:
+            if time.time() > deadline:
+                raise TimeoutError()
+            # Some versions of the Azure OpenAI API return an empty choices array in the first chunk
+            if not chunk.choices:
+                continue
+            item = chunk.choices[0].model_dump()
+            content = (item.get("delta") or {}).get("content")
+            if content:
+                text += content
+                on_partial_text(text)
+            if item.get("finish_reason") is not None:
+                break
+    finally:
+        try:
+            stream.close()
+        except Exception:
+            pass
+    return text
+
+
+def _summarize_parts(
+    *,
+    context: BoltContext,
+    openai_api_key: str,
+    parts: List[str],
+    merging: bool,
+    deadline: float,
+    on_part_done: Optional[Callable[[], None]] = None,
+) -> List[str]:
+    with ThreadPoolExecutor(
+        max_workers=min(len(parts), THREAD_SUMMARY_MAX_CONCURRENCY)
+    ) as executor:
+        futures = [
+            executor.submit(
+                _request_completion,
+                context=context,
+                openai_api_key=openai_api_key,
+                messages=_build_partial_summary_messages(part, i, len(parts), merging),
+                deadline=deadline,
+            )
+            for i, part in enumerate(parts)
+        ]
+        try:
+            for future in as_completed(futures):
+                future.result()
+                if on_part_done is not None:
+                    on_part_done()
+        except BaseException:
+            # The summary fails anyway; don't send the parts still waiting in the queue
+            for future in futures:
+                future.cancel()
+            raise
+        return [future.result() for future in futures]
+
+
+def generate_slack_thread_summary(
+    *,
+    context: BoltContext,
+    logger: logging.Logger,
+    openai_api_key: str,
+    prompt: str,
+    thread_content: str,
+    timeout_seconds: int,
+    on_progress: Optional[Callable[[int, int], None]] = None,
+    previous_summary: Optional[str] = None,
+    on_partial_text: Optional[Callable[[str], None]] = None,
+) -> str:
+    """Summarizes a thread within timeout_seconds.
+    When the thread doesn't fit in the context window, its parts are summarized concurrently first,
+    and then the partial summaries are merged (map-reduce). on_progress receives (done, total) parts.
+    When previous_summary is given, thread_content has only the replies posted after it.
+    When on_partial_text is given, the final summary is streamed to it."""
+    start_time = time.time()
+    deadline = start_time + timeout_seconds
+    model = context["OPENAI_MODEL"]
+
+    def count_tokens(text: str) -> int:
+        return count_text_tokens(text, model)
+
+    def with_previous_summary(content: str) -> str:
+        if previous_summary is None:
+            return content
+        return (
+            "The following is the summary of the earlier replies in the thread:\n\n"
+            + previous_summary
+            + "\n\nThe following are the replies posted after that:\n\n"
+            + content
+        )
+
+    budget = calculate_thread_summary_token_budget(context, prompt)
+    if previous_summary is not None:
+        budget = max(0, budget - count_tokens(with_previous_summary("")))
+    if not THREAD_SUMMARY_MAP_REDUCE_ENABLED or count_tokens(thread_content) <= budget:
+        increment_counter(
+            "thread_summaries",
+            mode="single" if previous_summary is None else "incremental",
+        )
+        summary = _request_completion(
+            context=context,
+            openai_api_key=openai_api_key,
+            messages=_build_thread_summary_messages(
+                prompt, with_previous_summary(thread_content)
+            ),
+            deadline=deadline,
+            on_partial_text=on_partial_text,
+        )
+        logger.debug(f"Making a summary took {time.time() - start_time} seconds")
+        return summary
+
+    chunk_tokens = min(budget, THREAD_SUMMARY_CHUNK_TOKENS)
+    if chunk_tokens < MIN_THREAD_SUMMARY_CHUNK_TOKENS:
+        raise ValueError(
+            "The prompt is too long to summarize this thread. Please try a shorter prompt."
+        )
+    chunks = group_by_tokens(
+        thread_content.splitlines(keepends=True), chunk_tokens, count_tokens
+    )
+    increment_counter("thread_summaries", mode="map_reduce")
+    observe("thread_summary_chunks", len(chunks))
+    progress = {"done": 0}
+    progress_lock = threading.Lock()
+
+    def on_part_done():
+        with progress_lock:
+            progress["done"] += 1
+            done = progress["done"]
+        if on_progress is not None:
+            on_progress(done, len(chunks))
+
+    if on_progress is not None:
+        on_progress(0, len(chunks))
+    partial_summaries = _summarize_parts(
+        context=context,
+        openai_api_key=openai_api_key,
+        parts=chunks,
+        merging=False,
+        deadline=deadline,
+        on_part_done=on_part_done,
+    )
+    # Merge the partial summaries level by level until they fit in one request
+    while count_tokens("\n\n".join(partial_summaries)) > budget:
+        groups = group_by_tokens(partial_summaries, chunk_tokens, count_tokens, "\n\n")
+        if len(groups) >= len(partial_summaries):
+            break  # each summary is too long to be merged with another one
+        partial_summaries = _summarize_parts(
+            context=context,
+            openai_api_key=openai_api_key,
+            parts=groups,
+            merging=True,
+            deadline=deadline,
+        )
+    header = "The following are the summaries of consecutive parts of the thread:\n\n"
+    merged = "\n\n".join(partial_summaries)
+    merged_budget = max(1, budget - count_tokens(header))
+    if count_tokens(merged) > merged_budget:
+        # The partial summaries are too long to be merged any further
+        increment_counter("thread_summaries_truncated")
+        merged = split_by_tokens(merged, merged_budget, count_tokens)[0]
+    summary = _request_completion(
+        context=context,
+        openai_api_key=openai_api_key,
+        messages=_build_thread_summary_messages(prompt, with_previous_summary(header + merged)),
+        deadline=deadline,
+        on_partial_text=on_partial_text,
+    )
+    logger.debug(
+        f"Making a summary of {len(chunks)} parts took {time.time() - start_time} seconds"
+    )
+    return summary
 
 
 def generate_proofreading_result(
@@ -603,6 +1126,7 @@ def generate_proofreading_result(
     original_text: str,
     tone_and_voice: Optional[str] = None,
     timeout_seconds: int,
+    on_partial_text: Optional[Callable[[str], None]] = None,
 ) -> str:
     system_content = (
         "You're an assistant tasked with helping Slack users by proofreading a given text. "
@@ -630,22 +1154,16 @@ def generate_proofreading_result(
         },
     ]
     start_time = time.time()
-    openai_response = make_synchronous_openai_call(
+    result = _request_completion(
+        context=context,
         openai_api_key=openai_api_key,
-        model=context["OPENAI_MODEL"],
-        temperature=context["OPENAI_TEMPERATURE"],
         messages=messages,
-        user=context.actor_user_id,
-        openai_api_type=context["OPENAI_API_TYPE"],
-        openai_api_base=context["OPENAI_API_BASE"],
-        openai_api_version=context["OPENAI_API_VERSION"],
-        openai_deployment_id=context["OPENAI_DEPLOYMENT_ID"],
-        openai_organization_id=context["OPENAI_ORG_ID"],
-        timeout_seconds=timeout_seconds,
+        deadline=start_time + timeout_seconds,
+        on_partial_text=on_partial_text,
     )
     spent_time = time.time() - start_time
     logger.debug(f"Proofreading took {spent_time} seconds")
-    return openai_response.model_dump()["choices"][0]["message"]["content"]
+    return result
 
 
 def generate_chatgpt_response(
@@ -655,6 +1173,7 @@ def generate_chatgpt_response(
     openai_api_key: str,
     prompt: str,
     timeout_seconds: int,
+    on_partial_text: Optional[Callable[[str], None]] = None,
 ) -> str:
     messages = [
         {
@@ -669,22 +1188,16 @@ def generate_chatgpt_response(
         {"role": "user", "content": prompt},
     ]
     start_time = time.time()
-    openai_response = make_synchronous_openai_call(
+    result = _request_completion(
+        context=context,
         openai_api_key=openai_api_key,
-        model=context["OPENAI_MODEL"],
-        temperature=context["OPENAI_TEMPERATURE"],
         messages=messages,
-        user=context.actor_user_id,
-        openai_api_type=context["OPENAI_API_TYPE"],
-        openai_api_base=context["OPENAI_API_BASE"],
-        openai_api_version=context["OPENAI_API_VERSION"],
-        openai_deployment_id=context["OPENAI_DEPLOYMENT_ID"],
-        openai_organization_id=context["OPENAI_ORG_ID"],
-        timeout_seconds=timeout_seconds,
+        deadline=start_time + timeout_seconds,
+        on_partial_text=on_partial_text,
     )
     spent_time = time.time() - start_time
     logger.debug(f"Proofreading took {spent_time} seconds")
-    return openai_response.model_dump()["choices"][0]["message"]["content"]
+    return result
 
 
 def create_openai_client(context: BoltContext) -> Union[OpenAI, AzureOpenAI]:
@@ -1,6 +1,12 @@
 import re
+from typing import List, Optional, Pattern, Tuple
 
 from app.env import (
+    DEFAULT_REDACT_EMAIL_PATTERN,
+    DEFAULT_REDACT_PHONE_PATTERN,
+    DEFAULT_REDACT_CREDIT_CARD_PATTERN,
+    DEFAULT_REDACT_SSN_PATTERN,
+    DEFAULT_REDACT_USER_DEFINED_PATTERN,
     REDACT_EMAIL_PATTERN,
     REDACT_PHONE_PATTERN,
     REDACT_CREDIT_CARD_PATTERN,
@@ -9,6 +15,65 @@ from app.env import (
     REDACTION_ENABLED,
 )
 
+# (name, pattern, replacement) in the order of precedence
+_REDACTION_RULES: List[Tuple[str, str, str]] = [
+    ("EMAIL", REDACT_EMAIL_PATTERN, "[EMAIL]"),
+    ("CREDIT_CARD", REDACT_CREDIT_CARD_PATTERN, "[CREDIT CARD]"),
+    ("PHONE", REDACT_PHONE_PATTERN, "[PHONE]"),
+    ("SSN", REDACT_SSN_PATTERN, "[SSN]"),
+    ("USER_DEFINED", REDACT_USER_DEFINED_PATTERN, "[REDACTED]"),
+]
+
+_DEFAULT_PATTERNS = {
+    "EMAIL": DEFAULT_REDACT_EMAIL_PATTERN,
+    "CREDIT_CARD": DEFAULT_REDACT_CREDIT_CARD_PATTERN,
+    "PHONE": DEFAULT_REDACT_PHONE_PATTERN,
+    "SSN": DEFAULT_REDACT_SSN_PATTERN,
+    "USER_DEFINED": DEFAULT_REDACT_USER_DEFINED_PATTERN,
+}
+
+# Every text the default patterns can match contains "@" or a digit
+_DEFAULT_PATTERNS_PREFILTER = re.compile(r"[@\d]")
+
+
+class RedactionEngine:
+    """Applies the precompiled patterns of all the sensitive information categories in the order of precedence"""
+
+    def __init__(self, rules: List[Tuple[str, str, str]]):
+        # Each pattern is compiled on its own, so the inline flags in a pattern apply only to the pattern
+        self.patterns: List[Tuple[Pattern, str]] = []
+        self.prefilter: Optional[Pattern] = None
+
+        active_rules = []
+        for name, pattern, replacement in rules:
+            try:
+                compiled = re.compile(pattern)
+            except re.error as e:
+                raise ValueError(f"REDACT_{name}_PATTERN is not a valid regular expression: {e}")
+            if name == "USER_DEFINED" and pattern == DEFAULT_REDACT_USER_DEFINED_PATTERN:
+                continue  # never matches anything
+            active_rules.append((name, pattern))
+            self.patterns.append((compiled, replacement))
+
+        if all(pattern == _DEFAULT_PATTERNS[name] for name, pattern in active_rules):
+            self.prefilter = _DEFAULT_PATTERNS_PREFILTER
+
+    def redact(self, text: str) -> str:
+        if len(self.patterns) == 0:
+            return text
+        if self.prefilter is not None and self.prefilter.search(text) is None:
+            return text
+        # A category earlier in the list takes precedence (e.g., a card number is not redacted as a phone number)
+        for pattern, replacement in self.patterns:
+            text = pattern.sub(replacement, text)
+        return text
+
+
+# The patterns are validated and compiled only once when this app starts
+_redaction_engine: Optional[RedactionEngine] = (
+    RedactionEngine(_REDACTION_RULES) if REDACTION_ENABLED else None
+)
+
 
 def redact_string(input_string: str) -> str:
     """
@@ -20,14 +85,6 @@ def redact_string(input_string: str) -> str:
     Returns:
         - str: the redacted string
     """
-    output_string = input_string
-    if REDACTION_ENABLED:
-        output_string = re.sub(REDACT_EMAIL_PATTERN, "[EMAIL]", output_string)
-        output_string = re.sub(
-            REDACT_CREDIT_CARD_PATTERN, "[CREDIT CARD]", output_string
-        )
-        output_string = re.sub(REDACT_PHONE_PATTERN, "[PHONE]", output_string)
-        output_string = re.sub(REDACT_SSN_PATTERN, "[SSN]", output_string)
-        output_string = re.sub(REDACT_USER_DEFINED_PATTERN, "[REDACTED]", output_string)
-
-    return output_string
+    if _redaction_engine is None or not input_string:
+        return input_string
+    return _redaction_engine.redact(input_string)
@@ -0,0 +1,65 @@
+import threading
+from typing import Any, Callable, Dict, Optional, TypeVar
+
+from app.metrics import increment_counter
+
+# ----------------------------
+# Request coalescing
+# ----------------------------
+#
+# When many requests miss the same cache entry at the same moment (e.g., right after a deploy,
+# or when an announcement sends lots of users to the Home tab), only the first caller
+# performs the upstream call. The others wait for it and receive the same result (or exception).
+# With share_errors=False, only the results are shared: when the first call fails, one of the waiting
+# callers runs the function again as the new first caller, and the others keep waiting for it.
+
+T = TypeVar("T")
+
+
+class _InFlightCall:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    def __init__(self, name: str, share_errors: bool = True):
+        self.name = name
+        self.share_errors = share_errors
+        self._lock = threading.Lock()
+        self._calls: Dict[str, _InFlightCall] = {}
+
+    def do(self, key: str, fn: Callable[[], T]) -> T:
+        while True:
+            with self._lock:
+                call = self._calls.get(key)
+                is_leader = call is None
+                if is_leader:
+                    call = _InFlightCall()
+                    self._calls[key] = call
+            if is_leader:
+                break
+
+            increment_counter("singleflight_coalesced", group=self.name)
+            call.done.wait()
+            if call.error is None:
+                return call.result
+            if self.share_errors:
+                raise call.error
+
+        increment_counter("singleflight_calls", group=self.name)
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._calls)
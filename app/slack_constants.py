@@ -8,4 +8,6 @@ TIMEOUT_ERROR_MESSAGE = (
 )
 
 DEFAULT_LOADING_TEXT = ":hourglass_flowing_sand: Wait a second, please ..."
+# Appended to the text being streamed
+STREAMING_LOADING_TEXT = " ... :writing_hand:"
 MAX_MESSAGE_LENGTH = 3000
@@ -1,14 +1,27 @@
+import hashlib
+import itertools
+import logging
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from typing import Optional
-from typing import List, Dict
-
-import requests
+from typing import Callable, Deque, Iterator, List, Dict, Tuple
 
 from slack_sdk.web import WebClient, SlackResponse
 from slack_sdk.errors import SlackApiError
 from slack_bolt import BoltContext
 
-from app.env import IMAGE_FILE_ACCESS_ENABLED
+from app.cache_store import InMemoryCacheStore
+from app.env import (
+    BOT_USER_ID_CACHE_TTL_SECONDS,
+    IMAGE_FILE_ACCESS_ENABLED,
+    STREAMING_RESULT_UPDATE_INTERVAL_SECONDS,
+)
+from app.http_transport import http_session
 from app.markdown_conversion import slack_to_markdown
+from app.metrics import increment_counter
+from app.singleflight import SingleFlight
+from app.slack_rate_limiter import background_priority
 
 
 # ----------------------------
@@ -37,37 +50,317 @@ def is_this_app_mentioned(context: BoltContext, parent_message: dict) -> bool:
     return f"<@{context.bot_user_id}>" in parent_message_text
 
 
-def build_thread_replies_as_combined_text(
+# The number of replies fetched per conversations.replies call when building a transcript
+THREAD_REPLIES_PAGE_SIZE = 200
+
+TRANSCRIPT_STRATEGIES = ("oldest_first", "newest_first", "head_tail")
+
+# The tokens reserved for the line telling that some replies are omitted
+_OMISSION_LINE_TOKENS = 16
+
+
+def _iter_thread_replies(
     *,
     context: BoltContext,
     client: WebClient,
     channel: str,
     thread_ts: str,
-) -> str:
-    thread_content = ""
+    oldest: Optional[str] = None,
+) -> Iterator[Tuple[Optional[str], Optional[str]]]:
+    """Yields (ts, "<@user_id>: text" line) for the replies in a thread, oldest first.
+    The line is None for the replies that are not part of the transcript (e.g., the ones by this app)."""
+    kwargs = {} if oldest is None else {"oldest": oldest}
     for page in client.conversations_replies(
         channel=channel,
         ts=thread_ts,
-        limit=1000,
+        limit=THREAD_REPLIES_PAGE_SIZE,
+        **kwargs,
     ):
-        for reply in page.get("messages", []):
+        replies = page.get("messages", [])
+        if oldest is not None:
+            # The parent message is always included
+            replies = [r for r in replies if float(r.get("ts", 0)) > float(oldest)]
+        bot_user_ids = find_bot_user_ids(client=client, context=context, replies=replies)
+        for reply in replies:
             user = reply.get("user")
-            if user == context.bot_user_id:  # Skip replies by this app
-                continue
             if user is None:
-                bot_response = client.bots_info(bot=reply.get("bot_id"))
-                user = bot_response.get("bot", {}).get("user_id")
-                if user is None or user == context.bot_user_id:
-                    continue
-            text = slack_to_markdown("".join(reply["text"].splitlines()))
-            thread_content += f"<@{user}>: {text}\n"
-    return thread_content
+                user = bot_user_ids.get(reply.get("bot_id"))
+            if user is not None and user != context.bot_user_id:  # Skip replies by this app
+                text = slack_to_markdown("".join(reply["text"].splitlines()))
+                yield reply.get("ts"), f"<@{user}>: {text}\n"
+            else:
+                yield reply.get("ts"), None
+
+
+def iter_thread_transcript_lines(
+    *,
+    context: BoltContext,
+    client: WebClient,
+    channel: str,
+    thread_ts: str,
+    oldest: Optional[str] = None,
+) -> Iterator[str]:
+    """Yields the replies in a thread as "<@user_id>: text" lines, oldest first.
+    The next page of replies is fetched only when the lines of the previous page have been consumed.
+
+    When oldest is given, only the replies posted after it are yielded."""
+    replies = _iter_thread_replies(
+        context=context, client=client, channel=channel, thread_ts=thread_ts, oldest=oldest
+    )
+    for _, line in replies:
+        if line is not None:
+            yield line
+
+
+def build_thread_replies_as_combined_text(
+    *,
+    context: BoltContext,
+    client: WebClient,
+    channel: str,
+    thread_ts: str,
+) -> str:
+    return "".join(
+        iter_thread_transcript_lines(
+            context=context, client=client, channel=channel, thread_ts=thread_ts
+        )
+    )
+
+
+def build_thread_transcript(
+    *,
+    context: BoltContext,
+    client: WebClient,
+    channel: str,
+    thread_ts: str,
+    max_tokens: int,
+    count_tokens: Callable[[str], int],
+    strategy: str = "head_tail",
+    oldest: Optional[str] = None,
+    last_seen: Optional[Dict[str, str]] = None,
+) -> str:
+    """Builds the transcript of a thread within max_tokens (counted by count_tokens).
+    When oldest is given, only the replies posted after it are included.
+    last_seen["ts"] is set to the ts of the last reply covered by the transcript;
+    the replies left out at the end (oldest_first) are not covered."""
+    if strategy not in TRANSCRIPT_STRATEGIES:
+        raise ValueError(f"Unknown transcript strategy: {strategy}")
+    if strategy == "oldest_first":
+        head_budget = max_tokens
+    elif strategy == "head_tail":
+        head_budget = max_tokens // 2
+    else:
+        head_budget = 0
+
+    replies = _iter_thread_replies(
+        context=context,
+        client=client,
+        channel=channel,
+        thread_ts=thread_ts,
+        oldest=oldest,
+    )
+    latest_ts: Optional[str] = None
+    try:
+        head: List[str] = []
+        head_tokens = 0
+        overflow: Optional[Tuple[str, int]] = None
+        for ts, line in replies:
+            if line is not None:
+                tokens = count_tokens(line)
+                if head_tokens + tokens > head_budget:
+                    overflow = (line, tokens)
+                    break
+                head.append(line)
+                head_tokens += tokens
+            latest_ts = ts or latest_ts
+        if overflow is None or strategy == "oldest_first":
+            if overflow is not None:
+                increment_counter("thread_transcripts_truncated", strategy=strategy)
+            if last_seen is not None and latest_ts is not None:
+                last_seen["ts"] = latest_ts
+            return "".join(head)
+
+        # Keep the newest lines that fit in the rest of the budget
+        tail_budget = max_tokens - head_tokens - _OMISSION_LINE_TOKENS
+        tail: Deque[Tuple[str, int]] = deque()
+        tail_tokens = 0
+        omitted = 0
+        for ts, line, tokens in itertools.chain(
+            [(ts, *overflow)],
+            ((ts, line, count_tokens(line)) for ts, line in replies if line is not None),
+        ):
+            latest_ts = ts or latest_ts
+            tail.append((line, tokens))
+            tail_tokens += tokens
+            while tail_tokens > tail_budget and len(tail) > 0:
+                _, removed_tokens = tail.popleft()
+                tail_tokens -= removed_tokens
+                omitted += 1
+    finally:
+        replies.close()
+
+    if last_seen is not None and latest_ts is not None:
+        # The omitted replies in the middle are summarized as omitted
+        last_seen["ts"] = latest_ts
+    if omitted == 0:
+        return "".join(head) + "".join(line for line, _ in tail)
+    increment_counter("thread_transcripts_truncated", strategy=strategy)
+    return (
+        "".join(head)
+        + f"(... {omitted} replies omitted ...)\n"
+        + "".join(line for line, _ in tail)
+    )
+
+
+# ----------------------------
+# Bots
+# ----------------------------
+
+# The max number of bots.info calls made at the same time
+BOTS_INFO_MAX_CONCURRENCY = 4
+
+# "{team}:{bot_id}" -> "{expiration time}:{user_id}" (user_id is empty when the bot has no user)
+_bot_user_id_cache = InMemoryCacheStore(name="bot_user_ids", max_size=5000)
+_bots_info_flight = SingleFlight("bots_info")
+
+
+def _fetch_bot_user_id(client: WebClient, team: str, bot_id: str) -> Optional[str]:
+    def _fetch() -> Optional[str]:
+        try:
+            user_id = client.bots_info(bot=bot_id).get("bot", {}).get("user_id")
+        except SlackApiError as e:
+            logging.getLogger(__name__).debug(f"Failed to fetch bot info ({bot_id}) due to {e}")
+            return None
+        expires_at = int(time.time()) + BOT_USER_ID_CACHE_TTL_SECONDS
+        _bot_user_id_cache.set(f"{team}:{bot_id}", f"{expires_at}:{user_id or ''}")
+        return user_id
+
+    return _bots_info_flight.do(f"{team}:{bot_id}", _fetch)
+
+
+def find_bot_user_ids(
+    *, client: WebClient, context: BoltContext, replies: List[dict]
+) -> Dict[str, Optional[str]]:
+    """Returns the Slack user IDs (or None) of the bots that posted the replies without a user ID"""
+    team = context.team_id or context.enterprise_id
+    bot_ids = {
+        reply["bot_id"]
+        for reply in replies
+        if reply.get("user") is None and reply.get("bot_id") is not None
+    }
+    results: Dict[str, Optional[str]] = {}
+    missed_bot_ids = []
+    now = time.time()
+    for bot_id in bot_ids:
+        cached = _bot_user_id_cache.get(f"{team}:{bot_id}")
+        if cached is not None:
+            expires_at, user_id = cached.split(":", 1)
+            if int(expires_at) > now:
+                results[bot_id] = user_id or None
+                continue
+        missed_bot_ids.append(bot_id)
+
+    if len(missed_bot_ids) > 0:
+        with ThreadPoolExecutor(
+            max_workers=min(len(missed_bot_ids), BOTS_INFO_MAX_CONCURRENCY)
+        ) as executor:
+            user_ids = executor.map(
+                lambda bot_id: _fetch_bot_user_id(client, team, bot_id), missed_bot_ids
+            )
+            results.update(zip(missed_bot_ids, user_ids))
+    return results
 
 
 # ----------------------------
 # WIP reply message stuff
 # ----------------------------
 
+# The metadata attached to this app's replies keeps the system messages of the conversation.
+#
+# v1: {"messages": [{"role": "system", "content": "..."}], "user": "U..."}
+# v2: {"v": 2, "user": "U...", "system": [{"hash": "..."} or {"content": "..."}]}
+#     The system prompt that this app currently uses is referred to by its hash instead of the full text.
+CONVERSATION_METADATA_EVENT_TYPE = "chat-gpt-convo"
+
+
+def _system_text_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:16]
+
+
+def build_conversation_metadata(
+    *,
+    messages: List[Dict[str, str]],
+    user: str,
+    shared_system_text: Optional[str] = None,
+    continues: Optional[str] = None,
+    reopens_code_block: bool = False,
+) -> dict:
+    system = []
+    for msg in messages:
+        if msg["role"] != "system":
+            continue
+        if shared_system_text is not None and msg["content"] == shared_system_text:
+            system.append({"hash": _system_text_hash(msg["content"])})
+        else:
+            system.append({"content": msg["content"]})
+    payload = {"v": 2, "user": user, "system": system}
+    if continues is not None:
+        # This message is the continuation of a long reply (the ts of the previous piece)
+        payload["continues"] = continues
+        if reopens_code_block:
+            # The previous piece was split inside a code block, closed with ``` and reopened here
+            payload["reopens_code_block"] = True
+    return {"event_type": CONVERSATION_METADATA_EVENT_TYPE, "event_payload": payload}
+
+
+def is_continuation_of(reply: dict, previous_reply: Optional[dict]) -> bool:
+    if previous_reply is None:
+        return False
+    metadata = reply.get("metadata") or {}
+    if metadata.get("event_type") != CONVERSATION_METADATA_EVENT_TYPE:
+        return False
+    continues = (metadata.get("event_payload") or {}).get("continues")
+    return continues is not None and continues == previous_reply.get("ts")
+
+
+def merge_continuation_text(text: str, continuation: str, reply: dict) -> str:
+    """Joins the text of a long reply and the text of its continuation (reply)"""
+    payload = (reply.get("metadata") or {}).get("event_payload") or {}
+    if (
+        payload.get("reopens_code_block") is True
+        and text.endswith("```")
+        and continuation.startswith("```\n")
+    ):
+        # Remove the fences added at the split so that the code block is in one piece again
+        return text[: -len("```")] + continuation[len("```\n"):]
+    return text + "\n" + continuation
+
+
+def parse_conversation_metadata(
+    metadata: Optional[dict],
+    shared_system_text: str,
+) -> Tuple[Optional[List[Dict[str, str]]], Optional[str]]:
+    """Returns the system messages and the user ID in the metadata of this app's reply"""
+    if metadata is None or metadata.get("event_type") != CONVERSATION_METADATA_EVENT_TYPE:
+        return None, None
+    payload = metadata.get("event_payload") or {}
+    user = payload.get("user")
+    if payload.get("v") != 2:
+        return payload.get("messages"), user
+
+    messages = []
+    for item in payload.get("system") or []:
+        content = item.get("content")
+        if content is None:
+            if item.get("hash") != _system_text_hash(shared_system_text):
+                # The system prompt has been changed since the reply was posted;
+                # the conversation continues with the current one
+                logging.getLogger(__name__).debug(
+                    f"Unknown system prompt hash: {item.get('hash')}"
+                )
+            content = shared_system_text
+        messages.append({"role": "system", "content": content})
+    return messages, user
+
 
 def post_wip_message(
     *,
@@ -77,16 +370,21 @@ def post_wip_message(
     loading_text: str,
     messages: List[Dict[str, str]],
     user: str,
+    shared_system_text: Optional[str] = None,
+    continues: Optional[str] = None,
+    reopens_code_block: bool = False,
 ) -> SlackResponse:
-    system_messages = [msg for msg in messages if msg["role"] == "system"]
     return client.chat_postMessage(
         channel=channel,
         thread_ts=thread_ts,
         text=loading_text,
-        metadata={
-            "event_type": "chat-gpt-convo",
-            "event_payload": {"messages": system_messages, "user": user},
-        },
+        metadata=build_conversation_metadata(
+            messages=messages,
+            user=user,
+            shared_system_text=shared_system_text,
+            continues=continues,
+            reopens_code_block=reopens_code_block,
+        ),
     )
 
 
@@ -97,17 +395,161 @@ def update_wip_message(
     text: str,
     messages: List[Dict[str, str]],
     user: str,
+    attach_metadata: bool = True,
+    shared_system_text: Optional[str] = None,
+    continues: Optional[str] = None,
+    reopens_code_block: bool = False,
 ) -> SlackResponse:
-    system_messages = [msg for msg in messages if msg["role"] == "system"]
+    if not attach_metadata:
+        # Intermediate updates while streaming; the metadata attached to the message is left intact
+        with background_priority():
+            return client.chat_update(channel=channel, ts=ts, text=text)
     return client.chat_update(
         channel=channel,
         ts=ts,
         text=text,
-        metadata={
-            "event_type": "chat-gpt-convo",
-            "event_payload": {"messages": system_messages, "user": user},
-        },
+        metadata=build_conversation_metadata(
+            messages=messages,
+            user=user,
+            shared_system_text=shared_system_text,
+            continues=continues,
+            reopens_code_block=reopens_code_block,
+        ),
+    )
+
+
+# ----------------------------
+# Streaming results in modals and messages
+# ----------------------------
+#
+# While a result (e.g., a proofreading result) is being streamed, the text generated so far is
+# displayed at most once per STREAMING_RESULT_UPDATE_INTERVAL_SECONDS. The final result is
+# displayed by the caller as before.
+
+
+class _ThrottledPublisher:
+    def __init__(self, logger: logging.Logger, interval_seconds: float):
+        self.logger = logger
+        self.interval_seconds = interval_seconds
+        self.published_at: Optional[float] = None
+        self.stopped = False
+
+    def __call__(self, text: str) -> None:
+        now = time.time()
+        if self.stopped or (
+            self.published_at is not None
+            and now - self.published_at < self.interval_seconds
+        ):
+            return
+        self.published_at = now
+        try:
+            self._publish(text)
+        except SlackApiError as e:
+            # The following partial results are skipped; the final result is displayed anyway
+            self.stopped = True
+            self.logger.debug(f"Failed to display a partial result due to {e}")
+        except TimeoutError:
+            # Waited for the rate limit until the request's deadline
+            self.stopped = True
+            increment_counter("deadline_stages_skipped", stage="partial_result")
+
+    def _publish(self, text: str) -> None:
+        raise NotImplementedError()
+
+
+class StreamingViewPublisher(_ThrottledPublisher):
+    def __init__(
+        self,
+        *,
+        client: WebClient,
+        view_id: str,
+        build_view: Callable[[str], dict],
+        logger: logging.Logger,
+        interval_seconds: float = STREAMING_RESULT_UPDATE_INTERVAL_SECONDS,
+    ):
+        super().__init__(logger, interval_seconds)
+        self.client = client
+        self.view_id = view_id
+        self.build_view = build_view
+        self.view_hash: Optional[str] = None
+
+    def _publish(self, text: str) -> None:
+        # With the hash of the last update, Slack rejects this update (hash_conflict)
+        # if the modal has been updated by anything else in the meantime (e.g., an error message)
+        with background_priority():
+            response = self.client.views_update(
+                view_id=self.view_id, hash=self.view_hash, view=self.build_view(text)
+            )
+        self.view_hash = response.get("view", {}).get("hash")
+
+
+class StreamingMessagePublisher(_ThrottledPublisher):
+    def __init__(
+        self,
+        *,
+        client: WebClient,
+        channel: str,
+        thread_ts: str,
+        format_text: Callable[[str], str],
+        logger: logging.Logger,
+        interval_seconds: float = STREAMING_RESULT_UPDATE_INTERVAL_SECONDS,
+    ):
+        super().__init__(logger, interval_seconds)
+        self.client = client
+        self.channel = channel
+        self.thread_ts = thread_ts
+        self.format_text = format_text
+        self.ts: Optional[str] = None
+
+    def _publish(self, text: str) -> None:
+        if self.ts is None:
+            # The first partial result is posted as soon as possible
+            response = self.client.chat_postMessage(
+                channel=self.channel,
+                thread_ts=self.thread_ts,
+                text=self.format_text(text),
+            )
+            self.ts = response["ts"]
+        else:
+            with background_priority():
+                self.client.chat_update(
+                    channel=self.channel, ts=self.ts, text=self.format_text(text)
+                )
+
+    def finish(self, text: str) -> None:
+        """Posts the final result, or replaces the partial result with it"""
+        if self.ts is None:
+            self.client.chat_postMessage(
+                channel=self.channel, thread_ts=self.thread_ts, text=text
+            )
+        else:
+            self.client.chat_update(channel=self.channel, ts=self.ts, text=text)
+
+    def discard(self) -> None:
+        """Deletes the partial result (e.g., when the generation has failed)"""
+        if self.ts is not None:
+            try:
+                self.client.chat_delete(channel=self.channel, ts=self.ts)
+            except SlackApiError as e:
+                self.logger.debug(f"Failed to delete a partial result due to {e}")
+            self.ts = None
+
+
+# ----------------------------
+# Users
+# ----------------------------
+
+_user_locale_flight = SingleFlight("users_info")
+
+
+def fetch_user_locale(client: WebClient, context: BoltContext) -> Optional[str]:
+    # Many events from the same user (e.g., opening the Home tab several times) share one users.info call
+    user_id = context.actor_user_id or context.user_id
+    user_info = _user_locale_flight.do(
+        f"{context.team_id}:{user_id}",
+        lambda: client.users_info(user=user_id, include_locale=True),
     )
+    return user_info.get("user", {}).get("locale")
 
 
 # ----------------------------
@@ -139,10 +581,13 @@ def can_send_image_url_to_openai(context: BoltContext) -> bool:
     return can_send_image_url
 
 
-def download_slack_image_content(image_url: str, bot_token: str) -> bytes:
-    response = requests.get(
+def download_slack_image_content(
+    image_url: str, bot_token: str, timeout_seconds: Optional[float] = None
+) -> bytes:
+    response = http_session().get(
         image_url,
         headers={"Authorization": f"Bearer {bot_token}"},
+        timeout=timeout_seconds,
     )
     if response.status_code != 200:
         error = f"Request to {image_url} failed with status code {response.status_code}"
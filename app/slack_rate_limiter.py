@@ -0,0 +1,354 @@
+import hashlib
+import heapq
+import itertools
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from slack_sdk.errors import SlackApiError
+from slack_sdk.http_retry.builtin_handlers import RateLimitErrorRetryHandler
+from slack_sdk.web import WebClient, SlackResponse
+
+from app.deadline import Deadline
+from app.http_transport import PooledWebClient, web_client_settings
+from app.metrics import increment_counter, observe
+
+# ----------------------------
+# Slack Web API rate limiting
+# ----------------------------
+#
+# Slack limits the number of calls per minute for each (workspace, app, API method).
+# chat.postMessage is additionally limited to roughly one message per second per channel.
+# Instead of sending requests and retrying after 429 errors, the calls are scheduled with
+# client-side token buckets. A 429 response's Retry-After header pauses the bucket and slows it down.
+# Interactive calls (e.g., posting a reply) are sent ahead of background ones
+# (e.g., the intermediate updates of a streamed reply), and when multiple chat.update calls
+# for the same message are waiting, only the latest content is sent.
+# The background calls made while processing a request stop waiting with a TimeoutError when the request's
+# deadline passes; the interactive ones (e.g., the final reply or an error message) are always sent.
+
+INTERACTIVE = 0
+BACKGROUND = 1
+
+# API method -> (requests per minute, limited per channel)
+_METHOD_LIMITS: Dict[str, Tuple[int, bool]] = {
+    "chat.postMessage": (60, True),
+    "chat.update": (50, False),
+    "chat.delete": (50, False),
+    "conversations.history": (50, False),
+    "conversations.replies": (50, False),
+    "conversations.info": (100, False),
+    "users.info": (100, False),
+    "files.info": (100, False),
+    "views.open": (100, False),
+    "views.update": (100, False),
+    "views.publish": (100, False),
+    "auth.test": (100, False),
+}
+# Tier 2
+_DEFAULT_METHOD_LIMIT = (20, False)
+
+# How many seconds of requests can be sent at once
+BURST_SECONDS = 6
+# The rate never goes below this fraction of the documented limit after 429 errors
+MIN_RATE_FACTOR = 0.125
+# After each successful call, the rate recovers by this fraction of the documented limit
+RATE_RECOVERY_FACTOR = 0.05
+MAX_RATE_LIMITED_RETRIES = 2
+
+_priority = threading.local()
+
+
+def current_priority() -> int:
+    return getattr(_priority, "value", INTERACTIVE)
+
+
+@contextmanager
+def background_priority() -> Iterator[None]:
+    """Slack API calls made within this block wait for the interactive ones"""
+    previous = current_priority()
+    _priority.value = BACKGROUND
+    try:
+        yield
+    finally:
+        _priority.value = previous
+
+
+class TokenBucket:
+    def __init__(self, requests_per_minute: int):
+        self.max_rate = requests_per_minute / 60
+        self.rate = self.max_rate
+        self.capacity = max(1.0, self.max_rate * BURST_SECONDS)
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+        self.blocked_until = 0.0
+        self.condition = threading.Condition()
+        self.waiters: List[Tuple[int, int]] = []
+
+    def _refill(self, now: float) -> None:
+        if now <= self.updated_at:
+            return  # paused by a 429 response
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def acquire(self, priority: int, seq: int, timeout_seconds: Optional[float] = None) -> float:
+        """Blocks until this call can be sent and returns the waiting time in seconds.
+        Raises TimeoutError when the call cannot be sent within timeout_seconds."""
+        started_at = time.monotonic()
+        give_up_at = started_at + timeout_seconds if timeout_seconds is not None else None
+        entry = (priority, seq)
+        with self.condition:
+            heapq.heappush(self.waiters, entry)
+            while True:
+                now = time.monotonic()
+                self._refill(now)
+                if self.waiters[0] != entry:
+                    # Another call goes first; it notifies the others when it leaves the queue
+                    wait_seconds = None
+                elif now < self.blocked_until:
+                    wait_seconds = self.blocked_until - now
+                elif self.tokens < 1:
+                    wait_seconds = (1 - self.tokens) / self.rate
+                else:
+                    self.tokens -= 1
+                    heapq.heappop(self.waiters)
+                    self.condition.notify_all()
+                    return now - started_at
+                if give_up_at is not None:
+                    # Give up as soon as it's clear that this call cannot be sent in time
+                    if now >= give_up_at or (
+                        wait_seconds is not None and now + wait_seconds > give_up_at
+                    ):
+                        self.waiters.remove(entry)
+                        heapq.heapify(self.waiters)
+                        self.condition.notify_all()
+                        raise TimeoutError()
+                    wait_seconds = min(wait_seconds or give_up_at - now, give_up_at - now)
+                self.condition.wait(wait_seconds)
+
+    def on_success(self) -> None:
+        with self.condition:
+            if self.rate < self.max_rate:
+                self.rate = min(self.max_rate, self.rate + self.max_rate * RATE_RECOVERY_FACTOR)
+
+    def on_rate_limited(self, retry_after: float) -> None:
+        with self.condition:
+            now = time.monotonic()
+            self.blocked_until = max(self.blocked_until, now + retry_after)
+            self.rate = max(self.max_rate * MIN_RATE_FACTOR, self.rate / 2)
+            # Only one call is sent right after the pause; the others follow at the reduced rate
+            self.tokens = 1
+            self.updated_at = self.blocked_until
+            self.condition.notify_all()
+
+    def queue_depth(self) -> int:
+        with self.condition:
+            return len(self.waiters)
+
+
+class _PendingUpdate:
+    def __init__(self, kwargs: dict):
+        self.kwargs = kwargs
+        self.done = threading.Event()
+        self.response: Optional[SlackResponse] = None
+        self.error: Optional[BaseException] = None
+
+
+class SlackApiScheduler:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._buckets: Dict[Tuple[str, str, Optional[str]], TokenBucket] = {}
+        self._pending_updates: Dict[Tuple[str, str, str], _PendingUpdate] = {}
+        self._seq = itertools.count()
+
+    def bucket(self, team: str, method: str, channel: Optional[str]) -> TokenBucket:
+        requests_per_minute, per_channel = _METHOD_LIMITS.get(method, _DEFAULT_METHOD_LIMIT)
+        key = (team, method, channel if per_channel else None)
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = TokenBucket(requests_per_minute)
+                self._buckets[key] = bucket
+            return bucket
+
+    def queue_depth(self) -> int:
+        with self._lock:
+            buckets = list(self._buckets.values())
+        return sum(b.queue_depth() for b in buckets)
+
+    def call(
+        self,
+        *,
+        team: str,
+        method: str,
+        channel: Optional[str],
+        send: Callable[[], SlackResponse],
+        deadline: Optional[Deadline] = None,
+    ) -> SlackResponse:
+        bucket = self.bucket(team, method, channel)
+        priority = current_priority()
+        gives_up = deadline is not None and priority == BACKGROUND
+        for attempt in range(MAX_RATE_LIMITED_RETRIES + 1):
+            observe("slack_api_queue_depth", bucket.queue_depth(), method=method)
+            waited = bucket.acquire(
+                priority,
+                next(self._seq),
+                timeout_seconds=deadline.remaining() if gives_up else None,
+            )
+            observe("slack_api_wait_seconds", waited, method=method, priority=priority)
+            try:
+                response = send()
+                bucket.on_success()
+                increment_counter("slack_api_calls", method=method)
+                return response
+            except SlackApiError as e:
+                if e.response.status_code != 429:
+                    raise
+                increment_counter("slack_api_rate_limited", method=method)
+                bucket.on_rate_limited(_retry_after(e.response))
+                if attempt == MAX_RATE_LIMITED_RETRIES:
+                    raise
+        raise AssertionError("unreachable")
+
+    def update_message(
+        self,
+        *,
+        team: str,
+        channel: str,
+        ts: str,
+        kwargs: dict,
+        send: Callable[[dict], SlackResponse],
+        deadline: Optional[Deadline] = None,
+    ) -> SlackResponse:
+        """Sends a chat.update call. While a call for the same message is waiting for its turn,
+        newer calls replace its content and receive the same response."""
+        key = (team, channel, ts)
+        while True:
+            with self._lock:
+                pending = self._pending_updates.get(key)
+                is_sender = pending is None
+                if is_sender:
+                    pending = _PendingUpdate(dict(kwargs))
+                    self._pending_updates[key] = pending
+                else:
+                    # Only the latest payload is sent; the keys omitted by this call must not be re-sent
+                    pending.kwargs = dict(kwargs)
+            if is_sender:
+                break
+
+            increment_counter("slack_api_updates_coalesced")
+            pending.done.wait()
+            if isinstance(pending.error, TimeoutError) and current_priority() != BACKGROUND:
+                # A background call gave up at the deadline without sending this content
+                continue
+            if pending.error is not None:
+                raise pending.error
+            return pending.response
+
+        def send_latest() -> SlackResponse:
+            # The content is fixed here; calls made after this point are sent separately
+            with self._lock:
+                if self._pending_updates.get(key) is pending:
+                    del self._pending_updates[key]
+                latest_kwargs = pending.kwargs
+            return send(latest_kwargs)
+
+        try:
+            pending.response = self.call(
+                team=team,
+                method="chat.update",
+                channel=channel,
+                send=send_latest,
+                deadline=deadline,
+            )
+            return pending.response
+        except BaseException as e:
+            pending.error = e
+            raise
+        finally:
+            with self._lock:
+                if self._pending_updates.get(key) is pending:
+                    del self._pending_updates[key]
+            pending.done.set()
+
+
+def _retry_after(response: SlackResponse) -> float:
+    headers = response.headers or {}
+    value = headers.get("retry-after", headers.get("Retry-After"))
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return 1.0
+
+
+# Shared by all the clients in this process
+default_scheduler = SlackApiScheduler()
+
+
+class RateLimitedWebClient(PooledWebClient):
+    """A WebClient that sends all the API calls through a SlackApiScheduler"""
+
+    def __init__(self, *args, scheduler: Optional[SlackApiScheduler] = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.scheduler = scheduler or default_scheduler
+
+    def _team_key(self) -> str:
+        team_id = self.default_params.get("team_id")
+        if team_id is not None:
+            return team_id
+        return hashlib.sha256((self.token or "").encode("utf-8")).hexdigest()[:16]
+
+    def api_call(
+        self,
+        api_method: str,
+        *,
+        http_verb: str = "POST",
+        files: Optional[dict] = None,
+        data: Optional[dict] = None,
+        params: Optional[dict] = None,
+        json: Optional[dict] = None,
+        headers: Optional[dict] = None,
+        auth: Optional[dict] = None,
+    ) -> SlackResponse:
+        def send(json_body: Optional[dict] = json) -> SlackResponse:
+            return super(RateLimitedWebClient, self).api_call(
+                api_method,
+                http_verb=http_verb,
+                files=files,
+                data=data,
+                params=params,
+                json=json_body,
+                headers=headers,
+                auth=auth,
+            )
+
+        args = json or data or params or {}
+        channel = args.get("channel")
+        if api_method == "chat.update" and json is not None and channel and args.get("ts"):
+            return self.scheduler.update_message(
+                team=self._team_key(),
+                channel=channel,
+                ts=json["ts"],
+                kwargs=json,
+                send=send,
+                deadline=self.deadline,
+            )
+        return self.scheduler.call(
+            team=self._team_key(),
+            method=api_method,
+            channel=channel,
+            send=send,
+            deadline=self.deadline,
+        )
+
+
+def build_rate_limited_client(client: WebClient, team_id: Optional[str] = None) -> RateLimitedWebClient:
+    """Creates a RateLimitedWebClient with the same settings as the given client.
+    The built-in 429 retry handler is removed as the scheduler retries rate-limited calls by itself."""
+    settings = web_client_settings(client)
+    settings["team_id"] = team_id or settings["team_id"]
+    settings["retry_handlers"] = [
+        h for h in settings["retry_handlers"] if not isinstance(h, RateLimitErrorRetryHandler)
+    ]
+    return RateLimitedWebClient(**settings)
@@ -1,8 +1,8 @@
 import json
-from typing import Optional, List
+from typing import Callable, Optional, List
 from slack_bolt import BoltContext
 from slack_sdk.errors import SlackApiError
-from app.i18n import translate
+from app.i18n import translate, translate_many, translate_long_text
 from app.openai_constants import (
     GPT_3_5_TURBO_MODEL,
     GPT_4_MODEL,
@@ -10,7 +10,11 @@ from app.openai_constants import (
     GPT_4O_MODEL,
     GPT_4O_MINI_MODEL,
 )
-from app.slack_constants import TIMEOUT_ERROR_MESSAGE, MAX_MESSAGE_LENGTH
+from app.slack_constants import (
+    TIMEOUT_ERROR_MESSAGE,
+    MAX_MESSAGE_LENGTH,
+    STREAMING_LOADING_TEXT,
+)
 from app.slack_ops import extract_state_value
 
 
@@ -29,28 +33,53 @@ def _build_translation_result_modal(blocks: List[dict]) -> dict:
     }
 
 
-def build_translation_result_modal(*, context: BoltContext, payload: dict) -> dict:
+def _build_translation_result_blocks(translated: str) -> List[dict]:
+    blocks = []
+    remaining = translated
+    while remaining:
+        chunk = remaining[: MAX_MESSAGE_LENGTH - 6]
+        blocks.append(
+            {
+                "type": "section",
+                "text": {"type": "mrkdwn", "text": f"```{chunk}```"},
+            }
+        )
+        remaining = remaining[MAX_MESSAGE_LENGTH - 6:]
+    return blocks
+
+
+def build_translation_result_modal(
+    *,
+    context: BoltContext,
+    payload: dict,
+    on_progress: Optional[Callable[[dict], None]] = None,
+) -> dict:
     text = json.loads(payload["private_metadata"]).get("text")
     openai_api_key = context.get("OPENAI_API_KEY")
 
-    try:
-        translated = translate(
-            openai_api_key=openai_api_key, context=context, text=text
+    def _display_partial_result(translated_so_far: str):
+        # Show the leading chunks while translating the rest
+        blocks = _build_translation_result_blocks(translated_so_far)
+        blocks.append(
+            {
+                "type": "context",
+                "elements": [
+                    {"type": "mrkdwn", "text": "Translating the rest ... :hourglass:"}
+                ],
+            }
         )
-        blocks = []
-        remaining = translated
+        on_progress(_build_translation_result_modal(blocks))
 
-        while remaining:
-            chunk = remaining[: MAX_MESSAGE_LENGTH - 6]
-            blocks.append(
-                {
-                    "type": "section",
-                    "text": {"type": "mrkdwn", "text": f"```{chunk}```"},
-                }
-            )
-            remaining = remaining[MAX_MESSAGE_LENGTH - 6:]
-
-        return _build_translation_result_modal(blocks)
+    try:
+        translated = translate_long_text(
+            openai_api_key=openai_api_key,
+            context=context,
+            text=text,
+            on_progress=_display_partial_result if on_progress is not None else None,
+        )
+        return _build_translation_result_modal(
+            _build_translation_result_blocks(translated)
+        )
     except Exception as e:
         blocks = [
             {
@@ -108,15 +137,20 @@ def build_translation_wip_modal(text: str) -> dict:
 # ----------------------------
 
 
+DEFAULT_SUMMARIZE_PROMPT = (
+    "All replies posted in a Slack thread will be provided below. "
+    "Could you summarize the discussion in 200 characters or less?"
+)
+
+HERE_IS_SUMMARY_TEXT = "Here is the summary:"
+
+
 def build_summarize_option_modal(*, context: BoltContext, body: dict) -> dict:
     openai_api_key = context.get("OPENAI_API_KEY")
     prompt = translate(
         openai_api_key=openai_api_key,
         context=context,
-        text=(
-            "All replies posted in a Slack thread will be provided below. "
-            "Could you summarize the discussion in 200 characters or less?"
-        ),
+        text=DEFAULT_SUMMARIZE_PROMPT,
     )
     thread_ts = body["message"].get("thread_ts", body["message"].get("ts"))
     where_to_display_options = [
@@ -249,6 +283,13 @@ def build_summarize_wip_modal() -> dict:
     )
 
 
+def build_summarize_progress_modal(*, done: int, total: int) -> dict:
+    return _build_summarize_wip_modal(
+        "This thread is long, so I'm summarizing it in parts ... :hourglass:\n"
+        f"({done}/{total} parts done)"
+    )
+
+
 def build_summarize_message_modal() -> dict:
     return _build_summarize_wip_modal(
         "Got it! Once the summary is ready, I will post it in the thread."
@@ -274,6 +315,12 @@ def build_summarize_result_modal(*, here_is_summary: str, summary: str) -> dict:
     return _build_summary_result_modal(f"{here_is_summary}\n\n{summary}")
 
 
+def build_summarize_partial_result_modal(*, here_is_summary: str, summary: str) -> dict:
+    return _build_summary_result_modal(
+        f"{here_is_summary}\n\n{summary}{STREAMING_LOADING_TEXT}"
+    )
+
+
 def build_summarize_timeout_error_modal() -> dict:
     return _build_summary_result_modal(TIMEOUT_ERROR_MESSAGE)
 
@@ -294,9 +341,25 @@ DEFAULT_HOME_TAB_MESSAGE = (
     "Visit <https://platform.openai.com/account/api-keys|your developer page> to grap your key!"
 )
 
+READY_HOME_TAB_MESSAGE = "This app is ready to use in this workspace :raised_hands:"
+
 DEFAULT_HOME_TAB_CONFIGURE_LABEL = "Configure"
 
 
+def build_home_tab_original_texts(message: str) -> List[str]:
+    return [
+        message,
+        DEFAULT_HOME_TAB_CONFIGURE_LABEL,
+        "Can you proofread the following sentence without changing its meaning?",
+        "(Start a chat from scratch)",
+        "Start",
+        "Chat Templates",
+        "Configuration",
+        "Can you generate an image as I instruct you?",
+        "Can you generate variations for my images?",
+    ]
+
+
 def build_home_tab(
     *,
     openai_api_key: Optional[str],
@@ -304,42 +367,21 @@ def build_home_tab(
     message: str = DEFAULT_HOME_TAB_MESSAGE,
     single_workspace_mode: bool = False,
 ) -> dict:
-    original_sentences = "\n".join(
-        [
-            f"* {message}",
-            f"* {DEFAULT_HOME_TAB_CONFIGURE_LABEL}",
-            "* Can you proofread the following sentence without changing its meaning?",
-            "* (Start a chat from scratch)",
-            "* Start",
-            "* Chat Templates",
-            "* Configuration",
-            "* Can you generate an image as I instruct you?",
-            "* Can you generate variations for my images?",
-        ]
-    )
-    translated_sentences = list(
-        map(
-            lambda s: s.replace("* ", ""),
-            filter(
-                # Consider that translation results might contain extra newlines
-                lambda s: s != "",
-                translate(
-                    openai_api_key=openai_api_key,
-                    context=context,
-                    text=original_sentences,
-                ).split("\n"),
-            ),
-        )
+    (
+        message,
+        configure_label,
+        proofreading,
+        from_scratch,
+        start,
+        chat_templates,
+        configuration,
+        image_generation,
+        image_variations,
+    ) = translate_many(
+        openai_api_key=openai_api_key,
+        context=context,
+        texts=build_home_tab_original_texts(message),
     )
-    message = translated_sentences[0]
-    configure_label = translated_sentences[1]
-    proofreading = translated_sentences[2]
-    from_scratch = translated_sentences[3]
-    start = translated_sentences[4]
-    chat_templates = translated_sentences[5]
-    configuration = translated_sentences[6]
-    image_generation = translated_sentences[7]
-    image_variations = translated_sentences[8]
 
     blocks = []
     if single_workspace_mode is False:
@@ -417,20 +459,26 @@ def build_home_tab(
     return {"type": "home", "blocks": blocks}
 
 
+CONFIGURE_MODAL_API_KEY_LABEL = "Save your OpenAI API key:"
+CONFIGURE_MODAL_SUBMIT_LABEL = "Submit"
+CONFIGURE_MODAL_CANCEL_LABEL = "Cancel"
+CONFIGURE_MODEL_NOT_AVAILABLE_ERROR = "This model is not yet available for this API key"
+CONFIGURE_INVALID_API_KEY_ERROR = "This API key seems to be invalid"
+CONFIGURE_MODAL_TEXTS = [
+    CONFIGURE_MODAL_API_KEY_LABEL,
+    CONFIGURE_MODAL_SUBMIT_LABEL,
+    CONFIGURE_MODAL_CANCEL_LABEL,
+]
+
+
 def build_configure_modal(context: BoltContext) -> dict:
     already_set_api_key = context.get("OPENAI_API_KEY")
-    api_key_text = "Save your OpenAI API key:"
-    submit = "Submit"
-    cancel = "Cancel"
+    api_key_text, submit, cancel = CONFIGURE_MODAL_TEXTS
     if already_set_api_key is not None:
-        api_key_text = translate(
-            openai_api_key=already_set_api_key, context=context, text=api_key_text
-        )
-        submit = translate(
-            openai_api_key=already_set_api_key, context=context, text=submit
-        )
-        cancel = translate(
-            openai_api_key=already_set_api_key, context=context, text=cancel
+        api_key_text, submit, cancel = translate_many(
+            openai_api_key=already_set_api_key,
+            context=context,
+            texts=CONFIGURE_MODAL_TEXTS,
         )
 
     options = [
@@ -550,6 +598,26 @@ def build_proofreading_input_modal(prompt: str, tone_and_voice: Optional[str]) -
 
 def build_proofreading_wip_modal(
     payload: dict, context: BoltContext, text: str
+) -> dict:
+    return _build_proofreading_wip_modal(
+        payload=payload,
+        context=context,
+        section_text=f"{text}\n\nProofreading your input now ... :hourglass:",
+    )
+
+
+def build_proofreading_partial_result_modal(
+    *, payload: dict, context: BoltContext, text: str, result: str
+) -> dict:
+    return _build_proofreading_wip_modal(
+        payload=payload,
+        context=context,
+        section_text=f"{text}\n\n{result}{STREAMING_LOADING_TEXT}",
+    )
+
+
+def _build_proofreading_wip_modal(
+    *, payload: dict, context: BoltContext, section_text: str
 ) -> dict:
     return {
         "type": "modal",
@@ -569,10 +637,7 @@ def build_proofreading_wip_modal(
             },
             {
                 "type": "section",
-                "text": {
-                    "type": "mrkdwn",
-                    "text": f"{text}\n\nProofreading your input now ... :hourglass:",
-                },
+                "text": {"type": "mrkdwn", "text": section_text},
             },
         ],
     }
@@ -999,6 +1064,10 @@ def build_from_scratch_result_modal(
     return _build_from_scratch_modal(f"{text}\n\n{result}")
 
 
+def build_from_scratch_partial_result_modal(*, text: str, result: str) -> dict:
+    return _build_from_scratch_modal(f"{text}\n\n{result}{STREAMING_LOADING_TEXT}")
+
+
 def build_from_scratch_timeout_modal(text: str) -> dict:
     return _build_from_scratch_modal(f"{text}\n\n{TIMEOUT_ERROR_MESSAGE}")
 
@@ -0,0 +1,67 @@
+import random
+from typing import Dict, List, Optional
+
+from app.env import OPENAI_STREAM_RESUME_BACKOFF_SECONDS, OPENAI_STREAM_RESUME_MAX_ATTEMPTS
+from app.model_routing import is_transient_openai_error
+from app.stream_watchdog import OpenAIStreamTimeoutError
+
+# ----------------------------
+# Resuming broken OpenAI streams
+# ----------------------------
+#
+# When a reply stream breaks after some content has been received, the partial reply is sent back
+# as the assistant's message along with an instruction to continue it, and the continuation is
+# appended to the same reply. The tokens already received are not generated (nor paid for) again.
+
+MAX_RESUME_BACKOFF_SECONDS = 4.0
+
+CONTINUATION_PROMPT = (
+    "Your previous response was cut off. Continue it exactly where it stopped. "
+    "Don't repeat any part of it, and don't add any introduction or explanation."
+)
+
+
+def is_resumable_stream_error(error: BaseException) -> bool:
+    if isinstance(error, OpenAIStreamTimeoutError):
+        return error.kind == "stall"
+    # Connection errors, 5xx errors, error events in the middle of a stream, etc.
+    return is_transient_openai_error(error)
+
+
+def resume_backoff_seconds(
+    attempt: int,
+    base_seconds: float = OPENAI_STREAM_RESUME_BACKOFF_SECONDS,
+) -> float:
+    """Returns the jittered wait time before the given attempt (1 for the first one)"""
+    return random.uniform(0, min(MAX_RESUME_BACKOFF_SECONDS, base_seconds * 2 ** (attempt - 1)))
+
+
+def next_resume_backoff_seconds(
+    *,
+    error: BaseException,
+    attempt: int,
+    partial_content: str,
+    remaining_seconds: float,
+    max_attempts: int = OPENAI_STREAM_RESUME_MAX_ATTEMPTS,
+) -> Optional[float]:
+    """Returns how long to wait before resuming the stream, or None if it should not be resumed"""
+    if attempt > max_attempts or partial_content == "":
+        return None
+    if not is_resumable_stream_error(error):
+        return None
+    backoff_seconds = resume_backoff_seconds(attempt)
+    # Leave at least a few seconds for the continuation itself
+    if remaining_seconds - backoff_seconds < 3:
+        return None
+    return backoff_seconds
+
+
+def build_continuation_messages(
+    messages: List[Dict[str, str]],
+    partial_content: str,
+) -> List[dict]:
+    """messages ends with the assistant's reply being streamed"""
+    return messages[:-1] + [
+        {"role": "assistant", "content": partial_content},
+        {"role": "user", "content": CONTINUATION_PROMPT},
+    ]
@@ -0,0 +1,111 @@
+import queue
+import threading
+import time
+from typing import Iterable, Iterator, Optional, TypeVar
+
+from app.env import OPENAI_FIRST_TOKEN_TIMEOUT_SECONDS, OPENAI_STREAM_STALL_TIMEOUT_SECONDS
+from app.metrics import increment_counter
+from app.model_routing import model_router
+
+# ----------------------------
+# OpenAI stream watchdog
+# ----------------------------
+#
+# Iterating an OpenAI stream blocks until the next chunk arrives, so a stream that stalls
+# (before the first chunk or in the middle of a response) can block a reply for a long time.
+# The chunks are read in a separate thread, and the consumer gives up on the stream when
+# the first chunk doesn't arrive within OPENAI_FIRST_TOKEN_TIMEOUT_SECONDS, or when no chunk arrives
+# for OPENAI_STREAM_STALL_TIMEOUT_SECONDS after that. The stream is then closed.
+# The time to the first chunk and the failures are reported to the model router's circuit breakers.
+
+T = TypeVar("T")
+
+_END = object()
+
+
+class OpenAIStreamTimeoutError(TimeoutError):
+    def __init__(self, kind: str):
+        super().__init__(f"The OpenAI stream timed out ({kind})")
+        # "first_token" or "stall"
+        self.kind = kind
+
+
+class _Failure:
+    def __init__(self, error: BaseException):
+        self.error = error
+
+
+def watch_stream(
+    stream: Iterable[T],
+    *,
+    model: str,
+    endpoint: str,
+    first_token_timeout_seconds: float = OPENAI_FIRST_TOKEN_TIMEOUT_SECONDS,
+    stall_timeout_seconds: float = OPENAI_STREAM_STALL_TIMEOUT_SECONDS,
+    deadline: Optional[float] = None,
+) -> Iterator[T]:
+    """Yields the chunks of the stream. Raises OpenAIStreamTimeoutError when the stream stalls,
+    and TimeoutError when the deadline (a time.time() value) passes while waiting for a chunk."""
+    chunks: "queue.Queue" = queue.Queue()
+
+    def read_chunks():
+        try:
+            for chunk in stream:
+                chunks.put(chunk)
+        except BaseException as e:
+            chunks.put(_Failure(e))
+        finally:
+            chunks.put(_END)
+
+    reader = threading.Thread(target=read_chunks, name="openai-stream-reader", daemon=True)
+    reader.start()
+    started_at = time.time()
+    # Each stream is reported to the model router once: as a failure when it stalls or breaks,
+    # otherwise as a success with the time to the first chunk when it ends
+    ttft_seconds: Optional[float] = None
+    reported = False
+    kind = "first_token"
+    try:
+        while True:
+            timeout_seconds = (
+                first_token_timeout_seconds if kind == "first_token" else stall_timeout_seconds
+            )
+            reached_deadline = deadline is not None and deadline - time.time() < timeout_seconds
+            if reached_deadline:
+                timeout_seconds = max(0.0, deadline - time.time())
+            try:
+                item = chunks.get(timeout=timeout_seconds)
+            except queue.Empty:
+                _close(stream)
+                if reached_deadline:
+                    # This request ran out of time; that doesn't tell anything about the model
+                    reported = True
+                    raise TimeoutError()
+                increment_counter(
+                    "openai_stream_timeouts", kind=kind, model=model, endpoint=endpoint
+                )
+                reported = True
+                model_router.record(endpoint, model, succeeded=False)
+                raise OpenAIStreamTimeoutError(kind)
+            if item is _END:
+                return
+            if isinstance(item, _Failure):
+                reported = True
+                model_router.record_error(endpoint, model, item.error)
+                raise item.error
+            if ttft_seconds is None:
+                ttft_seconds = time.time() - started_at
+            kind = "stall"
+            yield item
+    finally:
+        # Also when the consumer stops reading (e.g., at the finish_reason chunk)
+        if not reported and ttft_seconds is not None:
+            model_router.record(endpoint, model, succeeded=True, ttft_seconds=ttft_seconds)
+
+
+def _close(stream) -> None:
+    # The reader thread stops once the connection is closed
+    try:
+        stream.close()
+    except Exception:
+        pass
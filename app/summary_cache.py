@@ -0,0 +1,118 @@
+import hashlib
+import json
+import logging
+from typing import Optional
+
+from slack_bolt import BoltContext
+
+from app.cache_store import (
+    CacheStore,
+    InMemoryCacheStore,
+    PostgresCacheStore,
+    SQLiteCacheStore,
+    TieredCacheStore,
+)
+from app.env import (
+    THREAD_SUMMARY_CACHE_BACKEND,
+    THREAD_SUMMARY_CACHE_MAX_SIZE,
+    TRANSLATION_CACHE_SQLITE_PATH,
+)
+
+# ----------------------------
+# Thread summary cache
+# ----------------------------
+#
+# A thread summary is saved together with the ts of the last reply it covers.
+# When the same thread is summarized with the same prompt again,
+# only the replies posted after that are summarized together with the previous summary.
+
+# Increment this when the format of the summaries changes
+SUMMARY_CACHE_VERSION = "1"
+
+
+def build_summary_store(
+    backend: str = THREAD_SUMMARY_CACHE_BACKEND,
+    postgres_connection_params: Optional[dict] = None,
+) -> CacheStore:
+    memory = InMemoryCacheStore(
+        name="thread_summary_memory", max_size=THREAD_SUMMARY_CACHE_MAX_SIZE
+    )
+    if backend == "sqlite":
+        return TieredCacheStore(
+            memory=memory,
+            shared=SQLiteCacheStore(
+                name="thread_summary",
+                path=TRANSLATION_CACHE_SQLITE_PATH,
+                max_size=THREAD_SUMMARY_CACHE_MAX_SIZE * 10,
+            ),
+        )
+    if backend == "postgres":
+        if postgres_connection_params is not None:
+            return TieredCacheStore(
+                memory=memory,
+                shared=PostgresCacheStore(
+                    name="thread_summary",
+                    connection_params=postgres_connection_params,
+                    max_size=THREAD_SUMMARY_CACHE_MAX_SIZE * 10,
+                ),
+            )
+        logging.warning(
+            "No database connection information available for the thread summary cache. Using in-memory cache."
+        )
+    elif backend != "memory":
+        logging.warning(
+            f"Unknown thread summary cache backend: {backend}. Using in-memory cache."
+        )
+    return memory
+
+
+_summary_store: CacheStore = build_summary_store(
+    "sqlite" if THREAD_SUMMARY_CACHE_BACKEND == "sqlite" else "memory"
+)
+
+
+def set_summary_store(store: CacheStore) -> None:
+    global _summary_store
+    _summary_store = store
+
+
+def get_summary_store() -> CacheStore:
+    return _summary_store
+
+
+def _summary_cache_key(
+    context: BoltContext, channel: str, thread_ts: str, prompt: str
+) -> str:
+    prompt_hash = hashlib.sha256(prompt.encode("utf-8")).hexdigest()[:16]
+    team = context.team_id or context.enterprise_id
+    # The configured model, not the one route_openai_model() has switched to for this request
+    model = context.get("OPENAI_REQUESTED_MODEL") or context.get("OPENAI_MODEL")
+    return f"{team}:{channel}:{thread_ts}:{prompt_hash}:{model}:{SUMMARY_CACHE_VERSION}"
+
+
+def find_thread_summary(
+    *, context: BoltContext, channel: str, thread_ts: str, prompt: str
+) -> Optional[dict]:
+    """Returns {"summary": "...", "latest_ts": "..."} if the thread has been summarized with the prompt"""
+    value = _summary_store.get(_summary_cache_key(context, channel, thread_ts, prompt))
+    if value is None:
+        return None
+    try:
+        return json.loads(value)
+    except ValueError:
+        return None
+
+
+def save_thread_summary(
+    *,
+    context: BoltContext,
+    channel: str,
+    thread_ts: str,
+    prompt: str,
+    summary: str,
+    latest_ts: str,
+) -> None:
+    _summary_store.set(
+        _summary_cache_key(context, channel, thread_ts, prompt),
+        json.dumps({"summary": summary, "latest_ts": latest_ts}),
+    )
@@ -0,0 +1,56 @@
+# Compares format_assistant_reply with the previous implementation (one re.sub call per pattern)
+# for a 10k-character reply, both for a single call and for a whole streaming session
+# where the accumulated reply is formatted at every update.
+#
+# python -m benchmarks.format_assistant_reply_benchmark
+
+import time
+
+from app.openai_ops import format_assistant_reply
+from benchmarks.previous_implementations import format_assistant_reply_sequentially
+
+
+def build_reply(length: int) -> str:
+    paragraph = (
+        "Here is an example of how to read a file line by line and count the words in it.\n\n"
+        "```python\nwith open('example.txt') as f:\n    for line in f:\n        print(len(line.split()))\n```\n\n"
+        "You can do the same in a shell script:\n\n```bash\nwc -w example.txt\n```\n\n"
+    )
+    text = "\n\n<@U12345678>: "
+    while len(text) < length:
+        text += paragraph
+    return text[:length]
+
+
+def measure(fn, reply: str, iterations: int) -> float:
+    started = time.perf_counter()
+    for _ in range(iterations):
+        fn(reply)
+    return (time.perf_counter() - started) * 1000 / iterations
+
+
+def measure_stream(fn, reply: str, chunk_size: int) -> float:
+    started = time.perf_counter()
+    for end in range(chunk_size, len(reply) + chunk_size, chunk_size):
+        fn(reply[:end])
+    return (time.perf_counter() - started) * 1000
+
+
+def main():
+    reply = build_reply(10_000)
+    assert format_assistant_reply(reply, False) == format_assistant_reply_sequentially(reply)
+
+    def single_pass(content: str) -> str:
+        return format_assistant_reply(content, False)
+
+    print("10k-character reply, one call:")
+    print(f"  sequential re.sub calls: {measure(format_assistant_reply_sequentially, reply, 200):.3f} ms")
+    print(f"  single pass:             {measure(single_pass, reply, 200):.3f} ms")
+    # The streaming loop formats the accumulated reply every ~20 characters (one chunk) in the worst case
+    print("10k-character reply, formatted at every 20-character update of a stream:")
+    print(f"  sequential re.sub calls: {measure_stream(format_assistant_reply_sequentially, reply, 20):.1f} ms")
+    print(f"  single pass:             {measure_stream(single_pass, reply, 20):.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+# Compares the full markdown_to_slack conversion at every streaming update
+# with IncrementalMarkdownToSlackConverter, which converts only the text after the stable prefix.
+#
+# python -m benchmarks.incremental_markdown_benchmark
+
+import time
+
+from app.markdown_conversion import IncrementalMarkdownToSlackConverter, markdown_to_slack
+
+
+def build_reply(length: int) -> str:
+    paragraph = (
+        "Here is **an example** of how to read a file and count the *words* in it.\n\n"
+        "```python\nwith open('example.txt') as f:\n    for line in f:\n        print(len(line.split()))\n```\n\n"
+        "- Use __wc__ for ~~quick~~ checks\n- Use `str.split()` for ***anything else***\n\n"
+    )
+    text = ""
+    while len(text) < length:
+        text += paragraph
+    return text[:length]
+
+
+def main():
+    for length in [2_000, 10_000, 30_000]:
+        reply = build_reply(length)
+        # The streaming loop updates the message about every 20 chunks (~80 characters)
+        updates = [reply[:end] for end in range(80, len(reply) + 80, 80)]
+
+        started = time.perf_counter()
+        full_results = [markdown_to_slack(u) for u in updates]
+        full_ms = (time.perf_counter() - started) * 1000
+
+        converter = IncrementalMarkdownToSlackConverter()
+        started = time.perf_counter()
+        incremental_results = [converter.convert(u) for u in updates]
+        incremental_ms = (time.perf_counter() - started) * 1000
+
+        assert full_results == incremental_results
+        print(
+            f"{length:>6} characters, {len(updates)} updates: "
+            f"full conversion {full_ms:.1f} ms, incremental {incremental_ms:.1f} ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+# Shows how many OpenAI translation calls the local language detection avoids
+# for a sample corpus of Slack messages and how long the detection takes.
+#
+# python -m benchmarks.language_detection_benchmark
+
+import time
+from typing import List, Tuple
+
+from app.language_detection import detect_language, has_language_content, split_paragraphs
+
+# (message, the language of the user who translates it)
+SAMPLE_CORPUS: List[Tuple[str, str]] = [
+    ("明日のミーティングは10時からです。資料は事前に共有します。", "Japanese"),
+    ("<@U0123ABCD> ありがとうございます！確認しておきます :pray:", "Japanese"),
+    ("The deployment finished successfully. Please let me know if you see any errors.", "Japanese"),
+    ("The deployment finished successfully. Please let me know if you see any errors.", "English"),
+    ("Can someone take a look at the failing test on the main branch? It started after the last merge.", "English"),
+    ("デプロイが完了しました。\n\nThe release notes are available in the shared drive for everyone.", "Japanese"),
+    ("내일 회의는 10시에 시작합니다. 자료를 미리 확인해 주세요.", "Korean"),
+    ("明天的会议从十点开始，请提前阅读资料。", "Chinese"),
+    ("明天的会议从十点开始，请提前阅读资料。", "Japanese"),
+    ("Завтра встреча начнется в десять часов, пожалуйста, прочитайте документы.", "Russian"),
+    ("Kann mir jemand helfen herauszufinden, warum der Build auf dem Hauptzweig fehlschlägt?", "German"),
+    ("¿Alguien puede ayudarme a entender por qué falla la compilación en la rama principal?", "Spanish"),
+    ("Quelqu'un peut-il m'aider à comprendre pourquoi la compilation échoue sur la branche ?", "French"),
+    ("Amanhã não estarei no escritório, me ligue se surgir algo urgente, por favor.", "Portuguese"),
+    ("Domani non sarò in ufficio, chiamami se succede qualcosa di urgente, per favore.", "Italian"),
+    ("I'll be out of office tomorrow, ping me on my phone if anything urgent comes up.", "German"),
+    ("LGTM :+1:", "Japanese"),
+    ("```\nSELECT * FROM users WHERE id = 1;\n```", "Japanese"),
+    (
+        "Here is the summary of the incident.\n\n"
+        "```\nTraceback (most recent call last):\n  File \"main.py\", line 1\n```\n\n"
+        "原因はタイムアウトの設定でした。修正済みです。",
+        "Japanese",
+    ),
+    (
+        "新しい機能のリリースは来週です。\n\nテストは今週中に終わらせてください。\n\n"
+        "Please update the documentation before the release as well.",
+        "Japanese",
+    ),
+]
+
+
+def main():
+    num_calls_without_detection = len(SAMPLE_CORPUS)
+    num_skipped = 0
+    num_partial = 0
+    num_paragraphs = 0
+    num_translated_paragraphs = 0
+    for text, lang in SAMPLE_CORPUS:
+        # The same routing as app.i18n.translate()
+        paragraphs = [p for p in split_paragraphs(text) if has_language_content(p)]
+        languages = [detect_language(p) for p in paragraphs]
+        if all(detected == lang for detected in languages):
+            num_skipped += 1
+            continue
+        if len(paragraphs) > 1 and lang in languages:
+            num_partial += 1
+            num_paragraphs += len(paragraphs)
+            num_translated_paragraphs += len([lg for lg in languages if lg != lang])
+
+    iterations = 200
+    started = time.perf_counter()
+    for _ in range(iterations):
+        for text, _ in SAMPLE_CORPUS:
+            detect_language(text)
+    elapsed_ms = (time.perf_counter() - started) * 1000 / (iterations * len(SAMPLE_CORPUS))
+
+    print(f"Messages: {num_calls_without_detection}")
+    print(f"Translation calls avoided (already in the target language): {num_skipped}")
+    print(
+        f"Mixed-language messages translated partially: {num_partial} "
+        f"({num_translated_paragraphs} of {num_paragraphs} paragraphs sent to OpenAI)"
+    )
+    print(f"OpenAI calls: {num_calls_without_detection - num_skipped} (without detection: {num_calls_without_detection})")
+    print(f"Average detection time: {elapsed_ms:.3f} ms per message")
+
+
+if __name__ == "__main__":
+    main()
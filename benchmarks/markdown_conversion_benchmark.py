@@ -0,0 +1,50 @@
+# Compares the precompiled slack_to_markdown / markdown_to_slack with the previous implementations
+# (re.split + uncompiled re.sub per part + string concatenation) on a long, code-heavy thread.
+#
+# python -m benchmarks.markdown_conversion_benchmark
+
+import time
+
+from app.markdown_conversion import markdown_to_slack, slack_to_markdown
+from benchmarks.previous_implementations import previous_markdown_to_slack, previous_slack_to_markdown
+
+
+# Replies in a long thread where people share code, commands and error messages
+_REPLIES = [
+    "Can someone check why `make test` fails on CI? The error is in `tests/test_api.py`.",
+    "Here is the log:\n```\nE   AssertionError: assert 200 == 500\nE    +  where 500 = response.status_code\n```",
+    "I think it's the `DATABASE_URL` env var. Try this:\n```\nexport DATABASE_URL=postgres://localhost/test\nmake test\n```",
+    "*That worked*, thanks! _Also_ the `lint` step is ~flaky~ slow.",
+    "Sure, let's merge it after the review :+1:",
+    "The `config.py` has `TIMEOUT = 30`, `RETRIES = 3` and `POOL_SIZE = 10`.",
+]
+
+
+def measure(fn, replies, iterations: int) -> float:
+    started = time.perf_counter()
+    for _ in range(iterations):
+        for reply in replies:
+            fn(reply)
+    return (time.perf_counter() - started) * 1000
+
+
+def main():
+    replies = _REPLIES * 100  # a 600-reply thread
+    for reply in replies:
+        assert slack_to_markdown(reply) == previous_slack_to_markdown(reply)
+        assert markdown_to_slack(reply) == previous_markdown_to_slack(reply)
+
+    print(f"A thread with {len(replies)} code-heavy replies, converted 10 times:")
+    print(f"  slack_to_markdown: previous {measure(previous_slack_to_markdown, replies, 10):.1f} ms, "
+          f"precompiled {measure(slack_to_markdown, replies, 10):.1f} ms")
+    print(f"  markdown_to_slack: previous {measure(previous_markdown_to_slack, replies, 10):.1f} ms, "
+          f"precompiled {measure(markdown_to_slack, replies, 10):.1f} ms")
+
+    thread_text = "\n".join(replies)
+    print(f"The whole thread as a single text ({len(thread_text)} characters), converted 10 times:")
+    print(f"  markdown_to_slack: previous {measure(previous_markdown_to_slack, [thread_text], 10):.1f} ms, "
+          f"precompiled {measure(markdown_to_slack, [thread_text], 10):.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
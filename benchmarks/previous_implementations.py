@@ -0,0 +1,62 @@
+# The implementations replaced by the optimized ones, kept only to compare against in the benchmarks
+
+import re
+
+from app.openai_ops import _CODE_BLOCK_LANGUAGE_TAGS
+from app.sensitive_info_redaction import _REDACTION_RULES
+
+_CODE_PATTERN = r"(?s)(```.+?```|`[^`\n]+?`)"
+
+
+def _convert_outside_code(content: str, substitutions) -> str:
+    parts = re.split(_CODE_PATTERN, content)
+    result = ""
+    for part in parts:
+        if part.startswith("```") or part.startswith("`"):
+            result += part
+        else:
+            for o, n in substitutions:
+                part = re.sub(o, n, part)
+            result += part
+    return result
+
+
+def previous_slack_to_markdown(content: str) -> str:
+    return _convert_outside_code(
+        content,
+        [
+            (r"\*(?!\s)([^\*\n]+?)(?<!\s)\*", r"**\1**"),
+            (r"_(?!\s)([^_\n]+?)(?<!\s)_", r"*\1*"),
+            (r"~(?!\s)([^~\n]+?)(?<!\s)~", r"~~\1~~"),
+        ],
+    )
+
+
+def previous_markdown_to_slack(content: str) -> str:
+    return _convert_outside_code(
+        content,
+        [
+            (r"\*\*\*(?!\s)([^\*\n]+?)(?<!\s)\*\*\*", r"_*\1*_"),
+            (r"(?<![\*_])\*(?!\s)([^\*\n]+?)(?<!\s)\*(?![\*_])", r"_\1_"),
+            (r"\*\*(?!\s)([^\*\n]+?)(?<!\s)\*\*", r"*\1*"),
+            (r"__(?!\s)([^_\n]+?)(?<!\s)__", r"*\1*"),
+            (r"~~(?!\s)([^~\n]+?)(?<!\s)~~", r"~\1~"),
+        ],
+    )
+
+
+_SEQUENTIAL_PATTERNS = [("^\n+", ""), ("^<@U.*?>\\s?:\\s?", "")] + [
+    (f"```\\s*{tag}\n", "```\n") for tag in _CODE_BLOCK_LANGUAGE_TAGS
+]
+
+
+def format_assistant_reply_sequentially(content: str) -> str:
+    for o, n in _SEQUENTIAL_PATTERNS:
+        content = re.sub(o, n, content)
+    return content
+
+
+def redact_sequentially(text: str) -> str:
+    for _, pattern, replacement in _REDACTION_RULES:
+        text = re.sub(pattern, replacement, text)
+    return text
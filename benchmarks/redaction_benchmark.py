@@ -0,0 +1,50 @@
+# Compares redact_string's precompiled engine with the previous implementation
+# (five re.sub calls with pattern strings) on Slack-like thread replies.
+#
+# python -m benchmarks.redaction_benchmark
+
+import random
+import time
+
+from app.sensitive_info_redaction import RedactionEngine, _REDACTION_RULES
+from benchmarks.previous_implementations import redact_sequentially
+
+_REPLIES = [
+    "<@U0123ABCD> Can you take a look at the failing test on the main branch?",
+    "Sure, I'll check it after lunch :+1:",
+    "The deploy finished successfully. Let me know if you see any errors.",
+    "Could you send the invoice to billing@example.com by Friday?",
+    "My phone number is (555) 123-4567 if anything urgent comes up.",
+    "Here is the error message:\n```\nTraceback (most recent call last):\n  File \"main.py\", line 42\n```",
+    "We need to update the docs before the release.",
+    "Thanks! :pray:",
+    "The meeting starts at 10am tomorrow in room B.",
+    "I think we should review the proposal with the team first.",
+]
+
+
+def main():
+    rand = random.Random(0)
+    transcripts = [[rand.choice(_REPLIES) for _ in range(50)] for _ in range(200)]
+    engine = RedactionEngine(_REDACTION_RULES)
+
+    started = time.perf_counter()
+    for replies in transcripts:
+        for reply in replies:
+            redact_sequentially(reply)
+    sequential_ms = (time.perf_counter() - started) * 1000
+
+    started = time.perf_counter()
+    for replies in transcripts:
+        for reply in replies:
+            engine.redact(reply)
+    engine_ms = (time.perf_counter() - started) * 1000
+
+    num_replies = sum(len(r) for r in transcripts)
+    print(f"{len(transcripts)} threads, {num_replies} replies:")
+    print(f"  five re.sub calls per reply: {sequential_ms:.1f} ms")
+    print(f"  precompiled engine:          {engine_ms:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -7,6 +7,7 @@ from slack_sdk.web import WebClient
 from slack_sdk.http_retry.builtin_handlers import RateLimitErrorRetryHandler
 
 from app.bolt_listeners import before_authorize, register_listeners
+from app.http_transport import PooledWebClient
 from app.env import (
     USE_SLACK_LANGUAGE,
     SLACK_APP_LOG_LEVEL,
@@ -20,6 +21,8 @@ from app.env import (
     OPENAI_ORG_ID,
     OPENAI_IMAGE_GENERATION_MODEL,
 )
+from app.i18n_catalog import prepare_translations_at_startup
+from app.slack_ops import fetch_user_locale
 from app.slack_ui import build_home_tab
 
 load_dotenv()
@@ -30,7 +33,7 @@ if __name__ == "__main__":
     logging.basicConfig(level=SLACK_APP_LOG_LEVEL)
 
     app = App(
-        token=os.environ["SLACK_BOT_TOKEN"],
+        client=PooledWebClient(token=os.environ["SLACK_BOT_TOKEN"]),
         before_authorize=before_authorize,
         process_before_response=True,
     )
@@ -38,6 +41,9 @@ if __name__ == "__main__":
 
     register_listeners(app)
 
+    if USE_SLACK_LANGUAGE is True:
+        prepare_translations_at_startup(openai_api_key=os.environ["OPENAI_API_KEY"])
+
     @app.event("app_home_opened")
     def render_home_tab(client: WebClient, context: BoltContext):
         already_set_api_key = os.environ["OPENAI_API_KEY"]
@@ -58,9 +64,7 @@ if __name__ == "__main__":
             client: WebClient,
             next_,
         ):
-            user_id = context.actor_user_id or context.user_id
-            user_info = client.users_info(user=user_id, include_locale=True)
-            context["locale"] = user_info.get("user", {}).get("locale")
+            context["locale"] = fetch_user_locale(client, context)
             next_()
 
     @app.middleware
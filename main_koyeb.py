@@ -16,6 +16,8 @@ from slack_sdk.http_retry.builtin_handlers import RateLimitErrorRetryHandler
 from slack_bolt.adapter.socket_mode import SocketModeHandler
 
 from app.bolt_listeners import register_listeners, before_authorize
+from app.http_transport import PooledWebClient
+from app.slack_ops import fetch_user_locale
 from app.env import (
     USE_SLACK_LANGUAGE,
     SLACK_APP_LOG_LEVEL,
@@ -28,13 +30,22 @@ from app.env import (
     OPENAI_FUNCTION_CALL_MODULE_NAME,
     OPENAI_ORG_ID,
     OPENAI_IMAGE_GENERATION_MODEL,
+    TRANSLATION_CACHE_BACKEND,
+    THREAD_SUMMARY_CACHE_BACKEND,
 )
+from app.metrics import render_metrics_text
+from app.singleflight import SingleFlight
 from app.slack_ui import (
     build_home_tab,
     DEFAULT_HOME_TAB_MESSAGE,
+    READY_HOME_TAB_MESSAGE,
+    CONFIGURE_MODEL_NOT_AVAILABLE_ERROR,
+    CONFIGURE_INVALID_API_KEY_ERROR,
     build_configure_modal,
 )
-from app.i18n import translate
+from app.i18n import translate, build_translation_store, set_translation_store
+from app.summary_cache import build_summary_store, set_summary_store
+from app.i18n_catalog import prepare_translations_at_startup
 from openai import OpenAI
 
 # データベース接続
@@ -116,6 +127,38 @@ def setup_database():
         logging.warning("Using in-memory storage as fallback")
         in_memory_storage = {}
 
+
+# データベースの接続パラメータを取得（利用できない場合はNone）
+def build_database_connection_params():
+    if not DATABASE_URL and DATABASE_HOST and DATABASE_USER and DATABASE_PASSWORD and DATABASE_NAME:
+        return {
+            "host": DATABASE_HOST,
+            "user": DATABASE_USER,
+            "password": DATABASE_PASSWORD,
+            "dbname": DATABASE_NAME,
+            "port": DATABASE_PORT
+        }
+    elif DATABASE_URL:
+        try:
+            return {
+                "dbname": DATABASE_URL.split("/")[-1],
+                "user": DATABASE_URL.split("://")[1].split(":")[0],
+                "password": DATABASE_URL.split(":")[2].split("@")[0],
+                "host": DATABASE_URL.split("@")[1].split("/")[0],
+                "port": "5432"
+            }
+        except Exception as e:
+            logging.warning(f"Failed to parse DATABASE_URL: {e}")
+            if DATABASE_HOST and DATABASE_USER and DATABASE_PASSWORD and DATABASE_NAME:
+                return {
+                    "host": DATABASE_HOST,
+                    "user": DATABASE_USER,
+                    "password": DATABASE_PASSWORD,
+                    "dbname": DATABASE_NAME,
+                    "port": DATABASE_PORT
+                }
+    return None
+
 # チームのOpenAI設定を保存
 def save_openai_config(team_id, config):
     global in_memory_storage
@@ -183,8 +226,16 @@ def save_openai_config(team_id, config):
         in_memory_storage[team_id] = config
         return True
 
-# チームのOpenAI設定を取得
+
+# チームのOpenAI設定を取得 (同じチームの同時リクエストは1回のDB問い合わせを共有する)
+openai_config_flight = SingleFlight("openai_config")
+
+
 def get_openai_config(team_id):
+    return openai_config_flight.do(team_id, lambda: load_openai_config(team_id))
+
+
+def load_openai_config(team_id):
     global in_memory_storage
     try:
         # 個別の環境変数から接続パラメータを構築
@@ -370,7 +421,10 @@ def run_health_check_server():
             self.send_response(200)
             self.send_header('Content-Type', 'text/plain')
             self.end_headers()
-            self.wfile.write(b'OK')
+            if self.path == "/metrics":
+                self.wfile.write(render_metrics_text().encode("utf-8"))
+            else:
+                self.wfile.write(b'OK')
             
         def log_message(self, format, *args):
             # アクセスログを抑制
@@ -426,6 +480,26 @@ def main():
     
     # データベースのセットアップ
     setup_database()
+
+    # 翻訳キャッシュのセットアップ（postgresの場合はopenai_configsと同じデータベースを使用）
+    if TRANSLATION_CACHE_BACKEND == "postgres":
+        set_translation_store(
+            build_translation_store(
+                "postgres",
+                postgres_connection_params=build_database_connection_params(),
+            )
+        )
+    # スレッド要約キャッシュのセットアップ（同上）
+    if THREAD_SUMMARY_CACHE_BACKEND == "postgres":
+        set_summary_store(
+            build_summary_store(
+                "postgres",
+                postgres_connection_params=build_database_connection_params(),
+            )
+        )
+    if USE_SLACK_LANGUAGE is True:
+        # 単一ワークスペース用のAPIキーがある場合はUI文言の翻訳をバックグラウンドで事前生成
+        prepare_translations_at_startup(openai_api_key=os.environ.get("OPENAI_API_KEY"))
     
     # アプリの初期化
     try:
@@ -440,7 +514,7 @@ def main():
                 logging.info("Using SLACK_BOT_TOKEN_FALLBACK as SLACK_BOT_TOKEN")
         
         app = App(
-            token=os.environ["SLACK_BOT_TOKEN"],
+            client=PooledWebClient(token=os.environ["SLACK_BOT_TOKEN"]),
             before_authorize=before_authorize,
             process_before_response=True,
         )
@@ -535,7 +609,7 @@ def main():
         try:
             config = get_openai_config(context.team_id)
             if config:
-                message = "This app is ready to use in this workspace :raised_hands:"
+                message = READY_HOME_TAB_MESSAGE
         except Exception:
             pass
             
@@ -575,7 +649,7 @@ def main():
                 # 指定されたモデルがAPIキーで使用可能か確認
                 client.models.retrieve(model=model)
             except Exception:
-                text = "This model is not yet available for this API key"
+                text = CONFIGURE_MODEL_NOT_AVAILABLE_ERROR
                 if already_set_api_key is not None:
                     text = translate(
                         openai_api_key=already_set_api_key, context=context, text=text
@@ -587,7 +661,7 @@ def main():
                 return
             ack()
         except Exception:
-            text = "This API key seems to be invalid"
+            text = CONFIGURE_INVALID_API_KEY_ERROR
             if already_set_api_key is not None:
                 text = translate(
                     openai_api_key=already_set_api_key, context=context, text=text
@@ -631,10 +705,8 @@ def main():
         ):
             bot_scopes = context.authorize_result.bot_scopes
             if bot_scopes is not None and "users:read" in bot_scopes:
-                user_id = context.actor_user_id or context.user_id
                 try:
-                    user_info = client.users_info(user=user_id, include_locale=True)
-                    context["locale"] = user_info.get("user", {}).get("locale")
+                    context["locale"] = fetch_user_locale(client, context)
                 except SlackApiError as e:
                     logger.debug(f"Failed to fetch user info due to {e}")
                     pass
@@ -19,6 +19,8 @@ from slack_sdk.http_retry.builtin_handlers import RateLimitErrorRetryHandler
 from slack_bolt import App, Ack, BoltContext
 
 from app.bolt_listeners import register_listeners, before_authorize
+from app.http_transport import PooledWebClient
+from app.slack_ops import fetch_user_locale
 from app.env import (
     USE_SLACK_LANGUAGE,
     SLACK_APP_LOG_LEVEL,
@@ -31,13 +33,19 @@ from app.env import (
     OPENAI_FUNCTION_CALL_MODULE_NAME,
     OPENAI_ORG_ID,
     OPENAI_IMAGE_GENERATION_MODEL,
+    TRANSLATION_CATALOG_PATH,
 )
 from app.slack_ui import (
     build_home_tab,
     DEFAULT_HOME_TAB_MESSAGE,
+    READY_HOME_TAB_MESSAGE,
+    CONFIGURE_MODEL_NOT_AVAILABLE_ERROR,
+    CONFIGURE_INVALID_API_KEY_ERROR,
     build_configure_modal,
 )
 from app.i18n import translate
+from app.i18n_catalog import load_translation_catalog
+from app.singleflight import SingleFlight
 
 #
 # Product deployment (AWS Lambda)
@@ -64,7 +72,23 @@ logging.basicConfig(format="%(asctime)s %(message)s", level=SLACK_APP_LOG_LEVEL)
 s3_client = boto3.client("s3")
 openai_bucket_name = os.environ["OPENAI_S3_BUCKET_NAME"]
 
-client_template = WebClient()
+# Load the translations generated at build time (python -m app.i18n_catalog translation_catalog.json)
+if USE_SLACK_LANGUAGE is True and TRANSLATION_CATALOG_PATH is not None:
+    load_translation_catalog(TRANSLATION_CATALOG_PATH)
+
+# Concurrent requests from the same workspace share one S3 read
+openai_config_flight = SingleFlight("openai_config")
+
+
+def fetch_openai_config_str(team_id: str) -> str:
+    def _fetch() -> str:
+        s3_response = s3_client.get_object(Bucket=openai_bucket_name, Key=team_id)
+        return s3_response["Body"].read().decode("utf-8")
+
+    return openai_config_flight.do(team_id, _fetch)
+
+
+client_template = PooledWebClient()
 client_template.retry_handlers.append(RateLimitErrorRetryHandler(max_retry_count=2))
 
 
@@ -136,10 +160,8 @@ def handler(event, context_):
         ):
             bot_scopes = context.authorize_result.bot_scopes
             if bot_scopes is not None and "users:read" in bot_scopes:
-                user_id = context.actor_user_id or context.user_id
                 try:
-                    user_info = client.users_info(user=user_id, include_locale=True)
-                    context["locale"] = user_info.get("user", {}).get("locale")
+                    context["locale"] = fetch_user_locale(client, context)
                 except SlackApiError as e:
                     logger.debug(f"Failed to fetch user info due to {e}")
                     pass
@@ -148,10 +170,7 @@ def handler(event, context_):
     @app.middleware
     def set_s3_openai_api_key(context: BoltContext, next_):
         try:
-            s3_response = s3_client.get_object(
-                Bucket=openai_bucket_name, Key=context.team_id
-            )
-            config_str: str = s3_response["Body"].read().decode("utf-8")
+            config_str: str = fetch_openai_config_str(context.team_id)
             if config_str.startswith("{"):
                 config = json.loads(config_str)
                 context["OPENAI_API_KEY"] = config.get("api_key")
@@ -190,8 +209,8 @@ def handler(event, context_):
     def render_home_tab(client: WebClient, context: BoltContext):
         message = DEFAULT_HOME_TAB_MESSAGE
         try:
-            s3_client.get_object(Bucket=openai_bucket_name, Key=context.team_id)
-            message = "This app is ready to use in this workspace :raised_hands:"
+            fetch_openai_config_str(context.team_id)
+            message = READY_HOME_TAB_MESSAGE
         except:  # noqa: E722
             pass
         openai_api_key = context.get("OPENAI_API_KEY")
@@ -232,7 +251,7 @@ def handler(event, context_):
                 # Verify if the given model works with the API key
                 client.models.retrieve(model=model)
             except Exception:
-                text = "This model is not yet available for this API key"
+                text = CONFIGURE_MODEL_NOT_AVAILABLE_ERROR
                 if already_set_api_key is not None:
                     text = translate(
                         openai_api_key=already_set_api_key, context=context, text=text
@@ -244,7 +263,7 @@ def handler(event, context_):
                 return
             ack()
         except Exception:
-            text = "This API key seems to be invalid"
+            text = CONFIGURE_INVALID_API_KEY_ERROR
             if already_set_api_key is not None:
                 text = translate(
                     openai_api_key=already_set_api_key, context=context, text=text
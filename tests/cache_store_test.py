@@ -0,0 +1,103 @@
+import psycopg2.pool
+
+from app.cache_store import (
+    InMemoryCacheStore,
+    PostgresCacheStore,
+    SQLiteCacheStore,
+    TieredCacheStore,
+)
+from app.metrics import get_counter
+
+
+def test_in_memory_cache_store_evicts_least_recently_used():
+    store = InMemoryCacheStore(name="test_lru", max_size=2)
+    store.set("a", "1")
+    store.set("b", "2")
+    assert store.get("a") == "1"  # "b" is now the least recently used
+    store.set("c", "3")
+    assert store.get("b") is None
+    assert store.get("a") == "1"
+    assert store.get("c") == "3"
+    assert len(store) == 2
+    assert get_counter("cache_evictions", cache="test_lru") == 1
+    assert get_counter("cache_misses", cache="test_lru") == 1
+
+
+def test_sqlite_cache_store(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    store = SQLiteCacheStore(name="test_sqlite", path=path)
+    assert store.get("key") is None
+    store.set("key", "value")
+    # Another process / instance sharing the same file can read the value
+    assert SQLiteCacheStore(name="test_sqlite", path=path).get("key") == "value"
+
+
+def test_tiered_cache_store(tmp_path):
+    shared = SQLiteCacheStore(name="test_tiered", path=str(tmp_path / "c.sqlite3"))
+    shared.set("key", "value")
+    memory = InMemoryCacheStore(name="test_tiered_memory")
+    store = TieredCacheStore(memory=memory, shared=shared)
+    assert store.get("key") == "value"
+    assert memory.get("key") == "value"
+
+
+class _FakeCursor:
+    def __init__(self, rows: dict):
+        self.rows = rows
+        self.result = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+    def execute(self, sql: str, params=None):
+        if sql.startswith("UPDATE"):
+            value = self.rows.get(params[0])
+            self.result = (value,) if value is not None else None
+        elif "INSERT" in sql:
+            self.rows[params[0]] = params[1]
+
+    def fetchone(self):
+        return self.result
+
+
+class _FakeConnection:
+    def __init__(self, rows: dict):
+        self.rows = rows
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+    def cursor(self):
+        return _FakeCursor(self.rows)
+
+
+def test_postgres_cache_store_reuses_connections(monkeypatch):
+    rows = {}
+    pools = []
+
+    class _FakePool:
+        def __init__(self, minconn, maxconn, **params):
+            self.connection = _FakeConnection(rows)
+            self.num_checkouts = 0
+            pools.append(self)
+
+        def getconn(self):
+            self.num_checkouts += 1
+            return self.connection
+
+        def putconn(self, conn, close=False):
+            assert close is False
+
+    monkeypatch.setattr(psycopg2.pool, "ThreadedConnectionPool", _FakePool)
+    store = PostgresCacheStore(name="test_postgres", connection_params={"dbname": "test"})
+    assert store.get("key") is None
+    store.set("key", "value")
+    assert store.get("key") == "value"
+    assert len(pools) == 1
+    assert pools[0].num_checkouts == 4
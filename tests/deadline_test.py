@@ -0,0 +1,62 @@
+import time
+
+import pytest
+from slack_bolt import BoltContext
+
+from app import i18n
+from app.deadline import Deadline, get_request_deadline
+from app.env import REPLY_TIME_RESERVE_SECONDS
+from app.i18n import save_translation, translate, translate_many
+from app.metrics import get_counter
+
+
+def test_deadline():
+    deadline = Deadline(30, started_at=time.time() - 10)
+    assert 19 < deadline.remaining() <= 20
+    assert deadline.timeout(5) == 5
+    assert 19 < deadline.timeout() <= 20
+    assert deadline.expired() is False
+
+    deadline = Deadline(30, started_at=time.time() - 31)
+    assert deadline.remaining() == 0
+    assert deadline.expired() is True
+    with pytest.raises(TimeoutError):
+        deadline.timeout()
+
+
+def test_optional_stages_are_skipped_near_the_deadline():
+    deadline = Deadline(REPLY_TIME_RESERVE_SECONDS + 5)
+    assert 4 < deadline.optional_stage_timeout("image_download") <= 5
+
+    skipped = get_counter("deadline_stages_skipped", stage="image_download")
+    deadline = Deadline(REPLY_TIME_RESERVE_SECONDS - 1)
+    assert deadline.optional_stage_timeout("image_download") is None
+    assert get_counter("deadline_stages_skipped", stage="image_download") == skipped + 1
+    # The required stages can still use the remaining time
+    assert deadline.timeout() > 0
+
+
+def test_request_deadline_in_context():
+    context = BoltContext()
+    deadline = get_request_deadline(context)
+    assert context["deadline"] is deadline
+    assert get_request_deadline(context) is deadline
+
+
+def test_translations_are_skipped_near_the_deadline(monkeypatch):
+    def _no_api_calls(**kwargs):
+        raise AssertionError("No time for translations")
+
+    monkeypatch.setattr(i18n, "_request_translation", _no_api_calls)
+    monkeypatch.setattr(i18n, "_translate_in_single_request", _no_api_calls)
+    save_translation(lang="German", text="Close", translated_text="Schließen")
+    context = BoltContext(
+        {"locale": "de-DE", "deadline": Deadline(REPLY_TIME_RESERVE_SECONDS - 1)}
+    )
+    assert translate(openai_api_key="sk-xxx", context=context, text="Wait a second, please") == (
+        "Wait a second, please"
+    )
+    # Cached translations are still used
+    assert translate_many(
+        openai_api_key="sk-xxx", context=context, texts=["Close", "Submit", "Cancel"]
+    ) == ["Schließen", "Submit", "Cancel"]
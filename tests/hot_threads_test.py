@@ -0,0 +1,71 @@
+from slack_bolt import BoltContext
+
+from app.hot_threads import HotThreadScheduler
+
+
+def _reply(thread_ts: str, ts: float, **extra) -> dict:
+    return {"channel": "C111", "thread_ts": thread_ts, "ts": f"{ts:.6f}", **extra}
+
+
+def _build_scheduler(summarized: list, idle: list, **kwargs) -> HotThreadScheduler:
+    return HotThreadScheduler(
+        lambda context, channel, thread_ts: summarized.append((channel, thread_ts)),
+        min_replies=5,
+        velocity_replies=3,
+        velocity_window_seconds=60,
+        refresh_interval_seconds=300,
+        is_idle=lambda: idle[0],
+        run_in_background=False,
+        **kwargs,
+    )
+
+
+def test_hot_threads_are_summarized_when_idle():
+    context = BoltContext({"team_id": "T111", "bot_id": "B111", "OPENAI_API_KEY": "sk-"})
+    summarized, idle = [], [False]
+    scheduler = _build_scheduler(summarized, idle, summaries_per_team_per_hour=10)
+
+    # Slow thread: two replies a few minutes apart
+    scheduler.record_reply(context=context, payload=_reply("100.0", 1000), now=1000)
+    scheduler.record_reply(context=context, payload=_reply("100.0", 1200), now=1200)
+    # Fast thread: three replies within a minute
+    for now in [1210, 1220, 1230]:
+        scheduler.record_reply(context=context, payload=_reply("200.0", now), now=now)
+    # The replies by this app and the parent messages are not counted
+    scheduler.record_reply(context=context, payload=_reply("100.0", 1231, bot_id="B111"), now=1231)
+    scheduler.record_reply(context=context, payload={"channel": "C111", "thread_ts": "300.0", "ts": "300.0"}, now=1232)
+    assert scheduler.tracked_threads() == 2
+
+    # Interactive requests are being processed
+    assert scheduler.run_once(now=1240) is False
+    idle[0] = True
+    assert scheduler.run_once(now=1240) is True
+    assert summarized == [("C111", "200.0")]
+    # Nothing else is hot
+    assert scheduler.run_once(now=1240) is False
+
+    # A new reply doesn't trigger another summary until the refresh interval passes
+    scheduler.record_reply(context=context, payload=_reply("200.0", 1250), now=1250)
+    for now in [1300, 1310, 1320]:
+        scheduler.record_reply(context=context, payload=_reply("100.0", now), now=now)
+    assert scheduler.run_once(now=1330) is True
+    assert scheduler.run_once(now=1330) is False
+    assert scheduler.run_once(now=1600) is True
+    assert summarized == [("C111", "200.0"), ("C111", "100.0"), ("C111", "200.0")]
+
+
+def test_team_budget():
+    context = BoltContext({"team_id": "T111", "OPENAI_API_KEY": "sk-"})
+    summarized, idle = [], [True]
+    scheduler = _build_scheduler(summarized, idle, summaries_per_team_per_hour=2)
+    for thread_ts in ["100.0", "200.0", "300.0"]:
+        for now in [1000, 1001, 1002]:
+            scheduler.record_reply(context=context, payload=_reply(thread_ts, now), now=now)
+
+    assert scheduler.run_once(now=1010) is True
+    assert scheduler.run_once(now=1010) is True
+    assert scheduler.run_once(now=1010) is False
+    assert len(summarized) == 2
+    # The budget is available again an hour later
+    assert scheduler.run_once(now=4700) is True
+    assert len(summarized) == 3
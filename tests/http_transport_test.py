@@ -0,0 +1,65 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from slack_sdk.errors import SlackApiError
+
+from app.http_transport import PooledWebClient, connection_reuse_rate, http_session
+from app.metrics import reset_metrics
+
+
+class _MockSlackApiHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if self.path == "/api/chat.update":
+            self._respond(429, {"ok": False, "error": "ratelimited"}, {"Retry-After": "1"})
+        else:
+            self._respond(200, {"ok": True, "path": self.path})
+
+    def _respond(self, status: int, body: dict, headers: dict = {}):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        for k, v in headers.items():
+            self.send_header(k, v)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _MockSlackApiHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    reset_metrics()
+    yield server
+    server.shutdown()
+    http_session().close()
+
+
+def test_connections_are_reused(server):
+    client = PooledWebClient(
+        token="xoxb-test", base_url=f"http://127.0.0.1:{server.server_port}/api/"
+    )
+    for _ in range(5):
+        assert client.auth_test()["path"] == "/api/auth.test"
+    assert connection_reuse_rate("127.0.0.1") == 0.8
+
+
+def test_error_responses_are_handled_as_usual(server):
+    client = PooledWebClient(
+        token="xoxb-test",
+        base_url=f"http://127.0.0.1:{server.server_port}/api/",
+        retry_handlers=[],
+    )
+    with pytest.raises(SlackApiError) as e:
+        client.chat_update(channel="C111", ts="111.222", text="Hi")
+    assert e.value.response.status_code == 429
+    assert e.value.response.headers["Retry-After"] == "1"
@@ -0,0 +1,63 @@
+from types import SimpleNamespace
+
+from slack_bolt import BoltContext
+
+from app import slack_ui
+from app.i18n import translate
+from app.i18n_catalog import (
+    build_translatable_ui_strings,
+    load_translation_catalog,
+    write_translation_catalog,
+)
+from app.slack_constants import DEFAULT_LOADING_TEXT
+from app.slack_ui import DEFAULT_HOME_TAB_MESSAGE, READY_HOME_TAB_MESSAGE
+
+
+def test_build_translatable_ui_strings():
+    texts = build_translatable_ui_strings()
+    assert DEFAULT_LOADING_TEXT in texts
+    assert len(texts) == len(set(texts))
+
+
+def test_catalog_covers_all_ui_builder_strings(monkeypatch):
+    translated = []
+
+    def _translate(*, openai_api_key, context, text):
+        translated.append(text)
+        return text
+
+    def _translate_many(*, openai_api_key, context, texts):
+        translated.extend(texts)
+        return list(texts)
+
+    monkeypatch.setattr(slack_ui, "translate", _translate)
+    monkeypatch.setattr(slack_ui, "translate_many", _translate_many)
+
+    client = SimpleNamespace(conversations_replies=lambda **kwargs: {"ok": True})
+    context = BoltContext(
+        {"OPENAI_API_KEY": "sk-xxx", "locale": "ja-JP", "channel_id": "C111", "client": client}
+    )
+    slack_ui.build_summarize_option_modal(context=context, body={"message": {"ts": "123.456"}})
+    for message in [DEFAULT_HOME_TAB_MESSAGE, READY_HOME_TAB_MESSAGE]:
+        slack_ui.build_home_tab(openai_api_key="sk-xxx", context=context, message=message)
+    slack_ui.build_configure_modal(context)
+
+    assert len(translated) > 0
+    catalog = build_translatable_ui_strings()
+    assert [text for text in translated if text not in catalog] == []
+
+
+def test_load_translation_catalog(tmp_path):
+    path = str(tmp_path / "catalog.json")
+    translated = ":hourglass_flowing_sand: 少々お待ちください ..."
+    write_translation_catalog(path, {"Japanese": {DEFAULT_LOADING_TEXT: translated}})
+    assert load_translation_catalog(path) == 1
+
+    # The cached result is returned without calling OpenAI
+    context = BoltContext({"locale": "ja-JP"})
+    result = translate(openai_api_key="sk-xxx", context=context, text=DEFAULT_LOADING_TEXT)
+    assert result == translated
+
+
+def test_load_translation_catalog_missing_file(tmp_path):
+    assert load_translation_catalog(str(tmp_path / "not-found.json")) == 0
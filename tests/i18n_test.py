@@ -0,0 +1,139 @@
+from types import SimpleNamespace
+
+from openai import BadRequestError
+from slack_bolt import BoltContext
+
+from app import i18n
+from app.i18n import save_translation, split_into_chunks, translate, translate_many
+
+
+def test_translate_many_without_translation():
+    texts = ["Submit", "Cancel"]
+    assert translate_many(openai_api_key=None, context=BoltContext(), texts=texts) == texts
+    context = BoltContext({"locale": "en-US"})
+    assert translate_many(openai_api_key="sk-xxx", context=context, texts=texts) == texts
+
+
+def test_translate_many_falls_back_to_single_translations(monkeypatch):
+    def _broken_response(**kwargs):
+        raise ValueError("The translation for ID 1 is missing")
+
+    monkeypatch.setattr(i18n, "_translate_in_single_request", _broken_response)
+    monkeypatch.setattr(i18n, "translate", lambda **kwargs: f"[fr] {kwargs['text']}")
+    save_translation(lang="French", text="Start", translated_text="Commencer")
+
+    context = BoltContext({"locale": "fr-FR"})
+    result = translate_many(
+        openai_api_key="sk-xxx", context=context, texts=["Start", "Submit", "Cancel", "Start"]
+    )
+    assert result == ["Commencer", "[fr] Submit", "[fr] Cancel", "Commencer"]
+
+
+def test_translate_many_falls_back_when_json_mode_is_not_supported(monkeypatch):
+    requests = []
+
+    def create(**kwargs):
+        requests.append(kwargs)
+        assert kwargs["response_format"] == {"type": "json_object"}
+        raise BadRequestError(
+            "'response_format' of type 'json_object' is not supported with this model.",
+            response=SimpleNamespace(request=None, status_code=400, headers={}),
+            body=None,
+        )
+
+    client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+    monkeypatch.setattr(i18n, "_create_translation_client", lambda *args: client)
+    monkeypatch.setattr(i18n, "translate", lambda **kwargs: f"[de] {kwargs['text']}")
+
+    context = BoltContext({"locale": "de-DE"})
+    result = translate_many(openai_api_key="sk-xxx", context=context, texts=["Proceed", "Go back"])
+    assert result == ["[de] Proceed", "[de] Go back"]
+    assert len(requests) == 1
+
+
+def test_translate_skips_text_already_in_target_language():
+    context = BoltContext({"locale": "ja-JP"})
+    text = "明日のミーティングは10時からです。"
+    assert translate(openai_api_key="sk-xxx", context=context, text=text) == text
+
+
+def test_translate_only_other_language_paragraphs(monkeypatch):
+    def _translate_in_single_request(*, openai_api_key, context, lang, texts):
+        return {text: f"[{lang}] {text}" for text in texts}
+
+    monkeypatch.setattr(i18n, "_translate_in_single_request", _translate_in_single_request)
+    context = BoltContext({"locale": "ja-JP"})
+    text = (
+        "明日のミーティングは10時からです。\n\n"
+        "Please review the proposal before the meeting on Monday.\n\n"
+        "Could you let me know when you have time to talk about the release?"
+    )
+    assert translate(openai_api_key="sk-xxx", context=context, text=text) == (
+        "明日のミーティングは10時からです。\n\n"
+        "[Japanese] Please review the proposal before the meeting on Monday.\n\n"
+        "[Japanese] Could you let me know when you have time to talk about the release?"
+    )
+
+
+def test_split_into_chunks():
+    paragraphs = ["a" * 40, "b" * 40, "```\n" + "c" * 100 + "\n```", "d" * 10]
+    text = "\n\n".join(paragraphs)
+    chunks = split_into_chunks(text, chunk_size=100)
+    assert "".join(chunks) == text
+    assert chunks[0] == "a" * 40 + "\n\n" + "b" * 40 + "\n\n"
+    assert chunks[1].strip() == "```\n" + "c" * 100 + "\n```"
+
+
+def test_translate_long_text_in_chunks(monkeypatch):
+    def _translate(*, openai_api_key, context, text):
+        return text.upper()
+
+    monkeypatch.setattr(i18n, "translate", _translate)
+    context = BoltContext({"locale": "fr-FR"})
+    text = (
+        "hello <@U12345>, please check :eyes: the `config.py` file.\n\n"
+        "```\nprint('keep this code')\n```\n\n"
+        "thank you so much for your help with this release!"
+    )
+    progress = []
+    result = i18n.translate_long_text(
+        openai_api_key="sk-xxx",
+        context=context,
+        text=text,
+        on_progress=progress.append,
+        chunk_size=60,
+        max_workers=2,
+    )
+    assert result == (
+        "HELLO <@U12345>, PLEASE CHECK :eyes: THE `config.py` FILE.\n\n"
+        "```\nprint('keep this code')\n```\n\n"
+        "THANK YOU SO MUCH FOR YOUR HELP WITH THIS RELEASE!"
+    )
+    assert progress[0] == "HELLO <@U12345>, PLEASE CHECK :eyes: THE `config.py` FILE.\n\n"
+
+
+def test_translate_without_content_in_the_response(monkeypatch):
+    def create(**kwargs):
+        return SimpleNamespace(model_dump=lambda: {"choices": [{"message": {"content": None}}]})
+
+    client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+    monkeypatch.setattr(i18n, "_create_translation_client", lambda *args: client)
+    context = BoltContext({"locale": "it-IT"})
+    text = "Could you review the deployment checklist before Friday?"
+    assert translate(openai_api_key="sk-xxx", context=context, text=text) == text
+
+    long_text = text + "\n\n" + "Please let me know if anything in the release notes is unclear."
+    result = i18n.translate_long_text(
+        openai_api_key="sk-xxx", context=context, text=long_text, chunk_size=60, max_workers=2
+    )
+    assert result == long_text
+
+
+def test_translation_flights_are_per_credentials():
+    context = BoltContext({"OPENAI_API_BASE": None})
+    key_a = i18n._translation_flight_key("sk-a", context, "French:abc:1")
+    key_b = i18n._translation_flight_key("sk-b", context, "French:abc:1")
+    assert key_a != key_b
+    assert key_a == i18n._translation_flight_key("sk-a", context, "French:abc:1")
+    other_base = BoltContext({"OPENAI_API_BASE": "https://llm.example.com/v1"})
+    assert key_a != i18n._translation_flight_key("sk-a", other_base, "French:abc:1")
@@ -0,0 +1,38 @@
+from app.language_detection import detect_language, split_paragraphs
+
+
+def test_detect_language_by_script():
+    assert detect_language("明日のミーティングは10時からです。") == "Japanese"
+    assert detect_language("明天的会议从十点开始。") == "Chinese"
+    assert detect_language("내일 회의는 10시에 시작합니다.") == "Korean"
+    assert detect_language("Завтра встреча начнется в десять часов.") == "Russian"
+    assert detect_language("<@U12345> :wave: 明日のミーティングは <https://example.com|こちら>") == "Japanese"
+
+
+def test_detect_language_by_trigram_profiles():
+    assert detect_language(
+        "Hey, can someone help me figure out why the build is failing on the main branch?"
+    ) == "English"
+    assert detect_language(
+        "Kann mir jemand helfen herauszufinden, warum der Build auf dem Hauptzweig fehlschlägt?"
+    ) == "German"
+    assert detect_language(
+        "¿Alguien puede ayudarme a entender por qué falla la compilación en la rama principal?"
+    ) == "Spanish"
+    assert detect_language(
+        "Alguém pode me ajudar a entender por que a compilação está falhando no branch principal?"
+    ) == "Portuguese"
+
+
+def test_detect_language_returns_none_when_uncertain():
+    assert detect_language(None) is None
+    assert detect_language("Submit") is None
+    assert detect_language("```print('hello world, this is a long enough code block')```") is None
+    assert detect_language(":+1: <@U12345>") is None
+
+
+def test_split_paragraphs_keeps_code_blocks():
+    text = "Hello\n\n```\nfoo\n\nbar\n```\n\n こんにちは"
+    paragraphs = split_paragraphs(text)
+    assert paragraphs == ["Hello", "\n\n", "```\nfoo\n\nbar\n```", "\n\n ", "こんにちは"]
+    assert "".join(paragraphs) == text
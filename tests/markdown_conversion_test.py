@@ -1,4 +1,7 @@
+import random
+
 from app.markdown_conversion import (
+    IncrementalMarkdownToSlackConverter,
     markdown_to_slack,
     slack_to_markdown,
 )
@@ -68,6 +71,19 @@ else:
         assert result == expected
 
 
+def test_incremental_markdown_to_slack():
+    rand = random.Random(7)
+    tokens = ["**bold**", "__bold__", "*italic*", "_italic_", "~~strike~~", "***both***", "**", "*", "_", "~~",
+              "`code`", "`", "``", "```", "```python\n", "text", " ", "\n", "\n\n", "- item ", "a*b", "x_y", "`\n"]
+    for _ in range(300):
+        content = "".join(rand.choice(tokens) for _ in range(rand.randint(1, 60)))
+        converter = IncrementalMarkdownToSlackConverter()
+        end = 0
+        while end < len(content):
+            end = min(len(content), end + rand.randint(1, 8))
+            assert converter.convert(content[:end]) == markdown_to_slack(content[:end])
+
+
 def test_slack_to_markdown():
     for content, expected in [
         (
@@ -122,3 +138,34 @@ else:
     ]:
         result = slack_to_markdown(content)
         assert result == expected
+
+
+def test_conversions_of_nested_and_unclosed_markers():
+    for content, expected in [
+        (
+            "***bold italic*** and **bold** and *italic* and __bold__ and ~~strike~~",
+            "_*bold italic*_ and *bold* and _italic_ and *bold* and ~strike~",
+        ),
+        ("**a**b*c* ***d*** *** e ***", "*a*b_c_ _*d*_ *** e ***"),
+        (
+            "`*not bold*` **bold** ```*not bold*``` *italic*",
+            "`*not bold*` *bold* ```*not bold*``` _italic_",
+        ),
+        (
+            "``` unclosed **bold** and `also unclosed *italic*",
+            "``` unclosed **bold** and `also unclosed _italic_",
+        ),
+        ("```python\n**x** = 1\n```\n**done**", "```python\n**x** = 1\n```\n*done*"),
+    ]:
+        assert markdown_to_slack(content) == expected
+
+    for content, expected in [
+        ("<@U123> :smile: *a*_b_~c~", "<@U123> :smile: **a***b*~~c~~"),
+        ("_*bold italic*_ __ _x_ ~~ ~y~", "***bold italic*** __ *x* ~~ ~~y~~"),
+        ("`multi\nline *x*` *y*", "`multi\nline *x*` *y*"),
+        (
+            "``` unclosed *bold* and `also unclosed _italic_",
+            "``` unclosed *bold* and `also unclosed *italic*",
+        ),
+    ]:
+        assert slack_to_markdown(content) == expected
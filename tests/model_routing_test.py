@@ -0,0 +1,115 @@
+import pytest
+from slack_bolt import BoltContext
+
+from app import model_routing, stream_watchdog
+from app.metrics import get_counter
+from app.model_routing import ModelRouter, parse_fallback_chain, route_openai_model
+from app.stream_watchdog import OpenAIStreamTimeoutError, watch_stream
+from tests.stream_watchdog_test import SlowStream
+
+
+def build_router() -> ModelRouter:
+    return ModelRouter(
+        parse_fallback_chain("gpt-4o, gpt-4o-mini"),
+        error_rate=0.5,
+        min_requests=4,
+        window_seconds=60,
+        open_seconds=30,
+        ttft_slo_seconds=5,
+    )
+
+
+def test_parse_fallback_chain():
+    assert parse_fallback_chain(None) == []
+    assert parse_fallback_chain("gpt-4o,,gpt-4o-mini ") == ["gpt-4o", "gpt-4o-mini"]
+
+
+def test_falls_back_while_the_circuit_is_open():
+    router = build_router()
+    endpoint = "errors.example.com"
+    assert router.select_model(endpoint, "gpt-4o", now=100) == "gpt-4o"
+    for i in range(4):
+        router.record(endpoint, "gpt-4o", succeeded=i == 0, now=100 + i)
+    assert router.state(endpoint, "gpt-4o") == "open"
+    assert router.select_model(endpoint, "gpt-4o", now=110) == "gpt-4o-mini"
+    assert get_counter(
+        "model_routing_decisions",
+        endpoint=endpoint,
+        requested="gpt-4o",
+        selected="gpt-4o-mini",
+        reason="fallback",
+    ) == 1
+    # The last model in the chain has nowhere to fall back
+    assert router.select_model(endpoint, "gpt-4o-mini", now=110) == "gpt-4o-mini"
+
+    # Half-open: only one probe request goes to the model
+    assert router.select_model(endpoint, "gpt-4o", now=140) == "gpt-4o"
+    assert router.state(endpoint, "gpt-4o") == "half_open"
+    assert router.select_model(endpoint, "gpt-4o", now=141) == "gpt-4o-mini"
+    # A failed probe keeps the circuit open
+    router.record(endpoint, "gpt-4o", succeeded=False, now=142)
+    assert router.state(endpoint, "gpt-4o") == "open"
+    assert router.select_model(endpoint, "gpt-4o", now=150) == "gpt-4o-mini"
+    # A successful probe closes it
+    assert router.select_model(endpoint, "gpt-4o", now=180) == "gpt-4o"
+    router.record(endpoint, "gpt-4o", succeeded=True, ttft_seconds=1, now=181)
+    assert router.state(endpoint, "gpt-4o") == "closed"
+    assert router.select_model(endpoint, "gpt-4o", now=182) == "gpt-4o"
+
+
+def test_latency_slo():
+    router = build_router()
+    endpoint = "latency.example.com"
+    for i, ttft in enumerate([1, 2, 1, 9]):
+        router.record(endpoint, "gpt-4o", succeeded=True, ttft_seconds=ttft, now=100 + i)
+    assert router.state(endpoint, "gpt-4o") == "open"
+    assert get_counter(
+        "model_circuit_transitions", endpoint=endpoint, model="gpt-4o", state="open"
+    ) == 1
+    assert router.select_model(endpoint, "gpt-4o", now=110) == "gpt-4o-mini"
+    # A slow probe keeps the circuit open
+    assert router.select_model(endpoint, "gpt-4o", now=140) == "gpt-4o"
+    router.record(endpoint, "gpt-4o", succeeded=True, ttft_seconds=9, now=141)
+    assert router.state(endpoint, "gpt-4o") == "open"
+
+
+def test_route_openai_model(monkeypatch):
+    router = build_router()
+    monkeypatch.setattr(model_routing, "model_router", router)
+    for i in range(4):
+        router.record("api.openai.com", "gpt-4o", succeeded=False)
+    context = BoltContext({"OPENAI_MODEL": "gpt-4o", "OPENAI_API_BASE": None})
+    assert route_openai_model(context) == "gpt-4o-mini"
+    assert context["OPENAI_MODEL"] == "gpt-4o-mini"
+    assert context["OPENAI_REQUESTED_MODEL"] == "gpt-4o"
+    # The decision is made once per request
+    assert route_openai_model(context) == "gpt-4o-mini"
+
+    # A model not in the chain is never switched
+    context = BoltContext({"OPENAI_MODEL": "gpt-4-turbo", "OPENAI_API_BASE": None})
+    assert route_openai_model(context) == "gpt-4-turbo"
+
+    # Azure OpenAI requests go to the deployment whatever the model is
+    context = BoltContext(
+        {"OPENAI_MODEL": "gpt-4o", "OPENAI_API_BASE": None, "OPENAI_API_TYPE": "azure"}
+    )
+    assert route_openai_model(context) == "gpt-4o"
+    assert context.get("OPENAI_REQUESTED_MODEL") is None
+
+
+def test_one_outcome_per_stream(monkeypatch):
+    router = build_router()
+    monkeypatch.setattr(stream_watchdog, "model_router", router)
+    recorded = []
+    monkeypatch.setattr(router, "record", lambda *args, **kwargs: recorded.append(kwargs))
+
+    stream = SlowStream(["a", "b"], [0, 5])
+    with pytest.raises(OpenAIStreamTimeoutError):
+        list(watch_stream(stream, model="gpt-4o", endpoint="e", stall_timeout_seconds=0.1))
+    assert [r["succeeded"] for r in recorded] == [False]
+
+    recorded.clear()
+    list(watch_stream(SlowStream(["a", "b"], [0, 0]), model="gpt-4o", endpoint="e"))
+    assert len(recorded) == 1
+    assert recorded[0]["succeeded"] is True
+    assert recorded[0]["ttft_seconds"] >= 0
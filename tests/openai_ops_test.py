@@ -1,7 +1,31 @@
+import logging
+import random
+import re
+import threading
+import time
+
+import pytest
+from slack_bolt import BoltContext
+
+import app.openai_ops
+import app.stream_resumption
 from app.openai_ops import (
+    consume_openai_stream_to_write_reply,
+    count_text_tokens,
     format_assistant_reply,
     format_openai_message_content,
+    generate_proofreading_result,
+    generate_slack_thread_summary,
+    group_by_tokens,
+    split_by_tokens,
+    split_streamed_reply_for_rollover,
 )
+from app.slack_ops import (
+    build_conversation_metadata,
+    is_continuation_of,
+    merge_continuation_text,
+)
+from app.stream_watchdog import OpenAIStreamTimeoutError
 
 
 def test_format_assistant_reply():
@@ -49,6 +73,20 @@ def test_format_assistant_reply():
         assert result == expected
 
 
+def test_format_assistant_reply_prefixes_and_tags():
+    for content, expected in [
+        ("\n\n<@U123ABC>: hi\n```python\nx = 1\n```", "hi\n```\nx = 1\n```"),
+        ("\n<@U123ABC> : ```Python\nx\n```", "```\nx\n```"),
+        ("<@U123ABC>:\n\n```JSON\n{}\n```", "\n```\n{}\n```"),
+        # Only the mention at the beginning is removed
+        ("hi <@U123ABC>: ```sql\nselect 1\n```", "hi <@U123ABC>: ```\nselect 1\n```"),
+        ("``` python\nx\n```\n```\npython\ny\n```", "```\nx\n```\n```\ny\n```"),
+        ("text\n```c++\nx\n``````cpp\ny\n```", "text\n```\nx\n``````\ny\n```"),
+        ("```yaml\na: 1\n```", "```yaml\na: 1\n```"),
+    ]:
+        assert format_assistant_reply(content, False) == expected
+
+
 def test_format_openai_message_content():
     # https://github.com/seratch/ChatGPT-in-Slack/pull/5
     for content, expected in [
@@ -69,3 +107,295 @@ int main(int argc, char *argv[])
     ]:
         result = format_openai_message_content(content, False)
         assert result == expected
+
+
+def test_split_streamed_reply_for_rollover():
+    source = "First paragraph.\n\nSecond paragraph with **bold** text.\n\nThird"
+    boundary, within_code_block = split_streamed_reply_for_rollover(source, 40)
+    assert source[:boundary] == "First paragraph.\n\n"
+    assert within_code_block is False
+
+    # A long code block is split at a line break and reopened in the next message
+    source = "Here you go:\n```\n" + "".join(f"print({i})\n" for i in range(20)) + "```\n"
+    boundary, within_code_block = split_streamed_reply_for_rollover(source, 60)
+    assert boundary <= 60
+    assert source[:boundary].endswith("\n")
+    assert within_code_block is True
+
+
+def test_group_by_tokens():
+    pieces = ["a b\n", "c d e\n", "f\n", "g h i j k l\n", "m\n"]
+    groups = group_by_tokens(pieces, 4, lambda text: len(text.split()))
+    assert groups == ["a b\n", "c d e\nf\n", "g h i j ", "k l\nm\n"]
+    assert "".join(groups) == "".join(pieces)
+
+
+def test_split_by_tokens():
+    text = "x" * 1000
+
+    def count_tokens(t: str) -> int:
+        return len(t) // 4
+
+    pieces = split_by_tokens(text, 30, count_tokens)
+    assert "".join(pieces) == text
+    assert all(count_tokens(p) <= 30 for p in pieces)
+    assert len(pieces) == 9
+
+
+class _FakeCompletion:
+    def __init__(self, content: str):
+        self.content = content
+
+    def model_dump(self):
+        return {"choices": [{"message": {"content": self.content}}]}
+
+
+def test_generate_slack_thread_summary_in_parts(monkeypatch):
+    requests = []
+    lock = threading.Lock()
+
+    def make_synchronous_openai_call(*, messages, timeout_seconds, **kwargs):
+        assert 0 < timeout_seconds <= 10
+        content = messages[-1]["content"]
+        with lock:
+            requests.append(content)
+        if content.startswith("Part "):
+            return _FakeCompletion(f"summary of {content.splitlines()[0]}")
+        return _FakeCompletion("final summary")
+
+    monkeypatch.setattr(app.openai_ops, "make_synchronous_openai_call", make_synchronous_openai_call)
+    monkeypatch.setattr(
+        app.openai_ops, "calculate_thread_summary_token_budget", lambda context, prompt: 60
+    )
+    monkeypatch.setattr(app.openai_ops, "MIN_THREAD_SUMMARY_CHUNK_TOKENS", 10)
+    # A long log pasted in one reply is split as well
+    long_reply = "<@U999>: " + "log line " * 200 + "\n"
+    thread_content = long_reply + "".join(f"<@U{i:03d}>: reply number {i}\n" for i in range(50))
+    progress = []
+    summary = generate_slack_thread_summary(
+        context=BoltContext(
+            {
+                "OPENAI_MODEL": "gpt-4o-mini",
+                "OPENAI_TEMPERATURE": 1,
+                "OPENAI_API_TYPE": None,
+                "OPENAI_API_BASE": None,
+                "OPENAI_API_VERSION": None,
+                "OPENAI_DEPLOYMENT_ID": None,
+                "OPENAI_ORG_ID": None,
+            }
+        ),
+        logger=logging.getLogger(__name__),
+        openai_api_key="sk-test",
+        prompt="Summarize this thread",
+        thread_content=thread_content,
+        timeout_seconds=10,
+        on_progress=lambda done, total: progress.append((done, total)),
+    )
+    assert summary == "final summary"
+    total = progress[0][1]
+    assert total > 1
+    assert progress[0] == (0, total)
+    assert progress[-1] == (total, total)
+    # Every reply is summarized once, and the final request has only the partial summaries
+    assert sum(r.count("reply number") for r in requests if r.startswith("Part ")) == 50
+    assert "reply number" not in requests[-1]
+    # Every request fits in the budget (+ the "Part i of n" header)
+    for request in requests:
+        assert count_text_tokens(request, "gpt-4o-mini") <= 80
+
+
+def test_generate_slack_thread_summary_with_too_long_prompt(monkeypatch):
+    def make_synchronous_openai_call(**kwargs):
+        raise AssertionError("no request should be sent")
+
+    monkeypatch.setattr(app.openai_ops, "make_synchronous_openai_call", make_synchronous_openai_call)
+    monkeypatch.setattr(
+        app.openai_ops, "calculate_thread_summary_token_budget", lambda context, prompt: 0
+    )
+    with pytest.raises(ValueError):
+        generate_slack_thread_summary(
+            context=BoltContext({"OPENAI_MODEL": "gpt-4o-mini"}),
+            logger=logging.getLogger(__name__),
+            openai_api_key="sk-test",
+            prompt="A very long custom prompt",
+            thread_content="<@U001>: hello\n",
+            timeout_seconds=10,
+        )
+
+
+class _FakeChunk:
+    def __init__(self, content, finish_reason=None):
+        self.choices = [self]
+        self.content = content
+        self.finish_reason = finish_reason
+
+    def model_dump(self):
+        return {"delta": {"content": self.content}, "finish_reason": self.finish_reason}
+
+
+class _FakeStream:
+    def __init__(self, chunks):
+        self.chunks = chunks
+        self.closed = False
+
+    def __iter__(self):
+        return iter(self.chunks)
+
+    def close(self):
+        self.closed = True
+
+
+def test_generate_proofreading_result_streams_partial_text(monkeypatch):
+    stream = _FakeStream(
+        [_FakeChunk("Thank "), _FakeChunk("you "), _FakeChunk("so much."), _FakeChunk(None, "stop")]
+    )
+
+    def start_receiving_openai_response(*, timeout_seconds, **kwargs):
+        assert 0 < timeout_seconds <= 10
+        return stream
+
+    monkeypatch.setattr(app.openai_ops, "start_receiving_openai_response", start_receiving_openai_response)
+    partial_texts = []
+    result = generate_proofreading_result(
+        context=BoltContext(
+            {
+                "OPENAI_MODEL": "gpt-4o-mini",
+                "OPENAI_TEMPERATURE": 1,
+                "OPENAI_API_TYPE": None,
+                "OPENAI_API_BASE": None,
+                "OPENAI_API_VERSION": None,
+                "OPENAI_DEPLOYMENT_ID": None,
+                "OPENAI_ORG_ID": None,
+            }
+        ),
+        logger=logging.getLogger(__name__),
+        openai_api_key="sk-test",
+        original_text="Thank you so much",
+        timeout_seconds=10,
+        on_partial_text=partial_texts.append,
+    )
+    assert result == "Thank you so much."
+    assert partial_texts == ["Thank ", "Thank you ", "Thank you so much."]
+    assert stream.closed is True
+
+
+class _BrokenStream(_FakeStream):
+    def __iter__(self):
+        yield from self.chunks
+        raise OpenAIStreamTimeoutError("stall")
+
+
+def test_consume_openai_stream_to_write_reply_resumes_broken_streams(monkeypatch):
+    first_stream = _BrokenStream([_FakeChunk("The answer "), _FakeChunk("is ")])
+    continuation = _FakeStream([_FakeChunk("42."), _FakeChunk(None, "stop")])
+    requests = []
+
+    def start_receiving_openai_response(*, messages, function_call_module_name, **kwargs):
+        requests.append(messages)
+        assert function_call_module_name is None
+        return continuation
+
+    updates = []
+
+    def update_wip_message(*, text, **kwargs):
+        updates.append(text)
+
+    monkeypatch.setattr(app.openai_ops, "start_receiving_openai_response", start_receiving_openai_response)
+    monkeypatch.setattr(app.openai_ops, "update_wip_message", update_wip_message)
+    monkeypatch.setattr(app.stream_resumption, "resume_backoff_seconds", lambda attempt: 0)
+    messages = [{"role": "user", "content": "What is the answer?"}]
+    wip_reply = {"message": {"ts": "111.222", "text": ""}}
+    consume_openai_stream_to_write_reply(
+        client=None,
+        wip_reply=wip_reply,
+        context=BoltContext({"OPENAI_MODEL": "gpt-4o-mini", "channel_id": "C111"}),
+        user_id="U111",
+        messages=messages,
+        stream=first_stream,
+        timeout_seconds=30,
+        translate_markdown=False,
+    )
+    # The partial reply is sent as the assistant's message
+    assert requests[0][-2] == {"role": "assistant", "content": "The answer is "}
+    assert requests[0][-1]["role"] == "user"
+    assert messages[-1]["content"] == "The answer is 42."
+    assert wip_reply["message"]["text"] == "The answer is 42."
+    assert updates[-1] == "The answer is 42."
+    assert first_stream.closed is True
+    assert continuation.closed is True
+
+
+def test_rolled_over_reply_is_merged_into_the_original_reply(monkeypatch):
+    reply = "```python\n" + "".join(f"print('line {i}')\n" for i in range(12)) + "```"
+    stream = _FakeStream([_FakeChunk(reply[i:i + 5]) for i in range(0, len(reply), 5)] + [_FakeChunk(None, "stop")])
+    posted = {"100.000": {"ts": "100.000"}}
+
+    def post_wip_message(*, messages, user, continues=None, reopens_code_block=False, **kwargs):
+        ts = f"{100 + len(posted)}.000"
+        posted[ts] = {
+            "ts": ts,
+            "metadata": build_conversation_metadata(
+                messages=messages,
+                user=user,
+                continues=continues,
+                reopens_code_block=reopens_code_block,
+            ),
+        }
+        return {"message": {"ts": ts}}
+
+    def update_wip_message(*, ts, text, **kwargs):
+        posted[ts]["text"] = text
+
+    monkeypatch.setattr(app.openai_ops, "STREAMING_REPLY_ROLLOVER_LENGTH", 80)
+    monkeypatch.setattr(app.openai_ops, "post_wip_message", post_wip_message)
+    monkeypatch.setattr(app.openai_ops, "update_wip_message", update_wip_message)
+    consume_openai_stream_to_write_reply(
+        client=None,
+        wip_reply={"message": {"ts": "100.000", "thread_ts": "99.000", "text": ""}},
+        context=BoltContext({"OPENAI_MODEL": "gpt-4o-mini", "channel_id": "C111"}),
+        user_id="U111",
+        messages=[{"role": "user", "content": "Write a script"}],
+        stream=stream,
+        timeout_seconds=30,
+        translate_markdown=False,
+    )
+    pieces = list(posted.values())
+    assert len(pieces) > 2
+    assert all(piece["text"].count("```") == 2 for piece in pieces)
+
+    # Rebuilding the thread restores the code block without the fences added at the splits
+    text = pieces[0]["text"]
+    for previous, piece in zip(pieces, pieces[1:]):
+        assert is_continuation_of(piece, previous) is True
+        text = merge_continuation_text(text, piece["text"], piece)
+    assert text == format_assistant_reply(reply, False)
+
+
+def test_summarize_parts_stops_at_the_first_failure(monkeypatch):
+    sent = []
+
+    def make_synchronous_openai_call(*, messages, **kwargs):
+        sent.append(messages[-1]["content"])
+        raise ValueError("context_length_exceeded")
+
+    monkeypatch.setattr(app.openai_ops, "make_synchronous_openai_call", make_synchronous_openai_call)
+    monkeypatch.setattr(app.openai_ops, "THREAD_SUMMARY_MAX_CONCURRENCY", 1)
+    with pytest.raises(ValueError):
+        app.openai_ops._summarize_parts(
+            context=BoltContext(
+                {
+                    "OPENAI_MODEL": "gpt-4o-mini",
+                    "OPENAI_TEMPERATURE": 1,
+                    "OPENAI_API_TYPE": None,
+                    "OPENAI_API_BASE": None,
+                    "OPENAI_API_VERSION": None,
+                    "OPENAI_DEPLOYMENT_ID": None,
+                    "OPENAI_ORG_ID": None,
+                }
+            ),
+            openai_api_key="sk-test",
+            parts=[f"part {i}" for i in range(10)],
+            merging=False,
+            deadline=time.time() + 10,
+        )
+    assert len(sent) < 10
@@ -0,0 +1,46 @@
+import pytest
+
+from app.sensitive_info_redaction import RedactionEngine, _REDACTION_RULES
+
+
+def test_redact_all_categories():
+    engine = RedactionEngine(_REDACTION_RULES)
+    assert engine.prefilter is not None
+    assert engine.redact(
+        "Contact me at foo.bar@example.com or (555) 123-4567. "
+        "Card: 4111 1111 1111 1111, SSN: 123-45-6789"
+    ) == "Contact me at [EMAIL] or [PHONE]. Card: [CREDIT CARD], SSN: [SSN]"
+    text = "<@U123ABC> Thanks! Let's discuss this tomorrow :+1:"
+    assert engine.redact(text) is text
+
+
+def test_card_numbers_after_other_digits():
+    engine = RedactionEngine(_REDACTION_RULES)
+    assert engine.redact("Invoice #100234 4111 1111 1111 1111") == "Invoice #100234 [CREDIT CARD]"
+    assert engine.redact("Order 123456\n4111 1111 1111 1111") == "Order 123456\n[CREDIT CARD]"
+
+
+def test_user_defined_pattern():
+    rules = [r for r in _REDACTION_RULES if r[0] != "USER_DEFINED"]
+    engine = RedactionEngine(rules + [("USER_DEFINED", r"project-[a-z]+", "[REDACTED]")])
+    assert engine.prefilter is None
+    assert engine.redact("The project-phoenix email is team@example.com") == (
+        "The [REDACTED] email is [EMAIL]"
+    )
+
+
+def test_user_defined_pattern_flags_apply_only_to_the_pattern():
+    rules = [r for r in _REDACTION_RULES if r[0] != "USER_DEFINED"]
+    engine = RedactionEngine(rules + [("USER_DEFINED", r"(?i)secret", "[REDACTED]")])
+    assert engine.redact("SECRET: TEAM@EXAMPLE.COM") == "[REDACTED]: [EMAIL]"
+    assert engine.redact("Mail TEAM@EXAMPLE.C0M") == "Mail TEAM@EXAMPLE.C0M"
+
+
+def test_backreferences():
+    engine = RedactionEngine([("USER_DEFINED", r"(\w)\1{3,}", "[REDACTED]")])
+    assert engine.redact("aaaa bbb") == "[REDACTED] bbb"
+
+
+def test_invalid_pattern():
+    with pytest.raises(ValueError):
+        RedactionEngine([("EMAIL", r"[a-z", "[EMAIL]")])
@@ -0,0 +1,77 @@
+import threading
+import time
+
+import pytest
+
+from app.metrics import get_counter
+from app.singleflight import SingleFlight
+
+
+def _run_concurrently(flight: SingleFlight, fn, num_threads: int = 5) -> list:
+    results = []
+
+    def _call():
+        try:
+            results.append(flight.do("key", fn))
+        except Exception as e:
+            results.append(e)
+
+    threads = [threading.Thread(target=_call) for _ in range(num_threads)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return results
+
+
+def test_concurrent_calls_share_one_result():
+    flight = SingleFlight("test_shared")
+    num_calls = []
+
+    def _slow_call():
+        num_calls.append(1)
+        time.sleep(0.2)
+        return "result"
+
+    assert _run_concurrently(flight, _slow_call) == ["result"] * 5
+    assert len(num_calls) == 1
+    assert get_counter("singleflight_calls", group="test_shared") == 1
+    assert get_counter("singleflight_coalesced", group="test_shared") == 4
+    assert flight.in_flight() == 0
+
+    # Once completed, the next call runs the function again
+    assert flight.do("key", _slow_call) == "result"
+    assert len(num_calls) == 2
+
+
+def test_concurrent_calls_share_one_error():
+    flight = SingleFlight("test_error")
+
+    def _failing_call():
+        time.sleep(0.2)
+        raise ValueError("upstream error")
+
+    results = _run_concurrently(flight, _failing_call)
+    assert len(results) == 5
+    assert all(isinstance(r, ValueError) for r in results)
+    assert get_counter("singleflight_calls", group="test_error") == 1
+    with pytest.raises(ValueError):
+        flight.do("key", _failing_call)
+
+
+def test_errors_are_not_shared_when_disabled():
+    flight = SingleFlight("test_unshared_error", share_errors=False)
+    num_calls = []
+
+    def _call():
+        num_calls.append(1)
+        time.sleep(0.2)
+        if len(num_calls) == 1:
+            raise ValueError("invalid API key")
+        return "result"
+
+    results = _run_concurrently(flight, _call, num_threads=3)
+    assert len([r for r in results if isinstance(r, ValueError)]) == 1
+    assert results.count("result") == 2
+    # One of the waiting callers retries, and the other one receives its result
+    assert len(num_calls) == 2
@@ -0,0 +1,296 @@
+import logging
+
+from slack_bolt import BoltContext
+from slack_sdk.errors import SlackApiError
+
+from app.slack_ops import (
+    build_conversation_metadata,
+    build_thread_replies_as_combined_text,
+    build_thread_transcript,
+    iter_thread_transcript_lines,
+    is_continuation_of,
+    merge_continuation_text,
+    parse_conversation_metadata,
+    StreamingViewPublisher,
+)
+
+SYSTEM_TEXT = "You are a bot in a slack chat room. You might receive messages from multiple people."
+
+
+def test_conversation_metadata_refers_to_shared_system_text():
+    messages = [
+        {"role": "system", "content": SYSTEM_TEXT},
+        {"role": "user", "content": "<@U111>: Hi there!"},
+    ]
+    metadata = build_conversation_metadata(
+        messages=messages, user="U111", shared_system_text=SYSTEM_TEXT
+    )
+    assert SYSTEM_TEXT not in str(metadata)
+    assert parse_conversation_metadata(metadata, SYSTEM_TEXT) == (
+        [{"role": "system", "content": SYSTEM_TEXT}],
+        "U111",
+    )
+    # The system prompt has been changed since then
+    assert parse_conversation_metadata(metadata, "New prompt") == (
+        [{"role": "system", "content": "New prompt"}],
+        "U111",
+    )
+
+
+def test_conversation_metadata_with_custom_system_text():
+    messages = [{"role": "system", "content": "Old prompt"}]
+    metadata = build_conversation_metadata(
+        messages=messages, user="U111", shared_system_text=SYSTEM_TEXT
+    )
+    assert parse_conversation_metadata(metadata, SYSTEM_TEXT) == (messages, "U111")
+
+
+def test_legacy_conversation_metadata():
+    messages = [{"role": "system", "content": "Old prompt"}]
+    metadata = {
+        "event_type": "chat-gpt-convo",
+        "event_payload": {"messages": messages, "user": "U111"},
+    }
+    assert parse_conversation_metadata(metadata, SYSTEM_TEXT) == (messages, "U111")
+    assert parse_conversation_metadata({"event_type": "other"}, SYSTEM_TEXT) == (None, None)
+    assert parse_conversation_metadata(None, SYSTEM_TEXT) == (None, None)
+
+
+def test_continuation_metadata():
+    messages = [{"role": "system", "content": SYSTEM_TEXT}]
+    first = {
+        "ts": "1700000000.000100",
+        "metadata": build_conversation_metadata(messages=messages, user="U111"),
+    }
+    second = {
+        "ts": "1700000000.000200",
+        "metadata": build_conversation_metadata(
+            messages=messages, user="U111", continues=first["ts"]
+        ),
+    }
+    assert is_continuation_of(second, first) is True
+    assert is_continuation_of(first, None) is False
+    assert is_continuation_of(second, {"ts": "1700000000.000050"}) is False
+    assert is_continuation_of({"ts": "1700000000.000300", "text": "Hi"}, second) is False
+    assert parse_conversation_metadata(second["metadata"], SYSTEM_TEXT) == (
+        messages,
+        "U111",
+    )
+
+
+def test_merge_continuation_text():
+    messages = [{"role": "system", "content": SYSTEM_TEXT}]
+    reopened = {
+        "metadata": build_conversation_metadata(
+            messages=messages, user="U111", continues="1700000000.000100", reopens_code_block=True
+        ),
+    }
+    assert merge_continuation_text("```\na = 1\n```", "```\nb = 2\n```", reopened) == "```\na = 1\nb = 2\n```"
+    # Code blocks the reply actually ended and started with are kept
+    continued = {
+        "metadata": build_conversation_metadata(
+            messages=messages, user="U111", continues="1700000000.000100"
+        ),
+    }
+    assert merge_continuation_text("```\na = 1\n```", "```\nb = 2\n```", continued) == (
+        "```\na = 1\n```\n```\nb = 2\n```"
+    )
+
+
+class _ThreadRepliesClient:
+    def __init__(self, replies: list):
+        self.replies = replies
+        self.bots_info_calls = []
+
+    def conversations_replies(self, **kwargs):
+        return [{"messages": self.replies}]
+
+    def bots_info(self, bot: str):
+        self.bots_info_calls.append(bot)
+        return {"bot": {"id": bot, "user_id": f"U{bot}"}}
+
+
+def test_bot_user_ids_are_cached():
+    replies = [{"user": "U111", "text": "CI failed again"}]
+    for i in range(30):
+        replies.append({"bot_id": f"B{i % 3}", "text": f"Build #{i} failed"})
+    client = _ThreadRepliesClient(replies)
+    context = BoltContext({"team_id": "T-bot-cache", "bot_user_id": "UBOT"})
+
+    text = build_thread_replies_as_combined_text(
+        context=context, client=client, channel="C111", thread_ts="111.222"
+    )
+    assert sorted(client.bots_info_calls) == ["B0", "B1", "B2"]
+    assert "<@UB1>: Build #1 failed\n" in text
+
+    build_thread_replies_as_combined_text(
+        context=context, client=client, channel="C111", thread_ts="111.222"
+    )
+    assert len(client.bots_info_calls) == 3
+
+
+class _PagedThreadRepliesClient:
+    def __init__(self, num_replies: int, page_size: int):
+        self.replies = [
+            {"user": f"U{i:03d}", "text": f"reply number {i}"} for i in range(num_replies)
+        ]
+        self.page_size = page_size
+        self.fetched_pages = 0
+
+    def conversations_replies(self, **kwargs):
+        for i in range(0, len(self.replies), self.page_size):
+            self.fetched_pages += 1
+            yield {"messages": self.replies[i: i + self.page_size]}
+
+
+def _build_transcript(client, max_tokens: int, strategy: str) -> str:
+    return build_thread_transcript(
+        context=BoltContext({"team_id": "T111", "bot_user_id": "UBOT"}),
+        client=client,
+        channel="C111",
+        thread_ts="111.222",
+        max_tokens=max_tokens,
+        count_tokens=lambda text: len(text.split()),  # 4 per line
+        strategy=strategy,
+    )
+
+
+def test_thread_transcript_within_budget():
+    client = _PagedThreadRepliesClient(num_replies=10, page_size=3)
+    transcript = _build_transcript(client, max_tokens=1000, strategy="head_tail")
+    assert transcript == build_thread_replies_as_combined_text(
+        context=BoltContext({"team_id": "T111", "bot_user_id": "UBOT"}),
+        client=client,
+        channel="C111",
+        thread_ts="111.222",
+    )
+    assert transcript.count("\n") == 10
+
+
+def test_thread_transcript_oldest_first_stops_fetching():
+    client = _PagedThreadRepliesClient(num_replies=100, page_size=10)
+    transcript = _build_transcript(client, max_tokens=40, strategy="oldest_first")
+    assert transcript.splitlines()[-1] == "<@U009>: reply number 9"
+    assert client.fetched_pages == 2
+
+
+def test_thread_transcript_newest_first():
+    client = _PagedThreadRepliesClient(num_replies=100, page_size=10)
+    transcript = _build_transcript(client, max_tokens=16 + 40, strategy="newest_first")
+    lines = transcript.splitlines()
+    assert lines[0] == "(... 90 replies omitted ...)"
+    assert lines[1] == "<@U090>: reply number 90"
+    assert lines[-1] == "<@U099>: reply number 99"
+
+
+def test_thread_transcript_head_and_tail():
+    client = _PagedThreadRepliesClient(num_replies=100, page_size=10)
+    transcript = _build_transcript(client, max_tokens=80 + 16, strategy="head_tail")
+    lines = transcript.splitlines()
+    # 12 lines for the first half of the budget, and 8 lines for the rest
+    assert lines[0] == "<@U000>: reply number 0"
+    assert lines[11] == "<@U011>: reply number 11"
+    assert lines[12] == "(... 80 replies omitted ...)"
+    assert lines[13] == "<@U092>: reply number 92"
+    assert lines[-1] == "<@U099>: reply number 99"
+
+
+def test_thread_transcript_lines_after_last_summary():
+    replies = [
+        {"ts": "100.000", "user": "U111", "text": "The parent"},
+        {"ts": "101.000", "user": "U222", "text": "An old reply"},
+        {"ts": "102.000", "user": "U333", "text": "A new reply"},
+        {"ts": "103.000", "user": "UBOT", "text": "A summary by this app"},
+    ]
+    client = _ThreadRepliesClient(replies)
+    lines = list(
+        iter_thread_transcript_lines(
+            context=BoltContext({"team_id": "T111", "bot_user_id": "UBOT"}),
+            client=client,
+            channel="C111",
+            thread_ts="100.000",
+            oldest="101.000",
+        )
+    )
+    assert lines == ["<@U333>: A new reply\n"]
+
+    last_seen = {}
+    transcript = build_thread_transcript(
+        context=BoltContext({"team_id": "T111", "bot_user_id": "UBOT"}),
+        client=client,
+        channel="C111",
+        thread_ts="100.000",
+        max_tokens=1000,
+        count_tokens=lambda text: len(text.split()),
+        oldest="101.000",
+        last_seen=last_seen,
+    )
+    assert transcript == "<@U333>: A new reply\n"
+    assert last_seen == {"ts": "103.000"}
+
+
+def test_thread_transcript_last_seen_excludes_replies_left_out():
+    replies = [
+        {"ts": f"{100 + i}.000", "user": f"U{i:03d}", "text": f"reply number {i}"} for i in range(10)
+    ]
+    last_seen = {}
+    transcript = build_thread_transcript(
+        context=BoltContext({"team_id": "T111", "bot_user_id": "UBOT"}),
+        client=_ThreadRepliesClient(replies),
+        channel="C111",
+        thread_ts="100.000",
+        max_tokens=12,
+        count_tokens=lambda text: len(text.split()),  # 4 per line
+        strategy="oldest_first",
+        last_seen=last_seen,
+    )
+    assert transcript.splitlines()[-1] == "<@U002>: reply number 2"
+    # The next summary starts from the first reply that has not been included
+    assert last_seen == {"ts": "102.000"}
+
+    last_seen = {}
+    build_thread_transcript(
+        context=BoltContext({"team_id": "T111", "bot_user_id": "UBOT"}),
+        client=_ThreadRepliesClient(replies),
+        channel="C111",
+        thread_ts="100.000",
+        max_tokens=16 + 12,
+        count_tokens=lambda text: len(text.split()),
+        strategy="head_tail",
+        last_seen=last_seen,
+    )
+    assert last_seen == {"ts": "109.000"}
+
+
+class _ViewsClient:
+    def __init__(self):
+        self.updates = []
+
+    def views_update(self, *, view_id, hash, view):
+        if hash is not None and hash != f"hash-{len(self.updates)}":
+            raise SlackApiError("hash_conflict", {"ok": False, "error": "hash_conflict"})
+        self.updates.append(view["text"])
+        return {"ok": True, "view": {"hash": f"hash-{len(self.updates)}"}}
+
+
+def test_streaming_view_publisher_is_throttled():
+    client = _ViewsClient()
+    publisher = StreamingViewPublisher(
+        client=client,
+        view_id="V111",
+        build_view=lambda text: {"text": text},
+        logger=logging.getLogger(__name__),
+        interval_seconds=60,
+    )
+    publisher("Hello")
+    publisher("Hello, world")
+    assert client.updates == ["Hello"]
+
+    publisher.interval_seconds = 0
+    publisher("Hello, world")
+    assert client.updates == ["Hello", "Hello, world"]
+    # The modal has been updated by something else
+    client.updates.append("An error occurred")
+    publisher("Hello, world!")
+    assert client.updates == ["Hello", "Hello, world", "An error occurred"]
+    assert publisher.stopped is True
@@ -0,0 +1,168 @@
+import threading
+import time
+
+import pytest
+from slack_sdk.errors import SlackApiError
+from slack_sdk.web import WebClient, SlackResponse
+
+from app.deadline import Deadline
+from app.slack_rate_limiter import (
+    BACKGROUND,
+    INTERACTIVE,
+    SlackApiScheduler,
+    TokenBucket,
+    background_priority,
+    current_priority,
+)
+
+
+def _response(status_code: int = 200, headers: dict = {}) -> SlackResponse:
+    return SlackResponse(
+        client=WebClient(),
+        http_verb="POST",
+        api_url="https://slack.com/api/chat.update",
+        req_args={},
+        data={"ok": status_code == 200},
+        headers=headers,
+        status_code=status_code,
+    )
+
+
+def test_token_bucket_allows_bursts_then_waits():
+    bucket = TokenBucket(requests_per_minute=600)  # 10 per second, burst of 60
+    bucket.tokens = 1
+    assert bucket.acquire(INTERACTIVE, 1) < 0.01
+    waited = bucket.acquire(INTERACTIVE, 2)
+    assert 0.05 < waited < 0.5
+
+
+def test_retry_after_pauses_and_slows_down_the_bucket():
+    scheduler = SlackApiScheduler()
+    calls = []
+
+    def send():
+        calls.append(time.monotonic())
+        if len(calls) == 1:
+            response = _response(429, {"Retry-After": "0.2"})
+            raise SlackApiError("ratelimited", response)
+        return _response()
+
+    scheduler.call(team="T1", method="conversations.replies", channel="C1", send=send)
+    assert len(calls) == 2
+    assert calls[1] - calls[0] >= 0.2
+    bucket = scheduler.bucket("T1", "conversations.replies", "C1")
+    assert bucket.rate < bucket.max_rate
+
+
+def test_long_retry_after_does_not_block_past_the_deadline():
+    scheduler = SlackApiScheduler()
+    calls = []
+
+    def send():
+        calls.append(1)
+        raise SlackApiError("ratelimited", _response(429, {"Retry-After": "30"}))
+
+    started_at = time.monotonic()
+    with pytest.raises(TimeoutError), background_priority():
+        scheduler.call(
+            team="T2", method="chat.postMessage", channel="C1", send=send, deadline=Deadline(1)
+        )
+    assert time.monotonic() - started_at < 0.5
+    assert len(calls) == 1
+    bucket = scheduler.bucket("T2", "chat.postMessage", "C1")
+    assert bucket.queue_depth() == 0
+
+
+def test_interactive_calls_wait_past_the_deadline():
+    scheduler = SlackApiScheduler()
+    bucket = scheduler.bucket("T3", "chat.update", "C1")
+    bucket.tokens = 0.95  # about 0.06 seconds to the next token
+    deadline = Deadline(1, started_at=time.time() - 2)
+
+    with pytest.raises(TimeoutError), background_priority():
+        scheduler.call(team="T3", method="chat.update", channel="C1", send=_response, deadline=deadline)
+    # The final reply and error messages are delivered after the deadline
+    response = scheduler.call(team="T3", method="chat.update", channel="C1", send=_response, deadline=deadline)
+    assert response.status_code == 200
+
+
+def test_interactive_calls_go_first():
+    bucket = TokenBucket(requests_per_minute=600)
+    bucket.tokens = 0
+    order = []
+
+    def acquire(name: str, priority: int, seq: int):
+        bucket.acquire(priority, seq)
+        order.append(name)
+
+    threads = [
+        threading.Thread(target=acquire, args=("background", BACKGROUND, 1)),
+        threading.Thread(target=acquire, args=("interactive", INTERACTIVE, 2)),
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert order == ["interactive", "background"]
+
+
+def test_queued_message_updates_are_coalesced():
+    scheduler = SlackApiScheduler()
+    bucket = scheduler.bucket("T1", "chat.update", "C1")
+    bucket.tokens = 0.9  # the first call waits for about 0.12 seconds
+    sent = []
+
+    def send(kwargs: dict) -> SlackResponse:
+        sent.append(kwargs["text"])
+        return _response()
+
+    responses = []
+
+    def update(text: str):
+        responses.append(
+            scheduler.update_message(
+                team="T1", channel="C1", ts="111.222", kwargs={"text": text}, send=send
+            )
+        )
+
+    threads = []
+    for text in ["a", "ab", "abc"]:
+        t = threading.Thread(target=update, args=(text,))
+        t.start()
+        threads.append(t)
+        time.sleep(0.01)
+    for t in threads:
+        t.join()
+    assert sent == ["abc"]
+    assert len(responses) == 3
+
+
+def test_coalesced_message_update_sends_only_the_latest_payload():
+    scheduler = SlackApiScheduler()
+    bucket = scheduler.bucket("T1", "chat.update", "C2")
+    bucket.tokens = 0.9
+    sent = []
+
+    def send(kwargs: dict) -> SlackResponse:
+        sent.append(kwargs)
+        return _response()
+
+    def update(kwargs: dict):
+        scheduler.update_message(team="T1", channel="C2", ts="111.222", kwargs=kwargs, send=send)
+
+    threads = []
+    for kwargs in [{"ts": "111.222", "text": "a", "blocks": []}, {"ts": "111.222", "text": "ab"}]:
+        t = threading.Thread(target=update, args=(kwargs,))
+        t.start()
+        threads.append(t)
+        time.sleep(0.01)
+    for t in threads:
+        t.join()
+    assert sent == [{"ts": "111.222", "text": "ab"}]
+
+
+def test_background_priority():
+    assert current_priority() == INTERACTIVE
+    with background_priority():
+        assert current_priority() == BACKGROUND
+    assert current_priority() == INTERACTIVE
@@ -0,0 +1,31 @@
+from app.stream_resumption import (
+    MAX_RESUME_BACKOFF_SECONDS,
+    next_resume_backoff_seconds,
+    resume_backoff_seconds,
+)
+from app.stream_watchdog import OpenAIStreamTimeoutError
+
+
+def test_resume_backoff_seconds():
+    for attempt in range(1, 10):
+        assert 0 <= resume_backoff_seconds(attempt, base_seconds=0.5) <= min(
+            MAX_RESUME_BACKOFF_SECONDS, 0.5 * 2 ** (attempt - 1)
+        )
+
+
+def test_next_resume_backoff_seconds():
+    stall = OpenAIStreamTimeoutError("stall")
+    kwargs = {"partial_content": "The answer ", "remaining_seconds": 30, "max_attempts": 2}
+    assert next_resume_backoff_seconds(error=stall, attempt=1, **kwargs) is not None
+    assert next_resume_backoff_seconds(error=stall, attempt=3, **kwargs) is None
+    # Nothing to continue
+    assert next_resume_backoff_seconds(
+        error=stall, attempt=1, partial_content="", remaining_seconds=30
+    ) is None
+    # No time left for the continuation
+    assert next_resume_backoff_seconds(
+        error=stall, attempt=1, partial_content="The answer ", remaining_seconds=1
+    ) is None
+    # Not a transient error
+    for error in [OpenAIStreamTimeoutError("first_token"), TimeoutError(), ValueError()]:
+        assert next_resume_backoff_seconds(error=error, attempt=1, **kwargs) is None
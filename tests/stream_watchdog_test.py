@@ -0,0 +1,64 @@
+import threading
+import time
+
+import pytest
+
+from app.metrics import get_counter
+from app.stream_watchdog import OpenAIStreamTimeoutError, watch_stream
+
+
+class SlowStream:
+    def __init__(self, chunks, delays):
+        self.chunks = chunks
+        self.delays = delays
+        self.closed = threading.Event()
+
+    def __iter__(self):
+        for chunk, delay in zip(self.chunks, self.delays):
+            if self.closed.wait(delay):
+                return
+            yield chunk
+
+    def close(self):
+        self.closed.set()
+
+
+def test_chunks_are_passed_through():
+    stream = SlowStream(["a", "b", "c"], [0, 0, 0])
+    chunks = watch_stream(stream, model="gpt-4o", endpoint="api.openai.com")
+    assert list(chunks) == ["a", "b", "c"]
+
+
+def test_first_token_timeout():
+    before = get_counter("openai_stream_timeouts", kind="first_token", model="m1", endpoint="e")
+    stream = SlowStream(["a"], [5])
+    with pytest.raises(OpenAIStreamTimeoutError) as e:
+        list(
+            watch_stream(
+                stream, model="m1", endpoint="e", first_token_timeout_seconds=0.1
+            )
+        )
+    assert e.value.kind == "first_token"
+    assert stream.closed.is_set()
+    after = get_counter("openai_stream_timeouts", kind="first_token", model="m1", endpoint="e")
+    assert after == before + 1
+
+
+def test_stall_timeout_keeps_the_received_chunks():
+    stream = SlowStream(["a", "b", "c"], [0, 0, 5])
+    received = []
+    with pytest.raises(OpenAIStreamTimeoutError) as e:
+        for chunk in watch_stream(
+            stream, model="m2", endpoint="e", stall_timeout_seconds=0.1
+        ):
+            received.append(chunk)
+    assert e.value.kind == "stall"
+    assert received == ["a", "b"]
+    assert get_counter("openai_stream_timeouts", kind="stall", model="m2", endpoint="e") >= 1
+
+
+def test_deadline():
+    stream = SlowStream(["a"], [5])
+    with pytest.raises(TimeoutError) as e:
+        list(watch_stream(stream, model="m3", endpoint="e", deadline=time.time() + 0.1))
+    assert not isinstance(e.value, OpenAIStreamTimeoutError)
@@ -0,0 +1,43 @@
+from slack_bolt import BoltContext
+
+from app.summary_cache import find_thread_summary, save_thread_summary
+
+
+def test_thread_summary_cache():
+    context = BoltContext({"team_id": "T111", "OPENAI_MODEL": "gpt-4o-mini"})
+    thread = {"channel": "C111", "thread_ts": "100.000"}
+    assert find_thread_summary(context=context, prompt="Summarize", **thread) is None
+
+    save_thread_summary(
+        context=context,
+        prompt="Summarize",
+        summary="They decided to ship it on Monday.",
+        latest_ts="105.000",
+        **thread,
+    )
+    assert find_thread_summary(context=context, prompt="Summarize", **thread) == {
+        "summary": "They decided to ship it on Monday.",
+        "latest_ts": "105.000",
+    }
+    # A different prompt needs a different summary
+    assert find_thread_summary(context=context, prompt="List the action items", **thread) is None
+
+
+def test_thread_summary_cache_with_fallback_model():
+    thread = {"channel": "C111", "thread_ts": "200.000"}
+    routed = BoltContext(
+        {"team_id": "T111", "OPENAI_MODEL": "gpt-4o-mini", "OPENAI_REQUESTED_MODEL": "gpt-4o"}
+    )
+    save_thread_summary(
+        context=routed,
+        prompt="Summarize",
+        summary="They decided to ship it on Monday.",
+        latest_ts="205.000",
+        **thread,
+    )
+    # The summary generated by a fallback model is found once the primary model is back
+    context = BoltContext({"team_id": "T111", "OPENAI_MODEL": "gpt-4o"})
+    assert find_thread_summary(context=context, prompt="Summarize", **thread) == {
+        "summary": "They decided to ship it on Monday.",
+        "latest_ts": "205.000",
+    }